@@ -2,18 +2,31 @@
 RAGAS Evaluation Demo - Main Entry Point
 
 This script demonstrates the complete RAG system and RAGAS evaluation workflow.
+
+Usage:
+    python main.py                  # 运行完整演示流程（建索引 -> 测试查询 -> 评测）
+    python main.py index            # 加载文档、分块、嵌入并保存索引到 vector_store.persist_path
+    python main.py query "问题"      # 加载已保存的索引回答一个问题
+    python main.py eval             # 加载已保存的索引运行 RAGAS 评测
+    python main.py eval --dataset "data/evaluation/regression/*.jsonl"   # 流式评测 JSONL / 分片数据集
+    python main.py serve            # 启动 RAG 查询服务（需要先运行 index 保存索引）
+    python main.py sweep            # 按 config.yaml 中的 sweep 网格比较检索参数
 """
 
+import argparse
+import json
 import os
 import sys
 from pathlib import Path
+from typing import Optional, Union
 
 import yaml
 
-from src.document_processor import DocumentProcessor
-from src.vector_store import VectorStoreManager
-from src.rag_chain import RAGChain
-from src.evaluator import RagasEvaluator
+# LangChain、FAISS、RAGAS 等重量级依赖在各命令内部按需导入，
+# 只运行部分步骤的命令不会为用不到的依赖付出启动时间
+
+# 与索引一起保存的元信息文件，记录建索引时使用的嵌入模型和分块参数
+INDEX_MANIFEST = "manifest.json"
 
 
 def load_config() -> dict:
@@ -53,23 +66,18 @@ def get_openai_config(config: dict) -> dict:
     }
 
 
-def main():
-    """主函数：运行完整的 RAG 系统和 RAGAS 评测流程"""
-    print("=" * 60)
-    print("🚀 RAGAS Evaluation Demo")
-    print("=" * 60)
-    print()
+def require_openai_config(config: dict) -> dict:
+    """
+    获取 OpenAI API 配置，未配置 API Key 时打印提示并退出
     
-    # 1. 检查配置
-    print("📋 步骤 1: 检查配置...")
-    config = load_config()
-    openai_config = get_openai_config(config)
-    api_key = openai_config["api_key"]
-    base_url = openai_config["base_url"]
-    model = openai_config["model"]
-    embedding_model = openai_config["embedding_model"]
+    Args:
+        config: 配置字典
     
-    if not api_key:
+    Returns:
+        dict: 同 get_openai_config
+    """
+    openai_config = get_openai_config(config)
+    if not openai_config["api_key"]:
         print("❌ 错误: 未找到 OpenAI API Key")
         print()
         print("请设置系统环境变量:")
@@ -80,21 +88,34 @@ def main():
         print("  openai.model: gpt-3.5-turbo")
         print("  openai.embedding_model: text-embedding-v4")
         sys.exit(1)
+    return openai_config
+
+
+def get_persist_path(config: dict) -> str:
+    """获取向量存储的持久化目录"""
+    return config.get("vector_store", {}).get("persist_path", "data/vector_store")
+
+
+def build_index(config: dict, openai_config: dict):
+    """
+    加载文档、分块、嵌入并把向量存储保存到 persist_path
     
-    print("✅ API Key 已配置")
-    if base_url:
-        print(f"✅ API Base URL: {base_url}")
-    print(f"✅ LLM Model: {model}")
-    print(f"✅ Embedding Model: {embedding_model}")
-    print()
+    Args:
+        config: 配置字典
+        openai_config: get_openai_config 返回的 API 配置
+    
+    Returns:
+        已创建并保存的 VectorStoreManager
+    """
+    from src.document_processor import DocumentProcessor
+    from src.vector_store import VectorStoreManager
     
-    # 加载其他配置
-    chunk_size = config.get("document_processing", {}).get("chunk_size", 500)
-    chunk_overlap = config.get("document_processing", {}).get("chunk_overlap", 50)
-    retrieval_k = config.get("retrieval", {}).get("k", 4)
+    document_config = config.get("document_processing", {})
+    chunk_size = document_config.get("chunk_size", 500)
+    chunk_overlap = document_config.get("chunk_overlap", 50)
+    embedding_model = openai_config["embedding_model"]
     
-    # 2. 加载文档
-    print("📄 步骤 2: 加载文档...")
+    print("📄 加载文档...")
     doc_processor = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     
     documents_path = Path("data/documents")
@@ -105,67 +126,367 @@ def main():
     
     documents = doc_processor.load_directory(str(documents_path), glob="**/*.md")
     print(f"✅ 已加载 {len(documents)} 个文档块")
-    print()
     
-    # 3. 创建向量存储
-    print("🔢 步骤 3: 创建向量存储...")
-    
-    vector_store = VectorStoreManager(api_key=api_key, embedding_model=embedding_model, base_url=base_url)
+    print("🔢 创建向量存储...")
+    vector_store = VectorStoreManager(
+        api_key=openai_config["api_key"],
+        embedding_model=embedding_model,
+        base_url=openai_config["base_url"]
+    )
     vector_store.create_from_documents(documents)
     print(f"✅ 向量存储已创建，包含 {vector_store.get_document_count()} 个向量 (模型: {embedding_model})")
-    print()
     
-    # 4. 创建 RAG 链
-    print("🔗 步骤 4: 创建 RAG 链...")
+    persist_path = get_persist_path(config)
+    vector_store.save(persist_path)
+    manifest = {
+        "embedding_model": embedding_model,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "document_count": vector_store.get_document_count(),
+    }
+    with open(Path(persist_path, INDEX_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"✅ 向量存储已保存到 {persist_path}")
+    return vector_store
+
+
+def load_index(config: dict, openai_config: dict, mmap: bool = False):
+    """
+    加载 index 命令保存的向量存储，不重新嵌入语料
+    
+    索引不存在时打印提示并退出；建索引时的嵌入模型与当前配置不一致时给出警告，
+    因为查询向量和索引向量来自不同模型时检索结果没有意义。
+    
+    Args:
+        config: 配置字典
+        openai_config: get_openai_config 返回的 API 配置
+        mmap: 是否以只读内存映射方式加载索引
+    
+    Returns:
+        已加载的 VectorStoreManager
+    """
+    from src.vector_store import VectorStoreManager
+    
+    persist_path = get_persist_path(config)
+    if not Path(persist_path, "index.faiss").exists():
+        print(f"❌ 错误: 未找到持久化索引 {persist_path}")
+        print("请先运行 python main.py index 构建并保存索引")
+        sys.exit(1)
+    
+    manifest_path = Path(persist_path, INDEX_MANIFEST)
+    if manifest_path.exists():
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            indexed_model = json.load(f).get("embedding_model")
+        if indexed_model and indexed_model != openai_config["embedding_model"]:
+            print(
+                f"⚠️  索引使用 {indexed_model} 构建，当前配置的嵌入模型为 "
+                f"{openai_config['embedding_model']}，请重新运行 python main.py index"
+            )
+    
+    vector_store = VectorStoreManager(
+        api_key=openai_config["api_key"],
+        embedding_model=openai_config["embedding_model"],
+        base_url=openai_config["base_url"]
+    )
+    vector_store.load(persist_path, mmap=mmap)
+    print(f"✅ 已加载索引 {persist_path}，包含 {vector_store.get_document_count()} 个向量")
+    return vector_store
+
+
+def create_rag_chain(config: dict, openai_config: dict, vector_store):
+    """
+    按配置创建 RAG 链（包括可选的重排序）
+    
+    Args:
+        config: 配置字典
+        openai_config: get_openai_config 返回的 API 配置
+        vector_store: VectorStoreManager 实例
+    
+    Returns:
+        RAGChain 实例
+    """
+    from src.rag_chain import RAGChain
+    from src.reranker import create_reranker
+    
+    retrieval_config = config.get("retrieval", {})
+    rerank_config = retrieval_config.get("rerank", {})
+    reranker = create_reranker(rerank_config)
     rag_chain = RAGChain(
         vector_store_manager=vector_store,
-        api_key=api_key,
-        model=model,
-        k=retrieval_k,
-        base_url=base_url
+        api_key=openai_config["api_key"],
+        model=openai_config["model"],
+        k=retrieval_config.get("k", 4),
+        base_url=openai_config["base_url"],
+        reranker=reranker,
+        fetch_k=rerank_config.get("fetch_k", 20)
     )
-    print(f"✅ RAG 链已创建 (模型: {model}, k={retrieval_k})")
-    print()
-    
-    # 5. 测试查询
-    print("💬 步骤 5: 测试查询...")
-    test_question = "什么是 RAG？"
-    print(f"问题: {test_question}")
+    print(f"✅ RAG 链已创建 (模型: {openai_config['model']}, k={rag_chain.k})")
+    if reranker is not None:
+        print(f"✅ 重排序已启用 (模型: {reranker.model_name}, fetch_k={rag_chain.fetch_k})")
+    return rag_chain
+
+
+def run_query(rag_chain, question: str) -> None:
+    """执行一次查询并打印回答、上下文数量和重排序统计"""
+    print(f"问题: {question}")
     
-    response = rag_chain.query(test_question)
+    response = rag_chain.query(question)
     print(f"回答: {response.answer[:200]}..." if len(response.answer) > 200 else f"回答: {response.answer}")
     print(f"检索到 {len(response.contexts)} 个上下文")
-    print()
+    if response.rerank_stats is not None:
+        stats = response.rerank_stats
+        print(
+            f"重排序: {stats.candidate_count} -> {stats.selected_count} 个文档, "
+            f"耗时 {stats.rerank_latency_ms:.1f} ms, "
+            f"节省约 {stats.tokens_saved} 个提示词 token"
+        )
+
+
+def run_eval(
+    config: dict,
+    openai_config: dict,
+    rag_chain,
+    dataset_path: Optional[Union[str, list[str]]] = None
+) -> None:
+    """
+    对评测数据集运行 RAGAS 评测并打印报告
+    
+    JSONL 文件、分片目录、glob 模式和多个文件使用流式评测，逐批读取样本；
+    单个 .json 文件整体加载评测（可使用快速评测模式）。
+    
+    Args:
+        config: 配置字典
+        openai_config: get_openai_config 返回的 API 配置
+        rag_chain: RAGChain 实例
+        dataset_path: 评测数据集路径（或 shell 展开后的路径列表），默认使用 evaluation.dataset_path
+    """
+    from src.dataset_stream import is_streaming_dataset, resolve_shards
+    from src.evaluator import RagasEvaluator
     
-    # 6. 运行 RAGAS 评测
-    print("📊 步骤 6: 运行 RAGAS 评测...")
-    dataset_path = Path("data/evaluation/test_dataset.json")
+    eval_config = config.get("evaluation", {})
+    dataset_path = dataset_path or eval_config.get("dataset_path", "data/evaluation/test_dataset.json")
+    if isinstance(dataset_path, list) and len(dataset_path) == 1:
+        dataset_path = dataset_path[0]
+    streaming = is_streaming_dataset(dataset_path)
     
-    if not dataset_path.exists():
+    try:
+        shards = resolve_shards(dataset_path)
+    except FileNotFoundError:
         print("❌ 错误: 未找到评测数据集")
         print(f"请确保 {dataset_path} 文件存在")
         sys.exit(1)
     
+    cache_config = eval_config.get("judge_cache", {})
     evaluator = RagasEvaluator(
         rag_chain,
-        api_key=api_key,
-        base_url=base_url,
-        model=model,
-        embedding_model=embedding_model
+        api_key=openai_config["api_key"],
+        base_url=openai_config["base_url"],
+        model=openai_config["model"],
+        embedding_model=openai_config["embedding_model"],
+        max_workers=eval_config.get("max_workers", 16),
+        batch_size=eval_config.get("batch_size"),
+        timeout=eval_config.get("timeout", 180),
+        cache_path=cache_config.get("path"),
+        enable_cache=cache_config.get("enabled", True)
     )
     
     try:
-        result, report = evaluator.run_evaluation(str(dataset_path))
+        quick_config = eval_config.get("quick", {})
+        if streaming:
+            print(f"流式评测 {len(shards)} 个数据集分片")
+            errors = []
+            result, report = evaluator.run_streaming_evaluation(
+                dataset_path,
+                batch_size=eval_config.get("stream_batch_size", 100),
+                errors=errors
+            )
+            if errors:
+                print(f"⚠️  跳过 {len(errors)} 个无效样本:")
+                for error in errors[:10]:
+                    print(f"   {error}")
+                if len(errors) > 10:
+                    print(f"   ... 另有 {len(errors) - 10} 个")
+        elif quick_config.get("enabled", False):
+            result, report = evaluator.run_quick_evaluation(
+                str(dataset_path),
+                sample_size=quick_config.get("sample_size"),
+                target_width=quick_config.get("target_width", 0.1),
+                initial_size=quick_config.get("initial_size", 20),
+                step_size=quick_config.get("step_size", 10),
+                max_samples=quick_config.get("max_samples"),
+                confidence=quick_config.get("confidence", 0.95)
+            )
+        else:
+            result, report = evaluator.run_evaluation(str(dataset_path))
         print()
         print(report)
+        if evaluator.judge_cache is not None:
+            stats = evaluator.judge_cache.stats()
+            print(
+                f"评测 LLM 缓存: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, "
+                f"命中率 {stats['hit_rate']:.1%}"
+            )
     except Exception as e:
         print(f"⚠️  评测过程中出现错误: {e}")
         print("这可能是由于 API 调用限制或网络问题导致的")
         print("请稍后重试或检查 API 配置")
+
+
+def main():
+    """主函数：运行完整的 RAG 系统和 RAGAS 评测流程"""
+    print("=" * 60)
+    print("🚀 RAGAS Evaluation Demo")
+    print("=" * 60)
+    print()
+    
+    # 1. 检查配置
+    print("📋 步骤 1: 检查配置...")
+    config = load_config()
+    openai_config = require_openai_config(config)
+    
+    print("✅ API Key 已配置")
+    if openai_config["base_url"]:
+        print(f"✅ API Base URL: {openai_config['base_url']}")
+    print(f"✅ LLM Model: {openai_config['model']}")
+    print(f"✅ Embedding Model: {openai_config['embedding_model']}")
+    print()
+    
+    # 2. 加载文档、创建并保存向量存储
+    print("📄 步骤 2: 构建索引...")
+    vector_store = build_index(config, openai_config)
+    print()
+    
+    # 3. 创建 RAG 链
+    print("🔗 步骤 3: 创建 RAG 链...")
+    rag_chain = create_rag_chain(config, openai_config, vector_store)
+    print()
+    
+    # 4. 测试查询
+    print("💬 步骤 4: 测试查询...")
+    run_query(rag_chain, "什么是 RAG？")
+    print()
+    
+    # 5. 运行 RAGAS 评测
+    print("📊 步骤 5: 运行 RAGAS 评测...")
+    run_eval(config, openai_config, rag_chain)
     
     print()
     print("🎉 演示完成！")
 
 
+def index():
+    """构建索引：加载文档、分块、嵌入并保存到 vector_store.persist_path"""
+    config = load_config()
+    build_index(config, require_openai_config(config))
+
+
+def query(question: str):
+    """加载已保存的索引并回答一个问题，不重新嵌入语料"""
+    config = load_config()
+    openai_config = require_openai_config(config)
+    rag_chain = create_rag_chain(config, openai_config, load_index(config, openai_config))
+    print()
+    run_query(rag_chain, question)
+
+
+def evaluate(dataset_path: Optional[Union[str, list[str]]] = None):
+    """加载已保存的索引并运行 RAGAS 评测，不重新嵌入语料"""
+    config = load_config()
+    openai_config = require_openai_config(config)
+    rag_chain = create_rag_chain(config, openai_config, load_index(config, openai_config))
+    print()
+    run_eval(config, openai_config, rag_chain, dataset_path)
+
+
+def serve():
+    """启动 RAG 查询服务：加载持久化索引并以多进程方式提供 HTTP 查询接口"""
+    from src.server import RAGQueryService, serve as run_server
+    
+    config = load_config()
+    openai_config = require_openai_config(config)
+    server_config = config.get("server", {})
+    
+    # 在 fork 工作进程之前以 mmap 方式加载索引，所有进程共享同一份只读页
+    vector_store = load_index(config, openai_config, mmap=True)
+    rag_chain = create_rag_chain(config, openai_config, vector_store)
+    service = RAGQueryService(
+        rag_chain,
+        index_path=get_persist_path(config),
+        max_batch_size=server_config.get("max_batch_size", 16),
+        max_wait_ms=server_config.get("max_wait_ms", 5),
+        reload_interval=server_config.get("reload_interval", 2)
+    )
+    run_server(
+        service,
+        host=server_config.get("host", "127.0.0.1"),
+        port=server_config.get("port", 8000),
+        workers=server_config.get("workers", 2)
+    )
+
+
+def sweep():
+    """按 sweep 配置网格比较 chunk_size、chunk_overlap 和 k，输出对比表"""
+    from src.sweep import SweepRunner, expand_grid, format_comparison_table
+    
+    config = load_config()
+    openai_config = require_openai_config(config)
+    
+    document_config = config.get("document_processing", {})
+    sweep_config = config.get("sweep", {})
+    eval_config = config.get("evaluation", {})
+    configs = expand_grid(
+        sweep_config.get("chunk_sizes", [document_config.get("chunk_size", 500)]),
+        sweep_config.get("chunk_overlaps", [document_config.get("chunk_overlap", 50)]),
+        sweep_config.get("ks", [config.get("retrieval", {}).get("k", 4)])
+    )
+    print(f"🔬 参数扫描: {len(configs)} 个配置, {len({c.chunking for c in configs})} 种分块方式")
+    
+    runner = SweepRunner(
+        documents_path="data/documents",
+        dataset_path=eval_config.get("dataset_path", "data/evaluation/test_dataset.json"),
+        api_key=openai_config["api_key"],
+        base_url=openai_config["base_url"],
+        model=openai_config["model"],
+        embedding_model=openai_config["embedding_model"],
+        max_workers=sweep_config.get("max_workers", 4),
+        cache_path=eval_config.get("judge_cache", {}).get("path"),
+        evaluator_options={
+            "max_workers": eval_config.get("max_workers", 16),
+            "timeout": eval_config.get("timeout", 180),
+        }
+    )
+    results = runner.run(configs)
+    
+    print()
+    print(format_comparison_table(results))
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="RAGAS Evaluation Demo")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    subparsers.add_parser("demo", help="运行完整演示流程（默认）")
+    subparsers.add_parser("index", help="加载文档并构建、保存索引")
+    query_parser = subparsers.add_parser("query", help="使用已保存的索引回答问题")
+    query_parser.add_argument("question", help="要提问的问题")
+    eval_parser = subparsers.add_parser("eval", help="使用已保存的索引运行 RAGAS 评测")
+    eval_parser.add_argument(
+        "--dataset",
+        nargs="+",
+        help="评测数据集路径：.json / .jsonl 文件、分片目录或 glob 模式，可传多个（默认使用 evaluation.dataset_path）"
+    )
+    subparsers.add_parser("serve", help="启动 RAG 查询服务")
+    subparsers.add_parser("sweep", help="比较检索参数")
+    args = parser.parse_args()
+    
+    if args.command == "index":
+        index()
+    elif args.command == "query":
+        query(args.question)
+    elif args.command == "eval":
+        evaluate(args.dataset)
+    elif args.command == "serve":
+        serve()
+    elif args.command == "sweep":
+        sweep()
+    else:
+        main()
@@ -0,0 +1,97 @@
+"""
+Startup Time Benchmark
+
+Measures how long each entry-point mode takes to import its dependencies,
+using ``python -X importtime`` in a fresh interpreter per run.
+
+Usage:
+    python scripts/benchmark_startup.py              # 所有模式，每个运行 5 次
+    python scripts/benchmark_startup.py query -n 10  # 只测 query 模式
+    python scripts/benchmark_startup.py --top 15     # 显示最慢的 15 个顶层导入
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# 每种模式在启动时需要导入的模块
+MODES = {
+    "cli": "import main",
+    "index": "import main; from src.document_processor import DocumentProcessor; "
+             "from src.vector_store import VectorStoreManager",
+    "query": "import main; from src.rag_chain import RAGChain",
+    "eval": "import main; from src.rag_chain import RAGChain; from src.evaluator import RagasEvaluator",
+}
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (.*)$")
+
+
+def parse_importtime(output: str) -> dict[str, int]:
+    """
+    解析 -X importtime 输出中的顶层导入
+    
+    Args:
+        output: 解释器的 stderr 输出
+    
+    Returns:
+        顶层模块名到累计导入耗时（微秒）的字典
+    """
+    top_level = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and not match.group(3).startswith(" "):
+            top_level[match.group(3)] = int(match.group(2))
+    return top_level
+
+
+def measure(statement: str) -> tuple[float, dict[str, int]]:
+    """
+    在新的解释器中执行导入语句
+    
+    Args:
+        statement: 要执行的导入语句
+    
+    Returns:
+        元组 (进程总耗时秒数, 顶层导入耗时字典)
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"Import failed for {statement!r}:\n{proc.stderr[-2000:]}")
+    return elapsed, parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure entry-point startup time")
+    parser.add_argument("modes", nargs="*", metavar="mode",
+                        help=f"要测量的模式（{', '.join(MODES)}），默认全部")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="每个模式的运行次数")
+    parser.add_argument("--top", type=int, default=5, help="显示最慢的顶层导入数量")
+    args = parser.parse_args()
+    unknown = set(args.modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(sorted(unknown))}")
+    
+    for mode in args.modes or list(MODES):
+        runs = [measure(MODES[mode]) for _ in range(args.repeat)]
+        wall = statistics.median(elapsed for elapsed, _ in runs)
+        imports = runs[-1][1]
+        print(f"{mode:<6} 启动 {wall * 1000:8.1f} ms  导入 {sum(imports.values()) / 1000:8.1f} ms")
+        for name, us in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"         {us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,22 +5,50 @@ This package contains the core components for the RAGAS evaluation demo:
 - document_processor: Document loading and text chunking
 - vector_store: Vector storage and retrieval using FAISS
 - rag_chain: RAG chain implementation using LangChain
+- reranker: Optional cross-encoder re-ranking stage
 - evaluator: RAGAS evaluation framework integration
 - models: Data models for RAG responses and evaluation
+
+Exports are resolved lazily (PEP 562), so importing the package or one of its
+light submodules does not pull in LangChain, FAISS or RAGAS until a component
+that needs them is actually used.
 """
 
+import importlib
+from typing import TYPE_CHECKING
+
 __version__ = "0.1.0"
 
-from .models import RAGResponse, EvaluationSample, EvaluationResult
-from .document_processor import DocumentProcessor
-from .vector_store import VectorStoreManager
-from .rag_chain import RAGChain
-
-__all__ = [
-    "RAGResponse",
-    "EvaluationSample",
-    "EvaluationResult",
-    "DocumentProcessor",
-    "VectorStoreManager",
-    "RAGChain",
-]
+# 导出名称 -> 定义它的子模块
+_LAZY_EXPORTS = {
+    "RAGResponse": ".models",
+    "RerankStats": ".models",
+    "EvaluationSample": ".models",
+    "EvaluationResult": ".models",
+    "DocumentProcessor": ".document_processor",
+    "VectorStoreManager": ".vector_store",
+    "RAGChain": ".rag_chain",
+    "CrossEncoderReranker": ".reranker",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+if TYPE_CHECKING:
+    from .models import RAGResponse, RerankStats, EvaluationSample, EvaluationResult
+    from .document_processor import DocumentProcessor
+    from .vector_store import VectorStoreManager
+    from .rag_chain import RAGChain
+    from .reranker import CrossEncoderReranker
+
+
+def __getattr__(name: str):
+    """首次访问导出名称时才导入对应的子模块"""
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
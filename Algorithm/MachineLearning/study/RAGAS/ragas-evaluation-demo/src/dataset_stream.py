@@ -0,0 +1,241 @@
+"""
+Dataset Stream Module
+
+Streams evaluation samples from JSONL files, sharded dataset directories or
+glob patterns without loading the whole dataset into memory. Samples are
+validated lazily; invalid lines are reported with their file and line number
+and skipped instead of aborting the stream.
+"""
+
+import glob
+import json
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+from .models import EvaluationSample
+
+
+@dataclass
+class SampleError:
+    """
+    样本校验错误
+    
+    Attributes:
+        source: 样本所在的文件路径
+        line: 样本所在的行号（JSONL）或在 samples 列表中的索引（JSON）；
+              整个分片无法解析时为 0
+        message: 错误信息
+    """
+    source: str
+    line: int
+    message: str
+    
+    def __str__(self) -> str:
+        return f"{self.source}:{self.line}: {self.message}"
+
+
+def parse_sample(sample_data, location: str) -> EvaluationSample:
+    """
+    校验并解析单个评测样本
+    
+    Args:
+        sample_data: 从 JSON 解析出的样本对象
+        location: 用于错误信息的样本位置描述，例如 "index 3" 或 "line 12"
+    
+    Returns:
+        EvaluationSample 实例
+    
+    Raises:
+        ValueError: 如果样本格式不正确
+    """
+    if not isinstance(sample_data, dict):
+        raise ValueError(
+            f"Invalid sample format at {location}: expected a JSON object"
+        )
+    
+    # 验证必需字段
+    if "question" not in sample_data:
+        raise ValueError(
+            f"Invalid sample format at {location}: missing 'question' field"
+        )
+    
+    if "ground_truth" not in sample_data:
+        raise ValueError(
+            f"Invalid sample format at {location}: missing 'ground_truth' field"
+        )
+    
+    question = sample_data["question"]
+    ground_truth = sample_data["ground_truth"]
+    
+    # 验证字段类型
+    if not isinstance(question, str) or not question.strip():
+        raise ValueError(
+            f"Invalid sample format at {location}: 'question' must be a non-empty string"
+        )
+    
+    if not isinstance(ground_truth, str) or not ground_truth.strip():
+        raise ValueError(
+            f"Invalid sample format at {location}: 'ground_truth' must be a non-empty string"
+        )
+    
+    # 解析可选的 contexts 字段
+    contexts = sample_data.get("contexts")
+    if contexts is not None:
+        if not isinstance(contexts, list):
+            raise ValueError(
+                f"Invalid sample format at {location}: 'contexts' must be a list"
+            )
+        for j, ctx in enumerate(contexts):
+            if not isinstance(ctx, str):
+                raise ValueError(
+                    f"Invalid sample format at {location}: 'contexts[{j}]' must be a string"
+                )
+    
+    # 解析可选的 category 字段
+    category = sample_data.get("category")
+    if category is not None and not isinstance(category, str):
+        raise ValueError(
+            f"Invalid sample format at {location}: 'category' must be a string"
+        )
+    
+    return EvaluationSample(
+        question=question,
+        ground_truth=ground_truth,
+        contexts=contexts,
+        category=category,
+    )
+
+
+def is_streaming_dataset(path: Union[str, list[str]]) -> bool:
+    """
+    判断数据集路径是否应该流式读取
+    
+    JSONL 文件、目录、glob 模式和多个路径都按分片流式读取；
+    单个 .json 文件仍可以整体加载。
+    
+    Args:
+        path: 数据集路径或路径列表
+    
+    Returns:
+        需要流式读取时返回 True
+    """
+    if isinstance(path, (list, tuple)):
+        return len(path) != 1 or is_streaming_dataset(path[0])
+    return glob.has_magic(path) or Path(path).is_dir() or Path(path).suffix == ".jsonl"
+
+
+def resolve_shards(path: Union[str, list[str]]) -> list[Path]:
+    """
+    解析数据集路径对应的分片文件列表
+    
+    支持单个 .jsonl / .json 文件、包含分片文件的目录，以及 glob 模式
+    （例如 "data/evaluation/regression-*.jsonl"）。分片按文件名排序。
+    传入路径列表（例如 shell 已展开的 glob）时按列表顺序依次解析。
+    
+    Args:
+        path: 数据集路径或路径列表
+    
+    Returns:
+        分片文件路径列表
+    
+    Raises:
+        FileNotFoundError: 如果没有找到任何数据集文件
+    """
+    if isinstance(path, (list, tuple)):
+        return [shard for item in path for shard in resolve_shards(item)]
+    
+    if glob.has_magic(path):
+        shards = [Path(p) for p in sorted(glob.glob(path))]
+    elif Path(path).is_dir():
+        shards = sorted(
+            p for p in Path(path).iterdir()
+            if p.is_file() and p.suffix in (".jsonl", ".json")
+        )
+    else:
+        shards = [Path(path)] if Path(path).exists() else []
+    
+    if not shards:
+        raise FileNotFoundError(f"Evaluation dataset file not found: {path}")
+    
+    return shards
+
+
+def _iter_shard(shard: Path) -> Iterator[tuple[int, object]]:
+    """逐个产出分片中的 (行号或索引, 样本对象)，JSON 解析失败的行或分片产出 ValueError"""
+    if shard.suffix != ".jsonl":
+        # 普通 JSON 数据集无法流式解析，整体读取后逐个产出；
+        # 整个分片无法解析时只跳过该分片，记为行号 0 的错误
+        try:
+            with open(shard, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            yield 0, ValueError(f"Invalid JSON shard, skipped: {e}")
+            return
+        samples = data.get("samples", []) if isinstance(data, dict) else []
+        yield from enumerate(samples)
+        return
+    
+    with open(shard, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, ValueError(f"Invalid JSON at line {line_number}: {e}")
+
+
+def iter_samples(
+    path: Union[str, list[str]],
+    errors: Optional[list[SampleError]] = None
+) -> Iterator[EvaluationSample]:
+    """
+    流式读取并校验评测样本
+    
+    每次只解析一行，校验失败的样本（或无法解析的 JSON 分片）被跳过，
+    错误记录到 errors 中，不会中断读取。
+    
+    Args:
+        path: 数据集路径（文件、目录或 glob 模式）或路径列表
+        errors: 用于收集校验错误的列表，可选
+    
+    Yields:
+        校验通过的 EvaluationSample
+    
+    Raises:
+        FileNotFoundError: 如果没有找到任何数据集文件
+    """
+    for shard in resolve_shards(path):
+        location_name = "line" if shard.suffix == ".jsonl" else "index"
+        for position, sample_data in _iter_shard(shard):
+            try:
+                if isinstance(sample_data, ValueError):
+                    raise sample_data
+                yield parse_sample(sample_data, f"{location_name} {position}")
+            except ValueError as e:
+                if errors is not None:
+                    errors.append(SampleError(source=str(shard), line=position, message=str(e)))
+
+
+def iter_batches(samples: Iterable[EvaluationSample], batch_size: int) -> Iterator[list[EvaluationSample]]:
+    """
+    将样本流切分为固定大小的批次
+    
+    Args:
+        samples: 样本迭代器
+        batch_size: 每批样本数
+    
+    Yields:
+        不超过 batch_size 个样本的列表
+    
+    Raises:
+        ValueError: 如果 batch_size <= 0
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be greater than 0")
+    
+    iterator = iter(samples)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
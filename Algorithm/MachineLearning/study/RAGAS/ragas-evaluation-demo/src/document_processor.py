@@ -107,7 +107,7 @@ class DocumentProcessor:
         
         return chunks
     
-    def load_directory(self, dir_path: str, glob: str = "**/*.txt") -> list[Document]:
+    def load_directory(self, dir_path: str, glob: str = "**/*.txt", split: bool = True) -> list[Document]:
         """
         加载目录下所有文档并分块
         
@@ -119,6 +119,8 @@ class DocumentProcessor:
             glob: 文件匹配模式，默认 "**/*.txt" 匹配所有 txt 文件
                   可以使用 "**/*.md" 匹配 Markdown 文件
                   或 "**/*.*" 匹配所有文件
+            split: 是否分块，默认 True；为 False 时返回未分块的原始文档，
+                   便于用不同的分块参数重复调用 split_documents
             
         Returns:
             LangChain Document 对象列表，每个对象包含一个文本块
@@ -176,7 +178,20 @@ class DocumentProcessor:
             else:
                 raise
         
+        if not split:
+            return documents
+        
         # 使用 text_splitter 进行分块
-        chunks = self.text_splitter.split_documents(documents)
+        return self.split_documents(documents)
+    
+    def split_documents(self, documents: list[Document]) -> list[Document]:
+        """
+        对已加载的文档分块
         
-        return chunks
+        Args:
+            documents: 未分块的 LangChain Document 列表
+        
+        Returns:
+            分块后的 Document 列表
+        """
+        return self.text_splitter.split_documents(documents)
@@ -6,41 +6,92 @@ Implements Requirements 5.1, 5.2, 5.3, 5.4, 5.5, 5.6, 5.7.
 """
 
 import json
+import math
 import os
 from pathlib import Path
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Optional, Union
 
 from datasets import Dataset
 from ragas import evaluate
+from ragas.run_config import RunConfig
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
-# Import metrics from the new recommended location (ragas v1.0+)
-try:
-    from ragas.metrics._faithfulness import Faithfulness
-    from ragas.metrics._answer_relevance import ResponseRelevancy
-    from ragas.metrics._context_precision import ContextPrecision
-    from ragas.metrics._context_recall import ContextRecall
-    
-    # Create metric instances
-    faithfulness = Faithfulness()
-    answer_relevancy = ResponseRelevancy()
-    context_precision = ContextPrecision()
-    context_recall = ContextRecall()
-except ImportError:
-    # Fallback to legacy imports for older ragas versions
-    from ragas.metrics import (
-        faithfulness,
-        answer_relevancy,
-        context_precision,
-        context_recall,
-    )
-
+from .dataset_stream import SampleError, iter_batches, iter_samples, parse_sample
+from .judge_cache import JudgeCache, create_judge_cache
 from .models import EvaluationSample, EvaluationResult
+from .sampling import (
+    bootstrap_intervals,
+    max_interval_width,
+    stratified_order,
+    stratified_sample,
+)
 
 if TYPE_CHECKING:
+    import pandas as pd
+    from .models import RAGResponse
     from .rag_chain import RAGChain
 
 
+# EvaluationResult 中各指标对应的 RAGAS 结果列名
+METRIC_NAMES = ("faithfulness", "answer_relevancy", "context_precision", "context_recall")
+
+
+def create_metrics() -> list:
+    """
+    创建 RAGAS 评测指标实例
+    
+    指标对象在首次使用时才创建，而不是在导入模块时，避免只导入评测模块
+    （例如加载数据集）时也付出构造指标的开销。
+    
+    Returns:
+        Faithfulness、Answer Relevancy、Context Precision、Context Recall 指标列表
+    """
+    # Import metrics from the new recommended location (ragas v1.0+)
+    try:
+        from ragas.metrics._faithfulness import Faithfulness
+        from ragas.metrics._answer_relevance import ResponseRelevancy
+        from ragas.metrics._context_precision import ContextPrecision
+        from ragas.metrics._context_recall import ContextRecall
+        
+        return [Faithfulness(), ResponseRelevancy(), ContextPrecision(), ContextRecall()]
+    except ImportError:
+        # Fallback to legacy imports for older ragas versions
+        from ragas.metrics import (
+            faithfulness,
+            answer_relevancy,
+            context_precision,
+            context_recall,
+        )
+        
+        return [faithfulness, answer_relevancy, context_precision, context_recall]
+
+
+def _mean_score(value) -> Optional[float]:
+    """将 RAGAS 返回的分数（单个值或逐样本列表）转换为平均分，忽略 NaN"""
+    if value is None:
+        return None
+    values = value if isinstance(value, (list, tuple)) else [value]
+    scores = [float(v) for v in values if v is not None and not math.isnan(float(v))]
+    return sum(scores) / len(scores) if scores else None
+
+
+def metric_means(df: "pd.DataFrame") -> dict[str, float]:
+    """
+    从逐样本结果表计算各指标的平均分
+    
+    Args:
+        df: RAGAS 结果的 pandas DataFrame（每行一个样本）
+    
+    Returns:
+        指标名到平均分的字典，缺失或全部为 NaN 的指标为 0.0
+    """
+    means = {}
+    for name in METRIC_NAMES:
+        value = df[name].mean() if name in df.columns else None
+        means[name] = float(value) if value is not None and value == value else 0.0
+    return means
+
+
 class RagasEvaluator:
     """
     RAGAS 评测器
@@ -54,6 +105,9 @@ class RagasEvaluator:
     Attributes:
         rag_chain: RAG 链实例，用于获取答案和上下文
         metrics: RAGAS 评测指标列表
+        max_workers: 并发执行的指标评测任务数上限
+        batch_size: 每批提交的评测任务数，None 表示一次提交全部任务
+        judge_cache: 评测 LLM 提示词缓存，未启用时为 None
     """
     
     def __init__(
@@ -62,7 +116,13 @@ class RagasEvaluator:
         api_key: Optional[str] = None,
         base_url: Optional[str] = None,
         model: str = "gpt-3.5-turbo",
-        embedding_model: str = "text-embedding-v4"
+        embedding_model: str = "text-embedding-v4",
+        max_workers: int = 16,
+        batch_size: Optional[int] = None,
+        timeout: int = 180,
+        judge_cache: Optional[JudgeCache] = None,
+        cache_path: Optional[str] = None,
+        enable_cache: bool = True
     ):
         """
         初始化评测器
@@ -73,14 +133,24 @@ class RagasEvaluator:
             base_url: API Base URL（可选）
             model: 评测使用的 LLM 模型
             embedding_model: 评测使用的 Embedding 模型
+            max_workers: 并发执行的指标评测任务数上限，默认 16
+            batch_size: 每批提交的评测任务数，默认 None（不分批）
+            timeout: 单个评测任务的超时时间（秒），默认 180
+            judge_cache: 评测 LLM 提示词缓存，可在多个评测器之间共享
+            cache_path: SQLite 缓存文件路径，提供时缓存跨运行复用（judge_cache 为空时生效）
+            enable_cache: 是否缓存评测 LLM 的相同提示词，默认 True
+        
+        Raises:
+            ValueError: 如果 max_workers <= 0 或 batch_size <= 0
         """
+        if max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+        
+        if batch_size is not None and batch_size <= 0:
+            raise ValueError("batch_size must be greater than 0")
+        
         self.rag_chain = rag_chain
-        self.metrics = [
-            faithfulness,
-            answer_relevancy,
-            context_precision,
-            context_recall,
-        ]
+        self._metrics = None
         
         # 配置 RAGAS 使用的 LLM 和 Embeddings
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
@@ -88,16 +158,40 @@ class RagasEvaluator:
         self.model = model
         self.embedding_model = embedding_model
         
+        # 并发执行配置
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.timeout = timeout
+        
+        # 相同的评测提示词（跨指标、跨运行）只调用一次 LLM
+        if enable_cache:
+            self.judge_cache = judge_cache or create_judge_cache(cache_path)
+        else:
+            self.judge_cache = None
+        
         # 创建 LLM 和 Embeddings 实例
         self._llm = None
         self._embeddings = None
     
+    @property
+    def metrics(self) -> list:
+        """RAGAS 评测指标列表（首次访问时创建）"""
+        if self._metrics is None:
+            self._metrics = create_metrics()
+        return self._metrics
+    
+    @metrics.setter
+    def metrics(self, metrics: list) -> None:
+        self._metrics = metrics
+    
     def _get_llm(self):
         """获取配置好的 LLM 实例"""
         if self._llm is None:
             kwargs = {"api_key": self.api_key, "model": self.model}
             if self.base_url:
                 kwargs["base_url"] = self.base_url
+            if self.judge_cache is not None:
+                kwargs["cache"] = self.judge_cache
             self._llm = ChatOpenAI(**kwargs)
         return self._llm
     
@@ -111,6 +205,10 @@ class RagasEvaluator:
             self._embeddings = OpenAIEmbeddings(**kwargs)
         return self._embeddings
     
+    def _get_run_config(self) -> RunConfig:
+        """获取 RAGAS 执行配置（并发数、超时）"""
+        return RunConfig(timeout=self.timeout, max_workers=self.max_workers)
+    
     def load_dataset(self, path: str) -> list[EvaluationSample]:
         """
         加载评测数据集
@@ -121,7 +219,8 @@ class RagasEvaluator:
                 {
                     "question": "问题文本",
                     "ground_truth": "参考答案",
-                    "contexts": ["可选的参考上下文"]  // 可选字段
+                    "contexts": ["可选的参考上下文"],  // 可选字段
+                    "category": "可选的样本类别"         // 可选字段，用于分层抽样
                 }
             ]
         }
@@ -176,58 +275,10 @@ class RagasEvaluator:
             raise ValueError("Evaluation dataset is empty: 'samples' list has no items")
         
         # 解析样本
-        samples = []
-        for i, sample_data in enumerate(samples_data):
-            if not isinstance(sample_data, dict):
-                raise ValueError(
-                    f"Invalid sample format at index {i}: expected a JSON object"
-                )
-            
-            # 验证必需字段
-            if "question" not in sample_data:
-                raise ValueError(
-                    f"Invalid sample format at index {i}: missing 'question' field"
-                )
-            
-            if "ground_truth" not in sample_data:
-                raise ValueError(
-                    f"Invalid sample format at index {i}: missing 'ground_truth' field"
-                )
-            
-            question = sample_data["question"]
-            ground_truth = sample_data["ground_truth"]
-            
-            # 验证字段类型
-            if not isinstance(question, str) or not question.strip():
-                raise ValueError(
-                    f"Invalid sample format at index {i}: 'question' must be a non-empty string"
-                )
-            
-            if not isinstance(ground_truth, str) or not ground_truth.strip():
-                raise ValueError(
-                    f"Invalid sample format at index {i}: 'ground_truth' must be a non-empty string"
-                )
-            
-            # 解析可选的 contexts 字段
-            contexts = sample_data.get("contexts")
-            if contexts is not None:
-                if not isinstance(contexts, list):
-                    raise ValueError(
-                        f"Invalid sample format at index {i}: 'contexts' must be a list"
-                    )
-                for j, ctx in enumerate(contexts):
-                    if not isinstance(ctx, str):
-                        raise ValueError(
-                            f"Invalid sample format at index {i}: 'contexts[{j}]' must be a string"
-                        )
-            
-            # 创建 EvaluationSample
-            sample = EvaluationSample(
-                question=question,
-                ground_truth=ground_truth,
-                contexts=contexts,
-            )
-            samples.append(sample)
+        samples = [
+            parse_sample(sample_data, f"index {i}")
+            for i, sample_data in enumerate(samples_data)
+        ]
         
         return samples
     
@@ -256,31 +307,31 @@ class RagasEvaluator:
         if not samples:
             raise ValueError("Cannot prepare evaluation data: samples list is empty")
         
-        # 准备 RAGAS 所需的数据结构
-        questions = []
-        answers = []
-        contexts = []
-        ground_truths = []
+        # 调用 RAG 链获取答案和上下文
+        responses = [self.rag_chain.query(sample.question) for sample in samples]
         
-        for sample in samples:
-            # 调用 RAG 链获取答案和上下文
-            response = self.rag_chain.query(sample.question)
-            
-            questions.append(sample.question)
-            answers.append(response.answer)
-            contexts.append(response.contexts)
-            ground_truths.append(sample.ground_truth)
+        return self.build_dataset(samples, responses)
+    
+    @staticmethod
+    def build_dataset(samples: list[EvaluationSample], responses: list["RAGResponse"]) -> Dataset:
+        """
+        由评测样本和对应的 RAG 响应构建 RAGAS 评测数据
         
+        Args:
+            samples: 评测样本列表
+            responses: 与 samples 一一对应的 RAG 响应列表
+            
+        Returns:
+            HuggingFace Dataset 对象
+        """
         # 构建 HuggingFace Dataset
         # RAGAS 需要的列名：question, answer, contexts, ground_truth
-        dataset = Dataset.from_dict({
-            "question": questions,
-            "answer": answers,
-            "contexts": contexts,
-            "ground_truth": ground_truths,
+        return Dataset.from_dict({
+            "question": [sample.question for sample in samples],
+            "answer": [response.answer for response in responses],
+            "contexts": [response.contexts for response in responses],
+            "ground_truth": [sample.ground_truth for sample in samples],
         })
-        
-        return dataset
     
     def evaluate(self, dataset: Dataset) -> EvaluationResult:
         """
@@ -305,71 +356,59 @@ class RagasEvaluator:
             - Requirement 5.5: 计算 Context_Recall 指标评估上下文召回率
         """
         # 调用 RAGAS evaluate 函数，使用自定义的 LLM 和 Embeddings
+        # 所有 (样本, 指标) 评测任务由 RAGAS 执行器并发运行，并发数受 max_workers 限制
         # Validates Requirements 5.2, 5.3, 5.4, 5.5
         result = evaluate(
             dataset=dataset,
             metrics=self.metrics,
             llm=self._get_llm(),
             embeddings=self._get_embeddings(),
+            run_config=self._get_run_config(),
+            batch_size=self.batch_size,
         )
         
-        # 提取各项指标分数
-        # RAGAS 返回的结果可能是字典或对象，需要兼容处理
-        faithfulness_score = 0.0
-        answer_relevancy_score = 0.0
-        context_precision_score = 0.0
-        context_recall_score = 0.0
+        # 逐样本结果表只构建一次，用于汇总分数和详细结果
+        try:
+            df = result.to_pandas()
+        except Exception:
+            df = None
         
-        # 尝试从不同的属性/方法获取分数
+        # 提取各项指标分数
+        # RAGAS 返回的结果可能是字典或对象，分数可能是单个值或逐样本列表，需要兼容处理
+        scores = {}
         if hasattr(result, '__getitem__'):
-            # 字典形式访问
+            for name in METRIC_NAMES:
+                try:
+                    score = _mean_score(result[name])
+                except (KeyError, TypeError, ValueError):
+                    score = None
+                if score is not None:
+                    scores[name] = score
+        
+        # 如果上面没有获取到，从逐样本结果表计算平均值
+        if len(scores) < len(METRIC_NAMES) and df is not None:
             try:
-                val = result["faithfulness"]
-                faithfulness_score = float(val) if val is not None else 0.0
-                val = result["answer_relevancy"]
-                answer_relevancy_score = float(val) if val is not None else 0.0
-                val = result["context_precision"]
-                context_precision_score = float(val) if val is not None else 0.0
-                val = result["context_recall"]
-                context_recall_score = float(val) if val is not None else 0.0
-            except (KeyError, TypeError, ValueError):
-                pass
-        
-        # 如果上面没有获取到，尝试其他方式
-        if faithfulness_score == 0.0 and answer_relevancy_score == 0.0:
-            # 尝试从 to_pandas 获取平均值
-            try:
-                df = result.to_pandas()
-                if "faithfulness" in df.columns:
-                    val = df["faithfulness"].mean()
-                    faithfulness_score = float(val) if val is not None and not (isinstance(val, float) and val != val) else 0.0
-                if "answer_relevancy" in df.columns:
-                    val = df["answer_relevancy"].mean()
-                    answer_relevancy_score = float(val) if val is not None and not (isinstance(val, float) and val != val) else 0.0
-                if "context_precision" in df.columns:
-                    val = df["context_precision"].mean()
-                    context_precision_score = float(val) if val is not None and not (isinstance(val, float) and val != val) else 0.0
-                if "context_recall" in df.columns:
-                    val = df["context_recall"].mean()
-                    context_recall_score = float(val) if val is not None and not (isinstance(val, float) and val != val) else 0.0
+                means = metric_means(df)
+                for name in METRIC_NAMES:
+                    scores.setdefault(name, means[name])
             except Exception:
                 pass
         
         # 提取详细分数（每个样本的分数）
         details = {}
-        try:
-            df = result.to_pandas()
-            details = df.to_dict(orient="records")
-        except Exception:
-            # 如果无法获取详细分数，使用空字典
-            details = {}
+        if df is not None:
+            try:
+                details = df.to_dict(orient="records")
+            except Exception:
+                # 如果无法获取详细分数，使用空字典
+                details = {}
         
         # 构建并返回 EvaluationResult
         return EvaluationResult(
-            faithfulness=faithfulness_score,
-            answer_relevancy=answer_relevancy_score,
-            context_precision=context_precision_score,
-            context_recall=context_recall_score,
+            faithfulness=scores.get("faithfulness", 0.0),
+            answer_relevancy=scores.get("answer_relevancy", 0.0),
+            context_precision=scores.get("context_precision", 0.0),
+            context_recall=scores.get("context_recall", 0.0),
             details=details,
         )
     
@@ -399,19 +438,36 @@ class RagasEvaluator:
             "",
         ]
         
+        # 快速评测结果在分数后附上置信区间
+        intervals = result.confidence_intervals or {}
+        level = f"{result.confidence_level:.0%}"
+        
+        def score(name: str) -> str:
+            value = getattr(result, name)
+            if name not in intervals:
+                return f"{value:.4f}"
+            low, high = intervals[name]
+            return f"{value:.4f} ({level} CI: {low:.4f} - {high:.4f})"
+        
+        if result.confidence_intervals is not None:
+            report_lines.extend([
+                f"⚡ 快速评测：基于 {len(result.details)} 个抽样样本，区间为 bootstrap 置信区间",
+                "",
+            ])
+        
         # 添加各项指标分数
         # Validates Requirement 5.6: 输出包含所有指标的评测报告
         report_lines.extend([
-            f"🎯 Faithfulness（忠实度）: {result.faithfulness:.4f}",
+            f"🎯 Faithfulness（忠实度）: {score('faithfulness')}",
             f"   - 衡量生成答案与检索上下文的一致性",
             "",
-            f"📝 Answer Relevancy（答案相关性）: {result.answer_relevancy:.4f}",
+            f"📝 Answer Relevancy（答案相关性）: {score('answer_relevancy')}",
             f"   - 衡量答案与问题的相关程度",
             "",
-            f"🔍 Context Precision（上下文精确度）: {result.context_precision:.4f}",
+            f"🔍 Context Precision（上下文精确度）: {score('context_precision')}",
             f"   - 衡量检索上下文的精确性",
             "",
-            f"📚 Context Recall（上下文召回率）: {result.context_recall:.4f}",
+            f"📚 Context Recall（上下文召回率）: {score('context_recall')}",
             f"   - 衡量检索上下文的完整性",
             "",
         ])
@@ -477,3 +533,150 @@ class RagasEvaluator:
         report = self.generate_report(result)
         
         return result, report
+    
+    def run_quick_evaluation(
+        self,
+        dataset_path: str,
+        sample_size: Optional[int] = None,
+        target_width: Optional[float] = None,
+        initial_size: int = 20,
+        step_size: int = 10,
+        max_samples: Optional[int] = None,
+        confidence: float = 0.95,
+        n_resamples: int = 1000,
+        seed: Optional[int] = 42
+    ) -> tuple[EvaluationResult, str]:
+        """
+        运行快速评测
+        
+        只评测数据集的一部分样本，用于快速判断改动是否导致指标回退。支持两种方式：
+        - 指定 sample_size：按 category 分层随机抽取固定数量的样本评测
+        - 指定 target_width：先评测 initial_size 个分层样本，之后每轮追加 step_size 个，
+          直到所有指标的 bootstrap 置信区间宽度都不超过 target_width 或样本用尽
+        
+        两种方式都会在结果中附带各指标的置信区间，并显示在报告中。
+        
+        Args:
+            dataset_path: 评测数据集文件路径
+            sample_size: 固定抽样数量
+            target_width: 置信区间的目标宽度（例如 0.1）
+            initial_size: 顺序抽样时首轮评测的样本数，默认 20
+            step_size: 顺序抽样时每轮追加的样本数，默认 10
+            max_samples: 顺序抽样时最多评测的样本数，默认不限制
+            confidence: 置信水平，默认 0.95
+            n_resamples: bootstrap 重采样次数，默认 1000
+            seed: 随机种子，默认 42（保证多次运行抽到相同的样本）
+        
+        Returns:
+            元组 (EvaluationResult, 报告字符串)
+        
+        Raises:
+            ValueError: 如果 sample_size 和 target_width 都未提供
+            ValueError: 如果 target_width、initial_size 或 step_size 不是正数
+        """
+        if sample_size is None and target_width is None:
+            raise ValueError("Either sample_size or target_width must be provided")
+        
+        samples = self.load_dataset(dataset_path)
+        
+        if sample_size is not None:
+            selected = stratified_sample(samples, sample_size, seed=seed)
+            details = self._records(self.evaluate(self.prepare_evaluation_data(selected)).details)
+            intervals = bootstrap_intervals(
+                details, list(METRIC_NAMES), confidence, n_resamples, seed
+            )
+        else:
+            if target_width <= 0:
+                raise ValueError("target_width must be greater than 0")
+            if initial_size <= 0 or step_size <= 0:
+                raise ValueError("initial_size and step_size must be greater than 0")
+            
+            order = stratified_order(samples, seed=seed)
+            limit = min(max_samples or len(order), len(order))
+            details = []
+            evaluated = 0
+            batch = min(initial_size, limit)
+            while True:
+                # 只评测新追加的样本，分数与之前各轮的逐样本结果合并
+                batch_samples = order[evaluated:evaluated + batch]
+                round_result = self.evaluate(self.prepare_evaluation_data(batch_samples))
+                details.extend(self._records(round_result.details))
+                evaluated += len(batch_samples)
+                
+                intervals = bootstrap_intervals(
+                    details, list(METRIC_NAMES), confidence, n_resamples, seed
+                )
+                if max_interval_width(intervals) <= target_width or evaluated >= limit:
+                    break
+                batch = min(step_size, limit - evaluated)
+        
+        result = self.aggregate_details(details)
+        result.confidence_intervals = intervals
+        result.confidence_level = confidence
+        report = self.generate_report(result)
+        
+        return result, report
+    
+    def aggregate_details(self, details: list[dict]) -> EvaluationResult:
+        """
+        从逐样本分数记录汇总评测结果
+        
+        Args:
+            details: 逐样本分数记录列表
+        
+        Returns:
+            各指标为样本平均分的 EvaluationResult
+        """
+        import pandas as pd
+        
+        means = metric_means(pd.DataFrame(details))
+        return EvaluationResult(details=details, **means)
+    
+    @staticmethod
+    def _records(details) -> list[dict]:
+        """将 EvaluationResult.details 规范为逐样本记录列表"""
+        return list(details) if isinstance(details, list) else []
+    
+    def run_streaming_evaluation(
+        self,
+        dataset_path: Union[str, list[str]],
+        batch_size: int = 100,
+        errors: Optional[list[SampleError]] = None
+    ) -> tuple[EvaluationResult, str]:
+        """
+        流式运行大规模数据集的评测
+        
+        从 JSONL 文件、分片目录或 glob 模式中逐行读取样本，按 batch_size 分批
+        准备和评测，内存占用与批大小而不是数据集大小相关。校验失败的样本被跳过，
+        错误（含文件和行号）记录到 errors 中。
+        
+        Args:
+            dataset_path: 数据集路径（.jsonl / .json 文件、目录或 glob 模式）或路径列表
+            batch_size: 每批评测的样本数，默认 100
+            errors: 用于收集样本校验错误的列表，可选
+        
+        Returns:
+            元组 (EvaluationResult, 报告字符串)；details 中只保留每个样本的问题和指标分数
+        
+        Raises:
+            FileNotFoundError: 如果没有找到任何数据集文件
+            ValueError: 如果没有任何有效样本
+        """
+        details = []
+        sample_count = 0
+        for batch in iter_batches(iter_samples(dataset_path, errors), batch_size):
+            sample_count += len(batch)
+            batch_result = self.evaluate(self.prepare_evaluation_data(batch))
+            # 只保留分数，不保留答案和上下文文本，避免结果随数据集规模膨胀
+            details.extend(
+                {key: record.get(key) for key in ("user_input",) + METRIC_NAMES}
+                for record in self._records(batch_result.details)
+            )
+        
+        if sample_count == 0:
+            raise ValueError("Evaluation dataset has no valid samples")
+        
+        result = self.aggregate_details(details)
+        report = self.generate_report(result)
+        
+        return result, report
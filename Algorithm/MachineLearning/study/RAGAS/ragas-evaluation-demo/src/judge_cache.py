@@ -0,0 +1,105 @@
+"""
+Judge Cache Module
+
+Caches responses of the judge LLM used by RAGAS metrics. Identical judge
+prompts (for example the same statement extraction issued for several metrics,
+or the same sample evaluated again in a later run) are answered from the cache
+instead of calling the API again.
+"""
+
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+from langchain_core.caches import BaseCache, InMemoryCache, RETURN_VAL_TYPE
+
+
+class JudgeCache(BaseCache):
+    """
+    评测 LLM 提示词缓存
+    
+    包装一个 LangChain 缓存后端（内存或 SQLite），以 (提示词, LLM 配置) 为键
+    缓存 LLM 的生成结果，并统计命中和未命中次数。通过 ChatOpenAI(cache=...)
+    传入后，RAGAS 各指标发出的相同提示词只会真正调用一次 API。
+    
+    Attributes:
+        backend: 实际存储缓存的 LangChain 缓存实例
+        hits: 缓存命中次数
+        misses: 缓存未命中次数
+    """
+    
+    def __init__(self, backend: Optional[BaseCache] = None):
+        """
+        初始化评测缓存
+        
+        Args:
+            backend: LangChain 缓存后端，默认使用进程内的 InMemoryCache
+        """
+        self.backend = backend if backend is not None else InMemoryCache()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def hit_rate(self) -> float:
+        """缓存命中率，尚无查询时为 0.0"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+    
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """查询缓存并记录命中情况"""
+        value = self.backend.lookup(prompt, llm_string)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+    
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """写入缓存"""
+        self.backend.update(prompt, llm_string, return_val)
+    
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """异步查询缓存（后端查询为本地操作，直接同步执行）"""
+        return self.lookup(prompt, llm_string)
+    
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """异步写入缓存"""
+        self.update(prompt, llm_string, return_val)
+    
+    def clear(self, **kwargs: Any) -> None:
+        """清空缓存并重置统计"""
+        self.backend.clear(**kwargs)
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self) -> dict:
+        """
+        获取缓存统计信息
+        
+        Returns:
+            包含 hits、misses、hit_rate 的字典
+        """
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+
+def create_judge_cache(path: Optional[str] = None) -> JudgeCache:
+    """
+    创建评测缓存
+    
+    Args:
+        path: SQLite 缓存文件路径，提供时缓存可跨多次评测运行复用；
+              None 表示仅在当前进程内缓存
+    
+    Returns:
+        JudgeCache 实例
+    """
+    if not path:
+        return JudgeCache()
+    
+    from langchain_community.cache import SQLiteCache
+    
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    return JudgeCache(SQLiteCache(database_path=path))
@@ -0,0 +1,151 @@
+"""
+Metadata Filter Module
+
+Precomputed per-field bitmap indexes over the documents of a FAISS vector
+store, used to restrict similarity search by document metadata such as the
+source file. Bitmaps are stored bit-packed in FAISS position order so that a
+filter can be handed directly to FAISS as an IDSelectorBitmap. Only an explicit
+list of fields is indexed, since every distinct value costs one bitmap.
+"""
+
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+# 默认只为文档来源建立位图：chunk ID 等高基数字段每个取值都要一个位图，不适合默认索引
+DEFAULT_METADATA_FIELDS = ("source",)
+
+
+class MetadataBitmapIndex:
+    """
+    元数据位图索引
+    
+    为每个元数据字段的每个取值维护一个位图，第 i 位表示 FAISS 中第 i 个向量
+    对应的文档是否具有该取值。位图按 little-endian 位序压缩存储，
+    可以直接作为 faiss.IDSelectorBitmap 使用。
+    
+    过滤谓词格式：
+    - {"source": "a.md"}                  字段等于某个值
+    - {"source": ["a.md", "b.md"]}        字段取值属于列表（OR）
+    - {"source": "a.md", "lang": "zh"}    多个字段之间为 AND
+    
+    每个位图占 size / 8 字节，内存开销为 size × 各字段取值数 / 8，
+    因此只为显式指定的字段建立位图。
+    
+    Attributes:
+        size: 索引覆盖的向量数量
+        fields: 已建立位图的字段名列表
+    """
+    
+    def __init__(self, size: int, fields: Iterable[str] = ()):
+        """
+        初始化空的位图索引
+        
+        Args:
+            size: 索引覆盖的向量数量
+            fields: 建立位图的字段名
+        """
+        self.size = size
+        self._nbytes = (size + 7) // 8
+        self._bitmaps: dict[str, dict[Any, np.ndarray]] = {field: {} for field in fields}
+    
+    @property
+    def fields(self) -> list[str]:
+        """已建立位图的字段名列表"""
+        return list(self._bitmaps)
+    
+    @classmethod
+    def from_store(
+        cls,
+        store,
+        fields: Optional[Iterable[str]] = DEFAULT_METADATA_FIELDS
+    ) -> "MetadataBitmapIndex":
+        """
+        从 LangChain FAISS 向量存储构建位图索引
+        
+        位图直接以压缩形式构建，不为每个取值分配按向量数量展开的布尔数组。
+        
+        Args:
+            store: LangChain FAISS 向量存储实例
+            fields: 需要建立索引的字段，默认 DEFAULT_METADATA_FIELDS；
+                    None 表示所有字段（高基数字段会占用大量内存）
+        
+        Returns:
+            MetadataBitmapIndex 实例
+        """
+        index = cls(store.index.ntotal, fields or ())
+        bitmaps = index._bitmaps
+        
+        for position, doc_id in store.index_to_docstore_id.items():
+            doc = store.docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                continue
+            byte, bit = position >> 3, np.uint8(1 << (position & 7))
+            for field, value in doc.metadata.items():
+                if fields is not None and field not in bitmaps:
+                    continue
+                # 列表类型的取值按元素分别建立索引
+                values = value if isinstance(value, (list, tuple, set)) else [value]
+                for item in values:
+                    try:
+                        hash(item)
+                    except TypeError:
+                        continue
+                    bitmap = bitmaps.setdefault(field, {}).get(item)
+                    if bitmap is None:
+                        bitmap = np.zeros(index._nbytes, dtype=np.uint8)
+                        bitmaps[field][item] = bitmap
+                    bitmap[byte] |= bit
+        return index
+    
+    def evaluate(self, predicates: dict) -> np.ndarray:
+        """
+        计算满足过滤谓词的位图
+        
+        Args:
+            predicates: 过滤谓词字典
+        
+        Returns:
+            压缩位图（uint8 数组，little-endian 位序）
+        
+        Raises:
+            ValueError: 如果 predicates 为空
+            ValueError: 如果谓词中的字段没有建立位图
+        """
+        if not predicates:
+            raise ValueError("Filter predicates cannot be empty")
+        
+        result = None
+        for field, expected in predicates.items():
+            if field not in self._bitmaps:
+                raise ValueError(f"Metadata field is not indexed: {field}")
+            values = expected if isinstance(expected, (list, tuple, set)) else [expected]
+            field_bitmaps = self._bitmaps[field]
+            
+            field_mask = np.zeros(self._nbytes, dtype=np.uint8)
+            for value in values:
+                bitmap = field_bitmaps.get(value)
+                if bitmap is not None:
+                    field_mask |= bitmap
+            
+            result = field_mask if result is None else result & field_mask
+        
+        return result
+    
+    def count(self, bitmap: np.ndarray) -> int:
+        """
+        统计位图中被选中的向量数量
+        
+        Args:
+            bitmap: evaluate 返回的压缩位图
+        
+        Returns:
+            被选中的向量数量
+        """
+        return int(np.unpackbits(bitmap, count=self.size, bitorder="little").sum())
+    
+    def contains(self, bitmap: np.ndarray, position: int) -> bool:
+        """判断第 position 个向量是否被位图选中"""
+        return bool(bitmap[position >> 3] >> (position & 7) & 1)
@@ -1,14 +1,46 @@
 """
 Data Models Module
 
-Contains data models used across the RAGAS evaluation demo.
+Contains data models used across the RAGAS evaluation demo. Models are
+slotted to keep per-instance memory low in large evaluation runs.
 """
 
 from dataclasses import dataclass
-from typing import Optional, Any
+from typing import Callable, Optional, Any
+
+
+@dataclass(slots=True)
+class RerankStats:
+    """
+    重排序统计数据模型
+    
+    记录单次查询中重排序阶段的耗时和提示词 token 节省情况。
+    
+    Attributes:
+        candidate_count: 从向量存储中预取的候选文档数量
+        selected_count: 重排序后保留并传给 LLM 的文档数量
+        rerank_latency_ms: 交叉编码器打分耗时（毫秒）
+        candidate_tokens: 全部候选文档的估算 token 数
+        baseline_tokens: 不重排序时会传给 LLM 的文档（向量检索前 selected_count 个）的估算 token 数
+        selected_tokens: 保留文档的估算 token 数
+    """
+    candidate_count: int
+    selected_count: int
+    rerank_latency_ms: float
+    candidate_tokens: int
+    baseline_tokens: int
+    selected_tokens: int
+    
+    @property
+    def tokens_saved(self) -> int:
+        """
+        相比不重排序（直接使用向量检索前 k 个文档）所节省的 token 数
+        
+        重排序选中的文档更长时为负数。
+        """
+        return self.baseline_tokens - self.selected_tokens
 
 
-@dataclass
 class RAGResponse:
     """
     RAG 响应数据模型
@@ -16,19 +48,144 @@ class RAGResponse:
     包含 RAG 系统查询的完整响应信息，包括问题、答案、
     检索到的上下文文本和原始 LangChain Document 对象。
     
+    为避免同一段上下文文本被保存多份，响应可以只记录文档块在向量存储中的 ID
+    （chunk_ids），在首次访问 source_documents / contexts 时才通过 resolver 从存储中取回，
+    取回的文档随即缓存并释放 resolver。RAGChain 传入的 resolver 绑定到生成响应时的索引版本，
+    取回之前索引被热替换也仍然从那一版取回；
+    也可以直接持有 Document 对象，此时 contexts 由文档内容即时生成。
+    显式传入的 contexts 会原样保留，以兼容旧的构造方式。
+    
     Attributes:
         question: 用户提出的问题
         answer: RAG 系统生成的回答
         contexts: 检索到的上下文文本列表
         source_documents: LangChain Document 对象列表
+        rerank_stats: 重排序统计信息（仅在启用重排序时存在）
+        chunk_ids: 文档块在向量存储中的 ID 列表（仅在按 ID 引用时存在）
     """
-    question: str
-    answer: str
-    contexts: list[str]  # 检索到的上下文文本列表
-    source_documents: list  # LangChain Document 对象
+    __slots__ = ("question", "answer", "rerank_stats", "chunk_ids", "_contexts", "_documents", "_resolver")
+    
+    def __init__(
+        self,
+        question: str,
+        answer: str,
+        contexts: Optional[list[str]] = None,
+        source_documents: Optional[list] = None,
+        rerank_stats: Optional[RerankStats] = None,
+        chunk_ids: Optional[list[str]] = None,
+        resolver: Optional[Callable[[list[str]], list]] = None
+    ):
+        """
+        初始化 RAG 响应
+        
+        Args:
+            question: 用户提出的问题
+            answer: RAG 系统生成的回答
+            contexts: 上下文文本列表，可选（未提供时由文档内容生成）
+            source_documents: LangChain Document 对象列表，可选
+            rerank_stats: 重排序统计信息，可选
+            chunk_ids: 文档块 ID 列表，可选（与 resolver 一起使用）
+            resolver: 根据 ID 列表取回 Document 列表的函数，可选
+        """
+        self.question = question
+        self.answer = answer
+        self.rerank_stats = rerank_stats
+        self.chunk_ids = chunk_ids
+        self._contexts = contexts
+        self._documents = source_documents
+        self._resolver = resolver
+    
+    @classmethod
+    def from_documents(
+        cls,
+        question: str,
+        answer: str,
+        documents: list,
+        rerank_stats: Optional[RerankStats] = None,
+        resolver: Optional[Callable[[list[str]], list]] = None
+    ) -> "RAGResponse":
+        """
+        根据检索到的文档创建响应
+        
+        提供 resolver 且所有文档都带有存储 ID 时只记录 ID，否则持有文档对象。
+        两种方式都不会额外复制上下文文本。
+        
+        Args:
+            question: 用户提出的问题
+            answer: RAG 系统生成的回答
+            documents: 检索到的 Document 列表
+            rerank_stats: 重排序统计信息，可选
+            resolver: 根据 ID 列表取回 Document 列表的函数，可选
+        
+        Returns:
+            RAGResponse 实例
+        """
+        ids = [getattr(doc, "id", None) for doc in documents]
+        if resolver is not None and documents and all(isinstance(i, str) for i in ids):
+            return cls(question, answer, rerank_stats=rerank_stats, chunk_ids=ids, resolver=resolver)
+        return cls(question, answer, source_documents=list(documents), rerank_stats=rerank_stats)
+    
+    @property
+    def source_documents(self) -> list:
+        """
+        LangChain Document 对象列表（按 ID 引用时首次访问从存储中取回并缓存）
+        
+        Raises:
+            LookupError: 如果 resolver 没有取回全部 chunk_ids
+        """
+        if self._documents is not None:
+            return self._documents
+        if self.chunk_ids and self._resolver is not None:
+            documents = self._resolver(self.chunk_ids)
+            if len(documents) != len(self.chunk_ids):
+                raise LookupError(
+                    f"Resolved {len(documents)} of {len(self.chunk_ids)} chunk IDs"
+                )
+            # 只取回一次；释放 resolver（通常是绑定到向量存储的方法），响应因此可以被 pickle
+            self._documents = documents
+            self._resolver = None
+            return documents
+        return []
+    
+    @property
+    def contexts(self) -> list[str]:
+        """检索到的上下文文本列表"""
+        if self._contexts is not None:
+            return self._contexts
+        return [doc.page_content for doc in self.source_documents]
+    
+    def __getstate__(self) -> dict:
+        # pickle 前先取回文档，不序列化 resolver
+        self.source_documents
+        return {name: getattr(self, name) for name in self.__slots__ if name != "_resolver"}
+    
+    def __setstate__(self, state: dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._resolver = None
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RAGResponse):
+            return NotImplemented
+        return (
+            self.question == other.question
+            and self.answer == other.answer
+            and self.contexts == other.contexts
+            and self.rerank_stats == other.rerank_stats
+        )
+    
+    # 与之前的 dataclass（eq=True、未冻结）一致：定义了 __eq__ 的可变对象不可哈希
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return (
+            f"RAGResponse(question={self.question!r}, answer={self.answer!r}, "
+            f"contexts={len(self.contexts)}, chunk_ids={self.chunk_ids!r}, "
+            f"rerank_stats={self.rerank_stats!r})"
+        )
 
 
-@dataclass
+@dataclass(slots=True)
 class EvaluationSample:
     """
     评测样本数据模型
@@ -39,13 +196,15 @@ class EvaluationSample:
         question: 评测问题
         ground_truth: 参考答案（标准答案）
         contexts: 可选的参考上下文列表
+        category: 可选的样本类别，用于快速评测时的分层抽样
     """
     question: str
     ground_truth: str  # 参考答案
     contexts: Optional[list[str]] = None  # 可选的参考上下文
+    category: Optional[str] = None  # 可选的样本类别
 
 
-@dataclass
+@dataclass(slots=True)
 class EvaluationResult:
     """
     评测结果数据模型
@@ -58,9 +217,13 @@ class EvaluationResult:
         context_precision: 上下文精确度指标 (0.0-1.0)
         context_recall: 上下文召回率指标 (0.0-1.0)
         details: 每个样本的详细分数
+        confidence_intervals: 各指标平均分的置信区间（仅快速评测时存在）
+        confidence_level: 置信区间的置信水平
     """
     faithfulness: float
     answer_relevancy: float
     context_precision: float
     context_recall: float
     details: dict  # 每个样本的详细分数
+    confidence_intervals: Optional[dict[str, tuple[float, float]]] = None  # 指标名 -> (下限, 上限)
+    confidence_level: float = 0.95
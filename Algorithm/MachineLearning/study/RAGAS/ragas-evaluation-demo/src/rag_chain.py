@@ -5,12 +5,18 @@ Implements the RAG chain using LangChain RetrievalQA.
 Implements Requirements 4.1, 4.2, 4.3, 4.5.
 """
 
+from typing import TYPE_CHECKING, Optional
+
 from langchain_classic.chains import RetrievalQA
+from langchain_core.documents import Document
 from langchain_openai import ChatOpenAI
 
 from .models import RAGResponse
 from .vector_store import VectorStoreManager
 
+if TYPE_CHECKING:
+    from .reranker import CrossEncoderReranker
+
 
 class RAGChain:
     """
@@ -18,12 +24,16 @@ class RAGChain:
     
     使用 LangChain 的 RetrievalQA 链构建检索增强生成系统。
     支持配置 LLM 模型、API 密钥和检索文档数量。
+    可选地启用交叉编码器重排序：先从向量存储预取 fetch_k 个候选，
+    重排序后只将最相关的 k 个文档传给 LLM。
     
     Attributes:
         llm: ChatOpenAI LLM 实例
-        retriever: VectorStoreRetriever 实例
+        retriever: 绑定到向量存储管理器的 Retriever，索引替换后自动使用新索引
         chain: RetrievalQA 链实例
         k: 检索文档数量
+        reranker: 可选的重排序器实例
+        fetch_k: 启用重排序时预取的候选文档数量
     """
     
     def __init__(
@@ -32,7 +42,9 @@ class RAGChain:
         api_key: str,
         model: str = "gpt-3.5-turbo",
         k: int = 4,
-        base_url: str = None
+        base_url: str = None,
+        reranker: Optional["CrossEncoderReranker"] = None,
+        fetch_k: int = 20
     ):
         """
         初始化 RAG 链
@@ -43,10 +55,13 @@ class RAGChain:
             model: 模型名称，默认 "gpt-3.5-turbo"
             k: 检索文档数量，默认 4
             base_url: API Base URL，可选
+            reranker: 重排序器实例，可选；为 None 时直接使用检索的 top-k
+            fetch_k: 启用重排序时预取的候选文档数量，默认 20
             
         Raises:
             ValueError: 如果 api_key 为空
             ValueError: 如果 k <= 0
+            ValueError: 如果启用重排序且 fetch_k < k
             ValueError: 如果向量存储未初始化
             
         Validates:
@@ -58,10 +73,16 @@ class RAGChain:
         if k <= 0:
             raise ValueError("k must be greater than 0")
         
+        if reranker is not None and fetch_k < k:
+            raise ValueError("fetch_k must be greater than or equal to k")
+        
         if not vector_store_manager.is_initialized:
             raise ValueError("Vector store not initialized. Create or load a vector store first.")
         
         self.k = k
+        self.vector_store_manager = vector_store_manager
+        self.reranker = reranker
+        self.fetch_k = fetch_k
         
         # 初始化 ChatOpenAI LLM
         # Validates Requirement 4.3: 支持配置大模型 API 密钥和模型名称
@@ -70,7 +91,7 @@ class RAGChain:
             llm_kwargs["base_url"] = base_url
         self.llm = ChatOpenAI(**llm_kwargs)
         
-        # 获取 Retriever 接口
+        # 获取 Retriever 接口（每次检索都经过管理器，跟随索引热替换）
         self.retriever = vector_store_manager.as_retriever(k=k)
         
         # 构建 RetrievalQA 链
@@ -106,6 +127,11 @@ class RAGChain:
         if not question or not question.strip():
             raise ValueError("Question cannot be empty")
         
+        if self.reranker is not None:
+            # 预取 fetch_k 个候选，重排序后只保留 k 个传给 LLM
+            candidates = self.vector_store_manager.similarity_search(question, k=self.fetch_k)
+            return self.query_with_candidates(question, candidates)
+        
         # 调用 RetrievalQA 链
         # 这会自动执行：检索相关文档 -> 构建提示词 -> 调用 LLM 生成回答
         result = self.chain.invoke({"query": question})
@@ -113,17 +139,91 @@ class RAGChain:
         # 提取源文档
         source_documents = result.get("source_documents", [])
         
-        # 提取上下文文本列表
-        contexts = [doc.page_content for doc in source_documents]
-        
         # 提取答案
         answer = result.get("result", "")
         
         # 构建并返回 RAGResponse
+        # 上下文文本不单独复制，由源文档（或其在存储中的 ID）按需生成
         # Validates Requirement 4.5: 返回生成的文本回答
-        return RAGResponse(
+        return RAGResponse.from_documents(
+            question=question,
+            answer=answer,
+            documents=source_documents,
+            resolver=self._resolver(source_documents)
+        )
+    
+    @property
+    def candidate_k(self) -> int:
+        """检索阶段需要获取的候选文档数量（启用重排序时为 fetch_k，否则为 k）"""
+        return self.fetch_k if self.reranker is not None else self.k
+    
+    def query_with_candidates(self, question: str, candidates: list[Document]) -> RAGResponse:
+        """
+        基于已检索的候选文档生成回答
+        
+        供调用方自行完成检索（例如查询服务的批量检索）后使用：
+        启用重排序时先对候选重排序并保留 k 个，否则直接取前 k 个，
+        再使用与 RetrievalQA 相同的提示词调用 LLM。
+        
+        Args:
+            question: 用户问题
+            candidates: 按相似度降序排列的候选文档列表
+        
+        Returns:
+            RAGResponse 包含答案和上下文
+        
+        Raises:
+            ValueError: 如果 question 为空
+        """
+        if not question or not question.strip():
+            raise ValueError("Question cannot be empty")
+        
+        rerank_stats = None
+        if self.reranker is not None:
+            source_documents, rerank_stats = self.reranker.rerank(question, candidates, top_n=self.k)
+        else:
+            source_documents = candidates[:self.k]
+        
+        answer = self._generate(question, source_documents)
+        
+        return RAGResponse.from_documents(
             question=question,
             answer=answer,
-            contexts=contexts,
-            source_documents=source_documents
+            documents=source_documents,
+            rerank_stats=rerank_stats,
+            resolver=self._resolver(source_documents)
         )
+    
+    def _resolver(self, documents: list[Document]):
+        """
+        获取按 ID 取回文档的函数，用于让响应只引用文档块 ID
+        
+        取回器绑定到当前索引版本。检索之后索引可能已被热替换，
+        因此只有当前版本确实包含这些文档时才使用它，否则响应直接持有文档。
+        """
+        document_resolver = getattr(self.vector_store_manager, "document_resolver", None)
+        resolver = document_resolver() if document_resolver is not None else None
+        if resolver is None or not resolver.covers(documents):
+            return None
+        return resolver
+    
+    def _generate(self, question: str, documents: list[Document]) -> str:
+        """
+        基于给定文档生成回答
+        
+        跳过 RetrievalQA 的检索步骤，直接使用链内部的文档合并链
+        （与 RetrievalQA 相同的 "stuff" 提示词）调用 LLM。
+        
+        Args:
+            question: 用户问题
+            documents: 作为上下文的文档列表
+        
+        Returns:
+            LLM 生成的回答文本
+        """
+        combine_chain = self.chain.combine_documents_chain
+        result = combine_chain.invoke({
+            combine_chain.input_key: documents,
+            "question": question
+        })
+        return result.get(combine_chain.output_key, "")
@@ -0,0 +1,194 @@
+"""
+Reranker Module
+
+Implements an optional cross-encoder re-ranking stage for the RAG chain.
+Candidates over-fetched from the vector store are scored against the question
+by a local cross-encoder on CPU, and only the best few are passed to the LLM.
+"""
+
+import time
+from typing import Optional
+
+from langchain_core.documents import Document
+
+from .models import RerankStats
+
+
+_tokenizer = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数
+    
+    优先使用 tiktoken 的 cl100k_base 编码；如果 tiktoken 不可用
+    （例如离线环境无法下载编码文件），则按经验规则估算：
+    CJK 字符每字计 1 个 token，其余字符每 4 个计 1 个 token。
+    
+    Args:
+        text: 待估算的文本
+    
+    Returns:
+        估算的 token 数
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            import tiktoken
+            _tokenizer = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _tokenizer = False
+    
+    if _tokenizer:
+        return len(_tokenizer.encode(text))
+    
+    cjk = sum(1 for ch in text if "一" <= ch <= "鿿")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class CrossEncoderReranker:
+    """
+    交叉编码器重排序器
+    
+    使用 sentence-transformers 的 CrossEncoder 对 (问题, 文档) 对进行打分，
+    按分数降序保留前 top_n 个文档。模型在首次使用时才加载，并固定运行在 CPU 上。
+    
+    Attributes:
+        model_name: 交叉编码器模型名称
+        batch_size: 打分时每批处理的 (问题, 文档) 对数量
+        max_length: 输入序列的最大长度
+        device: 推理设备，默认 "cpu"
+    """
+    
+    def __init__(
+        self,
+        model_name: str = "BAAI/bge-reranker-base",
+        batch_size: int = 16,
+        max_length: int = 512,
+        device: str = "cpu"
+    ):
+        """
+        初始化重排序器
+        
+        Args:
+            model_name: 交叉编码器模型名称，默认 "BAAI/bge-reranker-base"（支持中英文）
+            batch_size: 打分批大小，默认 16
+            max_length: 输入序列最大长度，默认 512
+            device: 推理设备，默认 "cpu"
+        
+        Raises:
+            ValueError: 如果 model_name 为空
+            ValueError: 如果 batch_size <= 0
+        """
+        if not model_name or not model_name.strip():
+            raise ValueError("Model name cannot be empty")
+        
+        if batch_size <= 0:
+            raise ValueError("batch_size must be greater than 0")
+        
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.device = device
+        self._model = None
+    
+    def _get_model(self):
+        """获取交叉编码器模型实例（首次调用时加载）"""
+        if self._model is None:
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError as e:
+                raise ImportError(
+                    "Re-ranking requires sentence-transformers. "
+                    "Install it with: pip install sentence-transformers"
+                ) from e
+            self._model = CrossEncoder(
+                self.model_name,
+                max_length=self.max_length,
+                device=self.device
+            )
+        return self._model
+    
+    def score(self, query: str, documents: list[Document]) -> list[float]:
+        """
+        为每个文档计算与查询的相关性分数
+        
+        Args:
+            query: 查询文本
+            documents: 候选文档列表
+        
+        Returns:
+            与 documents 一一对应的分数列表，分数越高表示越相关
+        """
+        if not documents:
+            return []
+        
+        pairs = [(query, doc.page_content) for doc in documents]
+        scores = self._get_model().predict(
+            pairs,
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        )
+        return [float(s) for s in scores]
+    
+    def rerank(
+        self,
+        query: str,
+        documents: list[Document],
+        top_n: int
+    ) -> tuple[list[Document], RerankStats]:
+        """
+        对候选文档重排序并保留最相关的 top_n 个
+        
+        Args:
+            query: 查询文本
+            documents: 候选文档列表（通常是向量检索的预取结果）
+            top_n: 保留的文档数量
+        
+        Returns:
+            元组 (重排序后的文档列表, RerankStats)
+        
+        Raises:
+            ValueError: 如果 top_n <= 0
+        """
+        if top_n <= 0:
+            raise ValueError("top_n must be greater than 0")
+        
+        start = time.perf_counter()
+        scores = self.score(query, documents)
+        latency_ms = (time.perf_counter() - start) * 1000
+        
+        # 按分数降序排列，分数相同时保持原有的向量检索顺序
+        order = sorted(range(len(documents)), key=lambda i: -scores[i])
+        selected = [documents[i] for i in order[:top_n]]
+        
+        stats = RerankStats(
+            candidate_count=len(documents),
+            selected_count=len(selected),
+            rerank_latency_ms=latency_ms,
+            candidate_tokens=sum(estimate_tokens(doc.page_content) for doc in documents),
+            # 不重排序时提示词里是向量检索顺序的前 top_n 个文档
+            baseline_tokens=sum(estimate_tokens(doc.page_content) for doc in documents[:top_n]),
+            selected_tokens=sum(estimate_tokens(doc.page_content) for doc in selected),
+        )
+        return selected, stats
+
+
+def create_reranker(config: dict) -> Optional[CrossEncoderReranker]:
+    """
+    根据 retrieval.rerank 配置创建重排序器
+    
+    Args:
+        config: retrieval.rerank 配置字典
+    
+    Returns:
+        启用时返回 CrossEncoderReranker 实例，否则返回 None
+    """
+    if not config or not config.get("enabled", False):
+        return None
+    
+    return CrossEncoderReranker(
+        model_name=config.get("model", "BAAI/bge-reranker-base"),
+        batch_size=config.get("batch_size", 16),
+        max_length=config.get("max_length", 512),
+    )
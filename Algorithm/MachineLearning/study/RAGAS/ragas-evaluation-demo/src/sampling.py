@@ -0,0 +1,126 @@
+"""
+Sampling Module
+
+Helpers for the quick evaluation mode: stratified sampling of evaluation
+samples by category and bootstrap confidence intervals for metric means.
+"""
+
+import math
+import random
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+
+from .models import EvaluationSample
+
+
+def stratified_order(samples: list[EvaluationSample], seed: Optional[int] = None) -> list[EvaluationSample]:
+    """
+    生成分层随机排列
+    
+    按 category 对样本分层，层内随机打乱，再依次从"当前占比最不足"的层中取样。
+    返回序列的任意前缀都近似保持各类别在完整数据集中的比例，
+    因此既可以直接截取前 n 个作为分层样本，也可以按顺序逐步追加样本。
+    
+    Args:
+        samples: 评测样本列表
+        seed: 随机种子，None 表示不固定
+    
+    Returns:
+        重新排列后的样本列表（包含全部样本）
+    """
+    rng = random.Random(seed)
+    strata: dict[Optional[str], list[EvaluationSample]] = defaultdict(list)
+    for sample in samples:
+        strata[sample.category].append(sample)
+    for members in strata.values():
+        rng.shuffle(members)
+    
+    total = len(samples)
+    taken = {key: 0 for key in strata}
+    order = []
+    for step in range(1, total + 1):
+        # 选取实际取样数与按比例应取数量差距最大的层
+        key = max(
+            (key for key in strata if taken[key] < len(strata[key])),
+            key=lambda key: step * len(strata[key]) / total - taken[key]
+        )
+        order.append(strata[key][taken[key]])
+        taken[key] += 1
+    return order
+
+
+def stratified_sample(
+    samples: list[EvaluationSample],
+    size: int,
+    seed: Optional[int] = None
+) -> list[EvaluationSample]:
+    """
+    分层随机抽样
+    
+    Args:
+        samples: 评测样本列表
+        size: 抽样数量，超过样本总数时返回全部样本
+        seed: 随机种子
+    
+    Returns:
+        抽样得到的样本列表，各类别比例与完整数据集近似一致
+    
+    Raises:
+        ValueError: 如果 size <= 0
+    """
+    if size <= 0:
+        raise ValueError("Sample size must be greater than 0")
+    
+    return stratified_order(samples, seed)[:size]
+
+
+def bootstrap_intervals(
+    details: list[dict],
+    metrics: list[str],
+    confidence: float = 0.95,
+    n_resamples: int = 1000,
+    seed: Optional[int] = None
+) -> dict[str, tuple[float, float]]:
+    """
+    用 bootstrap 百分位法估计各指标平均分的置信区间
+    
+    Args:
+        details: 逐样本分数记录列表（EvaluationResult.details）
+        metrics: 需要计算区间的指标名
+        confidence: 置信水平，默认 0.95
+        n_resamples: bootstrap 重采样次数，默认 1000
+        seed: 随机种子
+    
+    Returns:
+        指标名到 (下限, 上限) 的字典；没有有效分数的指标不包含在内
+    
+    Raises:
+        ValueError: 如果 confidence 不在 (0, 1) 区间内
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+    
+    rng = np.random.default_rng(seed)
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for name in metrics:
+        values = np.array([
+            float(record[name]) for record in details
+            if record.get(name) is not None and not math.isnan(float(record[name]))
+        ])
+        if len(values) == 0:
+            continue
+        
+        means = values[rng.integers(0, len(values), size=(n_resamples, len(values)))].mean(axis=1)
+        low, high = np.quantile(means, [alpha, 1 - alpha])
+        intervals[name] = (float(low), float(high))
+    return intervals
+
+
+def max_interval_width(intervals: dict[str, tuple[float, float]]) -> float:
+    """返回所有指标中最宽的置信区间宽度，没有区间时为无穷大"""
+    if not intervals:
+        return math.inf
+    return max(high - low for low, high in intervals.values())
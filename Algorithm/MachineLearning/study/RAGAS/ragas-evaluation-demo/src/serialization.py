@@ -0,0 +1,221 @@
+"""
+Serialization Module
+
+Compact Arrow serialization for batches of RAG responses and evaluation
+samples. Responses that reference chunk IDs are stored as IDs only, so
+context text is not written out again for every response. Files use the
+Arrow IPC format with zstd compression.
+
+pyarrow is optional: it is imported on first use, so importing this module
+does not require it.
+"""
+
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional
+
+from .models import EvaluationSample, RAGResponse, RerankStats
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+
+def _pyarrow():
+    """导入 pyarrow（首次使用 Arrow 格式时）"""
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError as e:
+        raise ImportError(
+            "Arrow serialization requires pyarrow. "
+            "Install it with: pip install pyarrow"
+        ) from e
+    return pa
+
+
+@lru_cache(maxsize=None)
+def _schemas() -> dict:
+    """构建 Arrow 类型和表结构（只构建一次）"""
+    pa = _pyarrow()
+    rerank_stats_type = pa.struct([
+        ("candidate_count", pa.int32()),
+        ("selected_count", pa.int32()),
+        ("rerank_latency_ms", pa.float64()),
+        ("candidate_tokens", pa.int32()),
+        ("baseline_tokens", pa.int32()),
+        ("selected_tokens", pa.int32()),
+    ])
+    return {
+        "RERANK_STATS_TYPE": rerank_stats_type,
+        "RESPONSE_SCHEMA": pa.schema([
+            ("question", pa.string()),
+            ("answer", pa.string()),
+            # 按 ID 引用的响应只写入 chunk_ids，否则写入 contexts
+            ("chunk_ids", pa.list_(pa.string())),
+            ("contexts", pa.list_(pa.string())),
+            ("rerank_stats", rerank_stats_type),
+        ]),
+        "SAMPLE_SCHEMA": pa.schema([
+            ("question", pa.string()),
+            ("ground_truth", pa.string()),
+            ("contexts", pa.list_(pa.string())),
+            ("category", pa.dictionary(pa.int32(), pa.string())),
+        ]),
+    }
+
+
+def __getattr__(name: str):
+    # RERANK_STATS_TYPE / RESPONSE_SCHEMA / SAMPLE_SCHEMA 在首次访问时才构建
+    if name in ("RERANK_STATS_TYPE", "RESPONSE_SCHEMA", "SAMPLE_SCHEMA"):
+        return _schemas()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def responses_to_table(responses: list[RAGResponse]) -> "pa.Table":
+    """
+    将 RAG 响应批量转换为 Arrow 表
+    
+    Args:
+        responses: RAGResponse 列表
+    
+    Returns:
+        符合 RESPONSE_SCHEMA 的 Arrow 表
+    """
+    pa = _pyarrow()
+    chunk_ids = [r.chunk_ids if r.chunk_ids else None for r in responses]
+    return pa.table({
+        "question": [r.question for r in responses],
+        "answer": [r.answer for r in responses],
+        "chunk_ids": chunk_ids,
+        "contexts": [None if ids else r.contexts for r, ids in zip(responses, chunk_ids)],
+        "rerank_stats": [
+            {
+                "candidate_count": r.rerank_stats.candidate_count,
+                "selected_count": r.rerank_stats.selected_count,
+                "rerank_latency_ms": r.rerank_stats.rerank_latency_ms,
+                "candidate_tokens": r.rerank_stats.candidate_tokens,
+                "baseline_tokens": r.rerank_stats.baseline_tokens,
+                "selected_tokens": r.rerank_stats.selected_tokens,
+            } if r.rerank_stats is not None else None
+            for r in responses
+        ],
+    }, schema=_schemas()["RESPONSE_SCHEMA"])
+
+
+def table_to_responses(
+    table: "pa.Table",
+    resolver: Optional[Callable[[list[str]], list]] = None
+) -> list[RAGResponse]:
+    """
+    将 Arrow 表还原为 RAG 响应列表
+    
+    Args:
+        table: responses_to_table 生成的 Arrow 表
+        resolver: 根据 ID 列表取回 Document 列表的函数，按 ID 引用的响应需要它来取回文本
+    
+    Returns:
+        RAGResponse 列表
+    """
+    responses = []
+    for row in table.to_pylist():
+        stats = row["rerank_stats"]
+        responses.append(RAGResponse(
+            question=row["question"],
+            answer=row["answer"],
+            contexts=row["contexts"],
+            rerank_stats=RerankStats(**stats) if stats is not None else None,
+            chunk_ids=row["chunk_ids"],
+            resolver=resolver,
+        ))
+    return responses
+
+
+def samples_to_table(samples: list[EvaluationSample]) -> "pa.Table":
+    """
+    将评测样本批量转换为 Arrow 表（category 使用字典编码）
+    
+    Args:
+        samples: EvaluationSample 列表
+    
+    Returns:
+        符合 SAMPLE_SCHEMA 的 Arrow 表
+    """
+    pa = _pyarrow()
+    return pa.table({
+        "question": [s.question for s in samples],
+        "ground_truth": [s.ground_truth for s in samples],
+        "contexts": [s.contexts for s in samples],
+        "category": pa.array([s.category for s in samples], pa.string()).dictionary_encode(),
+    }, schema=_schemas()["SAMPLE_SCHEMA"])
+
+
+def table_to_samples(table: "pa.Table") -> list[EvaluationSample]:
+    """
+    将 Arrow 表还原为评测样本列表
+    
+    Args:
+        table: samples_to_table 生成的 Arrow 表
+    
+    Returns:
+        EvaluationSample 列表
+    """
+    return [EvaluationSample(**row) for row in table.to_pylist()]
+
+
+def write_table(path: str, table: "pa.Table") -> None:
+    """
+    以 zstd 压缩的 Arrow IPC 格式写入表
+    
+    Args:
+        path: 输出文件路径
+        table: Arrow 表
+    """
+    pa = _pyarrow()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.ipc.new_file(path, table.schema, options=options) as writer:
+        writer.write_table(table)
+
+
+def read_table(path: str) -> "pa.Table":
+    """
+    读取 Arrow IPC 文件
+    
+    Args:
+        path: 文件路径
+    
+    Returns:
+        Arrow 表
+    
+    Raises:
+        FileNotFoundError: 如果文件不存在
+    """
+    if not Path(path).exists():
+        raise FileNotFoundError(f"Arrow file not found: {path}")
+    
+    pa = _pyarrow()
+    with pa.OSFile(path, "rb") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def write_responses(path: str, responses: list[RAGResponse]) -> None:
+    """将 RAG 响应批量写入 Arrow 文件"""
+    write_table(path, responses_to_table(responses))
+
+
+def read_responses(
+    path: str,
+    resolver: Optional[Callable[[list[str]], list]] = None
+) -> list[RAGResponse]:
+    """从 Arrow 文件读取 RAG 响应"""
+    return table_to_responses(read_table(path), resolver)
+
+
+def write_samples(path: str, samples: list[EvaluationSample]) -> None:
+    """将评测样本批量写入 Arrow 文件"""
+    write_table(path, samples_to_table(samples))
+
+
+def read_samples(path: str) -> list[EvaluationSample]:
+    """从 Arrow 文件读取评测样本"""
+    return table_to_samples(read_table(path))
@@ -0,0 +1,478 @@
+"""
+RAG Query Server Module
+
+Long-running HTTP query service around RAGChain.
+
+The persisted vector store is loaded once as a read-only memory-mapped FAISS
+index before the worker processes are forked, so every worker serves queries
+from the same shared page-cache pages. Within a worker, concurrent retrieval
+requests are coalesced into a single embedding call and FAISS matrix search.
+A background watcher reloads the index when a new one is saved.
+
+Endpoints:
+- POST /query   {"question": "..."} -> answer, contexts and timings
+- GET  /health  -> worker pid, index version and batching statistics
+"""
+
+import json
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+from langchain_core.documents import Document
+
+from .rag_chain import RAGChain
+from .vector_store import file_stamps, read_generation
+
+
+class QueryBatcher:
+    """
+    检索请求批处理器
+    
+    收集并发到达的检索请求，在 max_wait_ms 时间窗口内凑成一批（最多
+    max_batch_size 条），通过一次批量检索完成。同一批中 k 不同的请求
+    按最大 k 检索后各自截取。
+    
+    Attributes:
+        search_fn: 批量检索函数 (queries, k) -> list[list[Document]]
+        max_batch_size: 每批最大请求数
+        max_wait_ms: 凑批的最长等待时间（毫秒）
+        batch_count: 已执行的批次数
+        request_count: 已处理的请求数
+    """
+    
+    def __init__(
+        self,
+        search_fn: Callable[[list[str], int], list[list[Document]]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0
+    ):
+        """
+        初始化批处理器
+        
+        Args:
+            search_fn: 批量检索函数
+            max_batch_size: 每批最大请求数，默认 16
+            max_wait_ms: 凑批的最长等待时间（毫秒），默认 5
+        
+        Raises:
+            ValueError: 如果 max_batch_size <= 0 或 max_wait_ms < 0
+        """
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be greater than 0")
+        
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must be non-negative")
+        
+        self.search_fn = search_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batch_count = 0
+        self.request_count = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        """启动后台批处理线程"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """停止后台批处理线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def submit(self, query: str, k: int) -> list[Document]:
+        """
+        提交一个检索请求并等待结果
+        
+        Args:
+            query: 查询文本
+            k: 返回结果数量
+        
+        Returns:
+            相关文档列表
+        
+        Raises:
+            RuntimeError: 如果批处理线程未启动
+        """
+        if self._thread is None:
+            raise RuntimeError("QueryBatcher is not running. Call start() first.")
+        
+        future: Future = Future()
+        self._queue.put((query, k, future))
+        return future.result()
+    
+    def _run(self) -> None:
+        """批处理主循环"""
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            self._execute(batch)
+    
+    def _execute(self, batch: list[tuple[str, int, Future]]) -> None:
+        """执行一批检索并分发结果"""
+        queries = [query for query, _, _ in batch]
+        max_k = max(k for _, k, _ in batch)
+        try:
+            results = self.search_fn(queries, max_k)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        
+        self.batch_count += 1
+        self.request_count += len(batch)
+        for (_, k, future), documents in zip(batch, results):
+            future.set_result(documents[:k])
+
+
+class IndexWatcher:
+    """
+    索引文件监视器
+    
+    定期检查持久化目录中的代际标记（VectorStoreManager.save 最后写入）；
+    没有标记的旧目录退回检查 index.faiss / index.pkl 的修改时间和大小。
+    只有在签名变化且连续两次检查保持不变（即写入已完成）后才触发
+    on_change 回调，避免加载写了一半的索引。
+    
+    Attributes:
+        path: 向量存储持久化目录
+        on_change: 索引更新后的回调函数
+        interval: 检查间隔（秒）
+    """
+    
+    def __init__(self, path: str, on_change: Callable[[], None], interval: float = 2.0):
+        """
+        初始化索引文件监视器
+        
+        Args:
+            path: 向量存储持久化目录
+            on_change: 索引更新后的回调函数
+            interval: 检查间隔（秒），默认 2.0
+        """
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def signature(self) -> Optional[tuple]:
+        """返回索引的签名（代际序号，或各文件的 mtime_ns/size），文件不完整时返回 None"""
+        marker = read_generation(self.path)
+        if marker is not None:
+            return ("generation", marker["generation"])
+        stamps = file_stamps(self.path)
+        if stamps is None:
+            return None
+        return tuple(tuple(stamp) for stamp in stamps.values())
+    
+    def start(self) -> None:
+        """启动后台监视线程"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="index-watcher", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """停止后台监视线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self) -> None:
+        """监视主循环"""
+        current = self.signature()
+        pending = None
+        while not self._stop.wait(self.interval):
+            latest = self.signature()
+            if latest is None or latest == current:
+                pending = None
+                continue
+            if latest != pending:
+                # 文件刚发生变化，等待下一次检查确认写入已完成
+                pending = latest
+                continue
+            try:
+                self.on_change()
+            except Exception as e:
+                print(f"⚠️  索引热加载失败，继续使用当前索引: {e}")
+            current = latest
+            pending = None
+
+
+class RAGQueryService:
+    """
+    RAG 查询服务
+    
+    封装 RAGChain，检索阶段通过 QueryBatcher 合并并发请求，
+    并在持久化索引更新后热加载新索引。
+    
+    Attributes:
+        rag_chain: RAG 链实例
+        vector_store_manager: 向量存储管理器（与 rag_chain 共享）
+        index_path: 持久化索引目录，为 None 时不启用热加载
+        batcher: 检索请求批处理器
+    """
+    
+    def __init__(
+        self,
+        rag_chain: RAGChain,
+        index_path: Optional[str] = None,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        reload_interval: float = 2.0
+    ):
+        """
+        初始化查询服务
+        
+        Args:
+            rag_chain: RAG 链实例
+            index_path: 持久化索引目录，可选；提供时启用热加载
+            max_batch_size: 检索批处理的最大批大小，默认 16
+            max_wait_ms: 检索批处理的最长等待时间（毫秒），默认 5
+            reload_interval: 索引文件检查间隔（秒），默认 2.0
+        """
+        self.rag_chain = rag_chain
+        self.vector_store_manager = rag_chain.vector_store_manager
+        self.index_path = index_path
+        self.started_at = time.time()
+        self.batcher = QueryBatcher(
+            self.vector_store_manager.batch_similarity_search,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms
+        )
+        self.watcher = None
+        if index_path:
+            self.watcher = IndexWatcher(index_path, self.reload, interval=reload_interval)
+    
+    def start(self) -> None:
+        """启动后台线程（在每个工作进程 fork 之后调用）"""
+        self.batcher.start()
+        if self.watcher is not None:
+            self.watcher.start()
+    
+    def stop(self) -> None:
+        """停止后台线程"""
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.batcher.stop()
+    
+    @property
+    def index_version(self) -> int:
+        """当前索引版本号"""
+        return self.vector_store_manager.version
+    
+    def reload(self) -> None:
+        """
+        重新加载持久化索引
+        
+        新索引在后台线程中完整加载后原子替换当前索引；加载期间以及
+        正在执行的检索继续使用旧索引，旧索引在在途查询结束后释放。
+        """
+        version = self.vector_store_manager.load_async(self.index_path, mmap=True).result()
+        print(f"🔄 [pid {os.getpid()}] 已热加载索引 (版本 {version})")
+    
+    def query(self, question: str) -> dict:
+        """
+        处理一次查询
+        
+        Args:
+            question: 用户问题
+        
+        Returns:
+            包含答案、上下文和耗时信息的字典
+        
+        Raises:
+            ValueError: 如果 question 为空
+        """
+        if not question or not question.strip():
+            raise ValueError("Question cannot be empty")
+        
+        start = time.perf_counter()
+        candidates = self.batcher.submit(question, self.rag_chain.candidate_k)
+        retrieval_ms = (time.perf_counter() - start) * 1000
+        
+        response = self.rag_chain.query_with_candidates(question, candidates)
+        total_ms = (time.perf_counter() - start) * 1000
+        
+        result = {
+            "question": response.question,
+            "answer": response.answer,
+            "contexts": response.contexts,
+            "sources": [doc.metadata.get("source") for doc in response.source_documents],
+            "retrieval_ms": round(retrieval_ms, 2),
+            "latency_ms": round(total_ms, 2),
+        }
+        if response.rerank_stats is not None:
+            result["rerank_latency_ms"] = round(response.rerank_stats.rerank_latency_ms, 2)
+            result["prompt_tokens_saved"] = response.rerank_stats.tokens_saved
+        return result
+    
+    def health(self) -> dict:
+        """
+        返回服务健康状态
+        
+        Returns:
+            包含进程号、索引版本、文档数量和批处理统计的字典
+        """
+        batches = self.batcher.batch_count
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "index_version": self.index_version,
+            "retiring_indexes": self.vector_store_manager.retiring_count,
+            "document_count": self.vector_store_manager.get_document_count(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "retrieval_batches": batches,
+            "avg_batch_size": round(self.batcher.request_count / batches, 2) if batches else 0.0,
+        }
+
+
+class RAGRequestHandler(BaseHTTPRequestHandler):
+    """HTTP 请求处理器，将 /query 和 /health 转发给 RAGQueryService"""
+    
+    server_version = "RAGQueryServer/0.1"
+    
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, self.server.service.health())
+        else:
+            self._send_json(404, {"error": f"Not found: {self.path}"})
+    
+    def do_POST(self):
+        if self.path != "/query":
+            self._send_json(404, {"error": f"Not found: {self.path}"})
+            return
+        
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            question = payload.get("question") if isinstance(payload, dict) else None
+            if not isinstance(question, str) or not question.strip():
+                raise ValueError("'question' must be a non-empty string")
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        
+        try:
+            self._send_json(200, self.server.service.query(question))
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+    
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class RAGHTTPServer(ThreadingHTTPServer):
+    """绑定了 RAGQueryService 的多线程 HTTP 服务器"""
+    
+    daemon_threads = True
+    
+    def __init__(self, server_address, service: RAGQueryService):
+        super().__init__(server_address, RAGRequestHandler)
+        self.service = service
+    
+    def get_request(self):
+        """接受连接，并把连接套接字设回阻塞模式"""
+        conn, addr = super().get_request()
+        # 多进程模式下监听套接字是非阻塞的，BSD/macOS 上 accept 得到的套接字会继承
+        # O_NONBLOCK，处理请求时读取会抛出 BlockingIOError
+        conn.setblocking(True)
+        return conn, addr
+
+
+def serve(service: RAGQueryService, host: str = "127.0.0.1", port: int = 8000, workers: int = 1) -> None:
+    """
+    启动查询服务
+    
+    父进程绑定监听端口后 fork 出 workers 个工作进程，所有工作进程在同一个
+    监听套接字上接受连接。索引应在调用前以 mmap 方式加载，fork 后各进程
+    共享同一份只读页。不支持 fork 的平台（如 Windows）退化为单进程。
+    
+    Args:
+        service: 已加载索引的查询服务
+        host: 监听地址，默认 "127.0.0.1"
+        port: 监听端口，默认 8000
+        workers: 工作进程数量，默认 1
+    """
+    httpd = RAGHTTPServer((host, port), service)
+    
+    if workers <= 1 or not hasattr(os, "fork"):
+        service.start()
+        print(f"🚀 RAG 查询服务已启动: http://{host}:{port} (单进程)")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.stop()
+            httpd.server_close()
+        return
+    
+    # 非阻塞监听套接字：多个进程同时被唤醒时，未抢到连接的进程不会阻塞在 accept 上
+    httpd.socket.setblocking(False)
+    
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            service.start()
+            try:
+                httpd.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+    
+    print(f"🚀 RAG 查询服务已启动: http://{host}:{port} ({workers} 个工作进程)")
+    
+    def shutdown(signum, frame):
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    
+    for child in children:
+        try:
+            os.waitpid(child, 0)
+        except ChildProcessError:
+            pass
+    httpd.server_close()
@@ -0,0 +1,321 @@
+"""
+Sweep Module
+
+Runs a grid of retrieval configurations (chunk_size, chunk_overlap, k) against
+the evaluation dataset and compares them. Work is shared across configs:
+documents are loaded once, each distinct chunking is embedded once, retrieval
+runs once per chunking at the largest k and is sliced for smaller k, and the
+judge-LLM prompt cache is shared by all evaluations.
+"""
+
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from langchain_core.documents import Document
+
+from .dataset_stream import SampleError, iter_samples
+from .document_processor import DocumentProcessor
+from .evaluator import METRIC_NAMES, RagasEvaluator
+from .judge_cache import create_judge_cache
+from .models import EvaluationResult, EvaluationSample
+from .rag_chain import RAGChain
+from .reranker import estimate_tokens
+from .vector_store import VectorStoreManager
+
+
+@dataclass(slots=True, frozen=True)
+class SweepConfig:
+    """
+    单个检索配置
+    
+    Attributes:
+        chunk_size: 每个块的最大字符数
+        chunk_overlap: 块之间的重叠字符数
+        k: 检索返回的文档数量
+    """
+    chunk_size: int
+    chunk_overlap: int
+    k: int
+    
+    @property
+    def chunking(self) -> tuple[int, int]:
+        """分块参数 (chunk_size, chunk_overlap)，相同分块的配置共享同一个索引"""
+        return (self.chunk_size, self.chunk_overlap)
+    
+    @property
+    def name(self) -> str:
+        """配置的简短名称"""
+        return f"size={self.chunk_size} overlap={self.chunk_overlap} k={self.k}"
+
+
+@dataclass(slots=True)
+class SweepResult:
+    """
+    单个配置的评测结果
+    
+    Attributes:
+        config: 检索配置
+        result: RAGAS 评测结果
+        chunk_count: 该分块方式产生的文档块数量
+        retrieval_ms: 平均每个问题的检索耗时（毫秒，按共享的批量检索分摊）
+        generation_ms: 平均每个问题的生成耗时（毫秒）
+        embedding_tokens: 为该分块方式嵌入文档块消耗的估算 token 数（同一分块的配置共享）
+        prompt_tokens: 全部问题放入提示词的上下文估算 token 数
+    """
+    config: SweepConfig
+    result: EvaluationResult
+    chunk_count: int
+    retrieval_ms: float
+    generation_ms: float
+    embedding_tokens: int
+    prompt_tokens: int
+    
+    @property
+    def average_score(self) -> float:
+        """四项指标的平均分"""
+        return sum(getattr(self.result, name) for name in METRIC_NAMES) / len(METRIC_NAMES)
+
+
+@dataclass(slots=True)
+class _SharedIndex:
+    """同一分块方式下所有配置共享的索引和检索结果"""
+    vector_store: VectorStoreManager
+    chunk_count: int
+    candidates: list[list[Document]]
+    retrieval_ms: float
+    embedding_tokens: int
+
+
+def expand_grid(chunk_sizes: list[int], chunk_overlaps: list[int], ks: list[int]) -> list[SweepConfig]:
+    """
+    展开配置网格
+    
+    Args:
+        chunk_sizes: chunk_size 取值列表
+        chunk_overlaps: chunk_overlap 取值列表
+        ks: k 取值列表
+    
+    Returns:
+        SweepConfig 列表，跳过 chunk_overlap >= chunk_size 的无效组合
+    """
+    return [
+        SweepConfig(chunk_size=size, chunk_overlap=overlap, k=k)
+        for size in chunk_sizes
+        for overlap in chunk_overlaps
+        if overlap < size
+        for k in ks
+    ]
+
+
+class SweepRunner:
+    """
+    多配置检索参数扫描
+    
+    对一组 SweepConfig 运行完整的 检索 -> 生成 -> RAGAS 评测 流程，并在配置之间共享工作：
+    - 文档只加载一次，每种分块方式只分块、嵌入一次
+    - 每种分块方式只以最大的 k 批量检索一次，较小的 k 直接截取前 k 个结果
+    - 所有配置共享评测 LLM 的提示词缓存
+    
+    不同分块方式的建索引和各配置的生成、评测在线程池中并行执行。
+    
+    Attributes:
+        documents_path: 文档目录
+        dataset_path: 评测数据集路径
+        max_workers: 并行执行的配置数
+    """
+    
+    def __init__(
+        self,
+        documents_path: str,
+        dataset_path: str,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        model: str = "gpt-3.5-turbo",
+        embedding_model: str = "text-embedding-v4",
+        glob: str = "**/*.md",
+        max_workers: int = 4,
+        cache_path: Optional[str] = None,
+        evaluator_options: Optional[dict] = None
+    ):
+        """
+        初始化扫描器
+        
+        Args:
+            documents_path: 文档目录
+            dataset_path: 评测数据集路径
+            api_key: OpenAI API 密钥（可选，默认从环境变量读取）
+            base_url: API Base URL（可选）
+            model: 生成和评测使用的 LLM 模型
+            embedding_model: Embedding 模型
+            glob: 文档匹配模式，默认 "**/*.md"
+            max_workers: 并行执行的配置数，默认 4
+            cache_path: 评测 LLM 缓存的 SQLite 文件路径，可选
+            evaluator_options: 传给 RagasEvaluator 的其他参数（如 max_workers、batch_size）
+        
+        Raises:
+            ValueError: 如果 max_workers <= 0
+        """
+        if max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+        
+        self.documents_path = documents_path
+        self.dataset_path = dataset_path
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.embedding_model = embedding_model
+        self.glob = glob
+        self.max_workers = max_workers
+        self.evaluator_options = evaluator_options or {}
+        self._judge_cache = create_judge_cache(cache_path)
+    
+    def run(self, configs: list[SweepConfig]) -> list[SweepResult]:
+        """
+        运行参数扫描
+        
+        Args:
+            configs: 待比较的配置列表
+        
+        Returns:
+            与 configs 顺序一致的 SweepResult 列表
+        
+        Raises:
+            ValueError: 如果 configs 为空或评测数据集包含无效样本
+        """
+        if not configs:
+            raise ValueError("Sweep configs cannot be empty")
+        
+        errors: list[SampleError] = []
+        samples = list(iter_samples(self.dataset_path, errors))
+        if errors:
+            raise ValueError(f"Invalid evaluation dataset: {errors[0]}")
+        if not samples:
+            raise ValueError("Evaluation dataset has no valid samples")
+        
+        raw_documents = DocumentProcessor().load_directory(self.documents_path, glob=self.glob, split=False)
+        
+        # 按分块方式分组，每组只需要以最大的 k 检索一次
+        max_k: dict[tuple[int, int], int] = defaultdict(int)
+        for config in configs:
+            max_k[config.chunking] = max(max_k[config.chunking], config.k)
+        
+        questions = [sample.question for sample in samples]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            shared_futures = {
+                chunking: pool.submit(self._build_index, chunking, raw_documents, questions, k)
+                for chunking, k in max_k.items()
+            }
+            shared = {chunking: future.result() for chunking, future in shared_futures.items()}
+            
+            result_futures = [
+                pool.submit(self._run_config, config, shared[config.chunking], samples)
+                for config in configs
+            ]
+            return [future.result() for future in result_futures]
+    
+    def _build_index(
+        self,
+        chunking: tuple[int, int],
+        raw_documents: list[Document],
+        questions: list[str],
+        k: int
+    ) -> _SharedIndex:
+        """为一种分块方式分块、嵌入并批量检索所有问题"""
+        chunk_size, chunk_overlap = chunking
+        chunks = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap).split_documents(raw_documents)
+        
+        vector_store = VectorStoreManager(
+            api_key=self.api_key,
+            embedding_model=self.embedding_model,
+            base_url=self.base_url
+        )
+        vector_store.create_from_documents(chunks)
+        
+        start = time.perf_counter()
+        candidates = vector_store.batch_similarity_search(questions, k=k)
+        retrieval_ms = (time.perf_counter() - start) * 1000 / len(questions)
+        
+        return _SharedIndex(
+            vector_store=vector_store,
+            chunk_count=len(chunks),
+            candidates=candidates,
+            retrieval_ms=retrieval_ms,
+            embedding_tokens=sum(estimate_tokens(chunk.page_content) for chunk in chunks),
+        )
+    
+    def _run_config(
+        self,
+        config: SweepConfig,
+        shared: _SharedIndex,
+        samples: list[EvaluationSample]
+    ) -> SweepResult:
+        """使用共享的检索结果为一个配置生成答案并评测"""
+        rag_chain = RAGChain(
+            vector_store_manager=shared.vector_store,
+            api_key=self.api_key,
+            model=self.model,
+            k=config.k,
+            base_url=self.base_url
+        )
+        
+        start = time.perf_counter()
+        responses = [
+            rag_chain.query_with_candidates(sample.question, candidates[:config.k])
+            for sample, candidates in zip(samples, shared.candidates)
+        ]
+        generation_ms = (time.perf_counter() - start) * 1000 / len(samples)
+        
+        evaluator = RagasEvaluator(
+            rag_chain,
+            api_key=self.api_key,
+            base_url=self.base_url,
+            model=self.model,
+            embedding_model=self.embedding_model,
+            judge_cache=self._judge_cache,
+            **self.evaluator_options
+        )
+        result = evaluator.evaluate(evaluator.build_dataset(samples, responses))
+        
+        return SweepResult(
+            config=config,
+            result=result,
+            chunk_count=shared.chunk_count,
+            retrieval_ms=shared.retrieval_ms,
+            generation_ms=generation_ms,
+            embedding_tokens=shared.embedding_tokens,
+            prompt_tokens=sum(
+                estimate_tokens(context) for response in responses for context in response.contexts
+            ),
+        )
+
+
+def format_comparison_table(results: list[SweepResult]) -> str:
+    """
+    生成配置对比表
+    
+    按平均分降序排列，列出各项指标、耗时和 token 消耗。
+    
+    Args:
+        results: SweepResult 列表
+    
+    Returns:
+        Markdown 格式的对比表
+    """
+    header = (
+        "| 配置 | 块数 | Faithfulness | Answer Relevancy | Context Precision | Context Recall "
+        "| 平均分 | 检索 ms/问 | 生成 ms/问 | 嵌入 tokens | 提示词 tokens |"
+    )
+    lines = [header, "|" + "---|" * 11]
+    for item in sorted(results, key=lambda r: r.average_score, reverse=True):
+        r = item.result
+        lines.append(
+            f"| {item.config.name} | {item.chunk_count} "
+            f"| {r.faithfulness:.4f} | {r.answer_relevancy:.4f} "
+            f"| {r.context_precision:.4f} | {r.context_recall:.4f} "
+            f"| {item.average_score:.4f} | {item.retrieval_ms:.1f} | {item.generation_ms:.1f} "
+            f"| {item.embedding_tokens} | {item.prompt_tokens} |"
+        )
+    return "\n".join(lines)
@@ -1,17 +1,250 @@
 """
 Vector Store Manager Module
 
-Handles vector storage and retrieval using LangChain FAISS.
+Handles vector storage and retrieval using LangChain FAISS, including
+metadata-filtered retrieval backed by precomputed bitmap indexes.
 Implements Requirements 2.1, 2.2, 2.3, 2.5, 3.1, 3.2, 3.3, 3.4.
 """
 
+import json
 import os
-from typing import Optional
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
 
+import numpy as np
 from langchain_community.vectorstores import FAISS
 from langchain_openai import OpenAIEmbeddings
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
-from langchain_core.vectorstores import VectorStoreRetriever
+from langchain_core.retrievers import BaseRetriever
+
+from .metadata_filter import DEFAULT_METADATA_FIELDS, MetadataBitmapIndex
+
+
+# FAISS.save_local 写出的索引文件
+INDEX_FILES = ("index.faiss", "index.pkl")
+
+# 代际标记文件：save() 在两个索引文件都替换完成后最后写入
+GENERATION_FILE = "index.generation"
+
+
+def file_stamps(path: str) -> Optional[dict]:
+    """
+    返回目录中各索引文件的 [mtime_ns, size]
+    
+    Args:
+        path: 向量存储持久化目录
+    
+    Returns:
+        {文件名: [mtime_ns, size]}，任一文件缺失时返回 None
+    """
+    stamps = {}
+    for name in INDEX_FILES:
+        try:
+            stat = os.stat(os.path.join(path, name))
+        except OSError:
+            return None
+        stamps[name] = [stat.st_mtime_ns, stat.st_size]
+    return stamps
+
+
+def read_generation(path: str) -> Optional[dict]:
+    """
+    读取代际标记
+    
+    标记记录代际序号和写入完成时两个索引文件的 [mtime_ns, size]。
+    读取方据此判断 index.faiss 与 index.pkl 是否来自同一次保存。
+    
+    Args:
+        path: 向量存储持久化目录
+    
+    Returns:
+        {"generation": int, "files": dict}，没有标记（旧版本保存的目录）时返回 None
+    """
+    try:
+        with open(os.path.join(path, GENERATION_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class DocumentResolver:
+    """
+    绑定到某一版本索引的文档取回器
+    
+    持有该版本的 docstore 引用，索引被热替换后仍然按生成响应时的索引取回文档。
+    只引用已有的 docstore，不复制文档内容。
+    
+    Attributes:
+        docstore: 索引的文档存储
+        version: 索引版本号
+    """
+    
+    def __init__(self, docstore: Any, version: int):
+        """
+        初始化文档取回器
+        
+        Args:
+            docstore: 索引的文档存储
+            version: 索引版本号
+        """
+        self.docstore = docstore
+        self.version = version
+    
+    def covers(self, documents: list[Document]) -> bool:
+        """检查文档是否都按 ID 存在于该版本的 docstore 中"""
+        return all(
+            isinstance(doc.id, str) and self.docstore.search(doc.id) == doc
+            for doc in documents
+        )
+    
+    def __call__(self, ids: list[str]) -> list[Document]:
+        """
+        按 ID 取回文档
+        
+        Args:
+            ids: 文档块 ID 列表
+        
+        Returns:
+            与 ids 顺序一致的 Document 列表
+        
+        Raises:
+            KeyError: 如果有 ID 不在该版本的索引中
+        """
+        documents = []
+        missing = []
+        for doc_id in ids:
+            doc = self.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                documents.append(doc)
+            else:
+                missing.append(doc_id)
+        if missing:
+            raise KeyError(f"Chunk IDs not found in index version {self.version}: {missing}")
+        return documents
+
+
+class IndexHandle:
+    """
+    版本化索引句柄
+    
+    持有一个 FAISS 向量存储实例及其版本号，并记录正在使用它的查询数量。
+    句柄被替换后进入退役状态：不再接受新的查询，等在途查询全部结束后
+    释放对向量存储的引用。
+    
+    Attributes:
+        store: FAISS 向量存储实例，释放后为 None
+        version: 索引版本号，每次替换递增
+        metadata_index: 该版本索引的元数据位图索引（随索引一起预先构建）
+        metadata_fields: 建立位图的元数据字段
+    """
+    
+    def __init__(
+        self,
+        store: FAISS,
+        version: int,
+        metadata_index: Optional[MetadataBitmapIndex] = None,
+        metadata_fields: Optional[tuple[str, ...]] = DEFAULT_METADATA_FIELDS
+    ):
+        """
+        初始化索引句柄
+        
+        Args:
+            store: FAISS 向量存储实例
+            version: 索引版本号
+            metadata_index: 预先构建的元数据位图索引，可选
+            metadata_fields: 建立位图的元数据字段
+        """
+        self.store = store
+        self.version = version
+        self.metadata_index = metadata_index
+        self.metadata_fields = metadata_fields
+        self._metadata_lock = threading.Lock()
+        self._refs = 0
+        self._retired = False
+        self._cond = threading.Condition()
+    
+    @property
+    def in_flight(self) -> int:
+        """正在使用该句柄的查询数量"""
+        return self._refs
+    
+    def acquire(self) -> bool:
+        """
+        登记一个在途查询
+        
+        Returns:
+            成功返回 True；如果句柄已退役返回 False，调用方应改用当前句柄
+        """
+        with self._cond:
+            if self._retired:
+                return False
+            self._refs += 1
+            return True
+    
+    def release(self) -> None:
+        """注销一个在途查询"""
+        with self._cond:
+            self._refs -= 1
+            if self._refs == 0:
+                self._cond.notify_all()
+    
+    def get_metadata_index(self) -> MetadataBitmapIndex:
+        """获取元数据位图索引，未构建或已过期（增量添加文档后）时重新构建"""
+        with self._metadata_lock:
+            index = self.metadata_index
+            if index is None or index.size != self.store.index.ntotal:
+                index = MetadataBitmapIndex.from_store(self.store, self.metadata_fields)
+                self.metadata_index = index
+            return index
+    
+    def retire(self, timeout: Optional[float] = None) -> bool:
+        """
+        退役句柄：拒绝新的查询，等待在途查询结束后释放向量存储
+        
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+        
+        Returns:
+            在途查询全部结束并已释放返回 True，超时返回 False
+        """
+        with self._cond:
+            self._retired = True
+            drained = self._cond.wait_for(lambda: self._refs == 0, timeout=timeout)
+            if drained:
+                self.store = None
+            return drained
+
+
+class ManagedRetriever(BaseRetriever):
+    """
+    绑定到 VectorStoreManager 而不是某个 FAISS 实例的 Retriever
+    
+    每次检索都通过 VectorStoreManager.similarity_search 进行，
+    因此索引被 load / load_async 替换后自动使用新索引，
+    并且检索期间登记在途查询，旧索引在查询结束前不会被释放。
+    
+    Attributes:
+        manager: 向量存储管理器实例
+        k: 检索返回的文档数量
+    """
+    
+    manager: Any
+    k: int = 4
+    
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        return self.manager.similarity_search(query, k=self.k)
 
 
 class VectorStoreManager:
@@ -19,14 +252,25 @@ class VectorStoreManager:
     向量存储管理器，封装 LangChain FAISS 操作
     
     使用 OpenAI Embeddings 进行文本向量化，使用 FAISS 进行向量存储和检索。
-    支持创建、增量添加、相似度搜索、持久化保存和加载等操作。
+    支持创建、增量添加、相似度搜索、批量检索、持久化保存和加载等操作。
+    
+    当前索引通过版本化的 IndexHandle 持有：创建或加载新索引时先完整构建
+    （包括元数据位图索引），再原子地替换句柄引用；旧句柄在其在途查询结束后才被释放，
+    因此查询不会看到半初始化的索引，重建索引也不会阻塞查询。
     
     Attributes:
         embeddings: OpenAI Embeddings 实例
-        vector_store: FAISS 向量存储实例
+        vector_store: 当前的 FAISS 向量存储实例
+        version: 当前索引版本号
     """
     
-    def __init__(self, api_key: str, embedding_model: str = "text-embedding-v4", base_url: str = None):
+    def __init__(
+        self,
+        api_key: str,
+        embedding_model: str = "text-embedding-v4",
+        base_url: str = None,
+        metadata_fields: Optional[tuple[str, ...]] = DEFAULT_METADATA_FIELDS
+    ):
         """
         初始化向量存储管理器
         
@@ -34,6 +278,8 @@ class VectorStoreManager:
             api_key: OpenAI API 密钥
             embedding_model: 嵌入模型名称，默认 "text-embedding-v4"
             base_url: API Base URL，可选
+            metadata_fields: 加载索引时预先建立位图的元数据字段，默认只索引 "source"；
+                             过滤查询只能使用这些字段
             
         Raises:
             ValueError: 如果 api_key 为空
@@ -51,7 +297,95 @@ class VectorStoreManager:
             # 因为它们可能不支持 token 输入方式
             kwargs["check_embedding_ctx_length"] = False
         self.embeddings = OpenAIEmbeddings(**kwargs)
-        self.vector_store: Optional[FAISS] = None
+        self.metadata_fields = metadata_fields
+        self._handle: Optional[IndexHandle] = None
+        self._swap_lock = threading.Lock()
+        self._version = 0
+        self._retiring: set[IndexHandle] = set()
+    
+    @property
+    def vector_store(self) -> Optional[FAISS]:
+        """当前的 FAISS 向量存储实例，未初始化时为 None"""
+        handle = self._handle
+        return handle.store if handle is not None else None
+    
+    @vector_store.setter
+    def vector_store(self, store: Optional[FAISS]) -> None:
+        self._swap(store)
+    
+    @property
+    def version(self) -> int:
+        """当前索引版本号，未初始化时为 0"""
+        handle = self._handle
+        return handle.version if handle is not None else 0
+    
+    @property
+    def retiring_count(self) -> int:
+        """已被替换但仍在等待在途查询结束的旧索引数量"""
+        with self._swap_lock:
+            return len(self._retiring)
+    
+    def _swap(self, store: Optional[FAISS]) -> Optional[IndexHandle]:
+        """
+        原子地替换当前索引
+        
+        元数据位图索引在替换前构建，新句柄生效时过滤查询无需再等待构建；
+        新句柄立即生效；旧句柄在后台线程中等待在途查询结束后释放。
+        
+        Args:
+            store: 新的 FAISS 向量存储实例，None 表示清空
+        
+        Returns:
+            新的索引句柄（store 为 None 时返回 None）
+        """
+        metadata_index = None
+        if store is not None:
+            metadata_index = MetadataBitmapIndex.from_store(store, self.metadata_fields)
+        
+        with self._swap_lock:
+            old = self._handle
+            if store is None:
+                new = None
+            else:
+                self._version += 1
+                new = IndexHandle(store, self._version, metadata_index, self.metadata_fields)
+            self._handle = new
+            if old is not None:
+                self._retiring.add(old)
+        
+        if old is not None:
+            def drain():
+                old.retire()
+                with self._swap_lock:
+                    self._retiring.discard(old)
+            
+            threading.Thread(target=drain, name=f"index-drain-v{old.version}", daemon=True).start()
+        
+        return new
+    
+    @contextmanager
+    def _acquire(self) -> Iterator[Optional[IndexHandle]]:
+        """
+        获取当前索引用于一次查询
+        
+        在查询期间登记到当前句柄，保证即使期间发生替换，
+        本次查询使用的索引也不会被释放。
+        
+        Yields:
+            当前索引句柄，未初始化时为 None
+        """
+        while True:
+            handle = self._handle
+            if handle is None:
+                yield None
+                return
+            if handle.acquire():
+                break
+            # 句柄刚被退役，重新读取最新句柄
+        try:
+            yield handle
+        finally:
+            handle.release()
     
     def create_from_documents(self, documents: list[Document]) -> FAISS:
         """
@@ -77,12 +411,13 @@ class VectorStoreManager:
         
         # 使用 FAISS.from_documents 创建向量存储
         # 这会自动使用 embeddings 将文档向量化
-        self.vector_store = FAISS.from_documents(
+        store = FAISS.from_documents(
             documents=documents,
             embedding=self.embeddings
         )
+        self._swap(store)
         
-        return self.vector_store
+        return store
     
     def add_documents(self, documents: list[Document]) -> None:
         """
@@ -100,16 +435,17 @@ class VectorStoreManager:
         Validates:
             - Requirement 2.3: 支持增量添加新向量
         """
-        if self.vector_store is None:
-            raise ValueError("Vector store not initialized. Call create_from_documents first.")
-        
-        if not documents:
-            raise ValueError("Documents list cannot be empty")
-        
-        # 使用 add_documents 方法增量添加文档
-        self.vector_store.add_documents(documents)
+        with self._acquire() as handle:
+            if handle is None:
+                raise ValueError("Vector store not initialized. Call create_from_documents first.")
+            
+            if not documents:
+                raise ValueError("Documents list cannot be empty")
+            
+            # 使用 add_documents 方法增量添加文档
+            handle.store.add_documents(documents)
     
-    def similarity_search(self, query: str, k: int = 4) -> list[Document]:
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None) -> list[Document]:
         """
         相似度搜索
         
@@ -118,6 +454,8 @@ class VectorStoreManager:
         Args:
             query: 查询文本
             k: 返回结果数量，默认 4
+            filter: 元数据过滤谓词，可选，例如 {"source": "a.md"} 或
+                    {"source": ["a.md", "b.md"]}；多个字段之间为 AND
             
         Returns:
             相关文档列表，按相似度降序排列
@@ -126,6 +464,7 @@ class VectorStoreManager:
             ValueError: 如果向量存储未初始化
             ValueError: 如果 query 为空
             ValueError: 如果 k <= 0
+            ValueError: 如果 filter 使用了未建立位图的元数据字段
             
         Validates:
             - Requirement 3.1: 将查询向量化并计算与存储向量的相似度
@@ -133,22 +472,31 @@ class VectorStoreManager:
             - Requirement 3.3: 支持配置返回结果数量 K
             - Requirement 3.4: 包含文档块内容和相似度分数
         """
-        if self.vector_store is None:
-            raise ValueError("Vector store not initialized. Call create_from_documents first.")
-        
-        if not query or not query.strip():
-            raise ValueError("Query cannot be empty")
+        if filter:
+            return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
         
-        if k <= 0:
-            raise ValueError("k must be greater than 0")
-        
-        # 使用 similarity_search 方法进行相似度搜索
-        # 返回最相似的 k 个文档
-        results = self.vector_store.similarity_search(query, k=k)
+        with self._acquire() as handle:
+            if handle is None:
+                raise ValueError("Vector store not initialized. Call create_from_documents first.")
+            
+            if not query or not query.strip():
+                raise ValueError("Query cannot be empty")
+            
+            if k <= 0:
+                raise ValueError("k must be greater than 0")
+            
+            # 使用 similarity_search 方法进行相似度搜索
+            # 返回最相似的 k 个文档
+            results = handle.store.similarity_search(query, k=k)
         
         return results
     
-    def similarity_search_with_score(self, query: str, k: int = 4) -> list[tuple[Document, float]]:
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> list[tuple[Document, float]]:
         """
         带分数的相似度搜索
         
@@ -157,6 +505,7 @@ class VectorStoreManager:
         Args:
             query: 查询文本
             k: 返回结果数量，默认 4
+            filter: 元数据过滤谓词，可选，格式同 similarity_search
             
         Returns:
             元组列表，每个元组包含 (Document, score)，按相似度降序排列
@@ -170,18 +519,183 @@ class VectorStoreManager:
         Validates:
             - Requirement 3.4: 包含文档块内容和相似度分数
         """
-        if self.vector_store is None:
-            raise ValueError("Vector store not initialized. Call create_from_documents first.")
+        if filter:
+            return self._search_with_filter([query], k, filter, embed=self.embeddings.embed_query)[0]
+        
+        with self._acquire() as handle:
+            if handle is None:
+                raise ValueError("Vector store not initialized. Call create_from_documents first.")
+            
+            if not query or not query.strip():
+                raise ValueError("Query cannot be empty")
+            
+            if k <= 0:
+                raise ValueError("k must be greater than 0")
+            
+            # 使用 similarity_search_with_score 方法进行带分数的相似度搜索
+            results = handle.store.similarity_search_with_score(query, k=k)
+        
+        return results
+    
+    def batch_similarity_search(
+        self,
+        queries: list[str],
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> list[list[Document]]:
+        """
+        批量相似度搜索
+        
+        一次嵌入请求向量化所有查询，并用一次 FAISS 矩阵搜索完成检索，
+        避免逐条查询时重复的 API 往返和索引扫描开销。
+        
+        Args:
+            queries: 查询文本列表
+            k: 每个查询返回的结果数量，默认 4
+            filter: 元数据过滤谓词，可选，格式同 similarity_search
+        
+        Returns:
+            与 queries 一一对应的文档列表，每个列表按相似度降序排列
+        
+        Raises:
+            ValueError: 如果向量存储未初始化
+            ValueError: 如果 queries 为空或包含空查询
+            ValueError: 如果 k <= 0
+        """
+        results = self._search_with_filter(queries, k, filter)
+        return [[doc for doc, _ in row] for row in results]
+    
+    def build_metadata_index(self) -> MetadataBitmapIndex:
+        """
+        获取当前索引的元数据位图索引
         
-        if not query or not query.strip():
+        位图索引在创建或加载索引时预先构建，增量添加文档后在此重新构建。
+        
+        Returns:
+            MetadataBitmapIndex 实例
+        
+        Raises:
+            ValueError: 如果向量存储未初始化
+        """
+        with self._acquire() as handle:
+            if handle is None:
+                raise ValueError("Vector store not initialized. Call create_from_documents first.")
+            return handle.get_metadata_index()
+    
+    def _search_with_filter(
+        self,
+        queries: list[str],
+        k: int,
+        filter: Optional[dict],
+        embed=None
+    ) -> list[list[tuple[Document, float]]]:
+        """
+        向量化查询并在 FAISS 中检索，可选地应用元数据过滤
+        
+        过滤条件先在位图索引上求值，再作为 IDSelectorBitmap 传入 FAISS，
+        在向量搜索内部排除不满足条件的向量，因此过滤查询与普通查询的代价相当。
+        对不支持选择器的索引类型，按过滤选择率自适应地扩大检索数量后再过滤。
+        
+        Args:
+            queries: 查询文本列表
+            k: 每个查询返回的结果数量
+            filter: 元数据过滤谓词，None 表示不过滤
+            embed: 单条查询的向量化函数，None 表示批量调用 embed_documents
+        
+        Returns:
+            与 queries 一一对应的 (Document, score) 列表
+        """
+        if not queries:
+            raise ValueError("Queries list cannot be empty")
+        
+        if any(not query or not query.strip() for query in queries):
             raise ValueError("Query cannot be empty")
         
         if k <= 0:
             raise ValueError("k must be greater than 0")
         
-        # 使用 similarity_search_with_score 方法进行带分数的相似度搜索
-        results = self.vector_store.similarity_search_with_score(query, k=k)
+        if self._handle is None:
+            raise ValueError("Vector store not initialized. Call create_from_documents first.")
+        
+        # 嵌入请求在登记索引之前完成，避免网络耗时延长旧索引的排空时间
+        if embed is not None:
+            vectors = np.asarray([embed(query) for query in queries], dtype=np.float32)
+        else:
+            vectors = np.asarray(self.embeddings.embed_documents(queries), dtype=np.float32)
         
+        with self._acquire() as handle:
+            if handle is None:
+                raise ValueError("Vector store not initialized. Call create_from_documents first.")
+            
+            store = handle.store
+            if getattr(store, "_normalize_L2", False):
+                import faiss
+                faiss.normalize_L2(vectors)
+            
+            if not filter:
+                distances, indices = store.index.search(vectors, k)
+                return self._to_documents(store, distances, indices, k)
+            
+            metadata_index = handle.get_metadata_index()
+            bitmap = metadata_index.evaluate(filter)
+            selected = metadata_index.count(bitmap)
+            if selected == 0:
+                return [[] for _ in queries]
+            
+            try:
+                import faiss
+                selector = faiss.IDSelectorBitmap(metadata_index.size, faiss.swig_ptr(bitmap))
+                distances, indices = store.index.search(
+                    vectors, k, params=faiss.SearchParameters(sel=selector)
+                )
+                return self._to_documents(store, distances, indices, k)
+            except (RuntimeError, TypeError, AttributeError):
+                # 索引类型不支持搜索时过滤，退化为自适应过量检索 + 位图后过滤
+                return self._overfetch_with_filter(store, vectors, k, metadata_index, bitmap, selected)
+    
+    def _overfetch_with_filter(
+        self,
+        store: FAISS,
+        vectors: np.ndarray,
+        k: int,
+        metadata_index: MetadataBitmapIndex,
+        bitmap: np.ndarray,
+        selected: int
+    ) -> list[list[tuple[Document, float]]]:
+        """按过滤选择率扩大检索数量，用位图过滤结果，不足 k 个时倍增重试"""
+        total = store.index.ntotal
+        fetch = min(total, max(k, int(np.ceil(k * total / selected * 2))))
+        while True:
+            distances, indices = store.index.search(vectors, fetch)
+            keep = np.vectorize(
+                lambda i: i != -1 and metadata_index.contains(bitmap, int(i)),
+                otypes=[bool]
+            )(indices)
+            enough = all(row.sum() >= min(k, selected) for row in keep)
+            if enough or fetch >= total:
+                break
+            fetch = min(total, fetch * 2)
+        
+        filtered_distances = [row_d[row_keep] for row_d, row_keep in zip(distances, keep)]
+        filtered_indices = [row_i[row_keep] for row_i, row_keep in zip(indices, keep)]
+        return self._to_documents(store, filtered_distances, filtered_indices, k)
+    
+    @staticmethod
+    def _to_documents(store: FAISS, distances, indices, k: int) -> list[list[tuple[Document, float]]]:
+        """将 FAISS 搜索结果的位置映射为 (Document, score) 列表"""
+        results = []
+        for row_d, row_i in zip(distances, indices):
+            documents = []
+            for distance, i in zip(row_d, row_i):
+                # FAISS 在结果不足 k 个时用 -1 填充
+                if i == -1:
+                    continue
+                doc = store.docstore.search(store.index_to_docstore_id[int(i)])
+                if isinstance(doc, Document):
+                    documents.append((doc, float(distance)))
+                if len(documents) == k:
+                    break
+            results.append(documents)
         return results
     
     def save(self, path: str) -> None:
@@ -209,10 +723,33 @@ class VectorStoreManager:
         # 确保目录存在
         os.makedirs(path, exist_ok=True)
         
-        # 使用 save_local 方法保存向量存储
-        self.vector_store.save_local(path)
+        # 先写入同一文件系统上的临时目录，再逐个 os.replace 到目标目录。
+        # 替换只改变目录项，正在以 mmap 方式使用旧文件的进程仍然映射旧的 inode，
+        # 不会读到被截断或写了一半的索引文件
+        # 两个文件无法一起原子替换，因此最后再替换代际标记：读取方只在两个文件
+        # 与标记一致时才使用它们，不会把一次保存的 index.faiss 和另一次的 index.pkl 拼在一起
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=path)
+        try:
+            with self._acquire() as handle:
+                if handle is None:
+                    raise ValueError("Vector store not initialized. Call create_from_documents first.")
+                handle.store.save_local(tmp_dir)
+            for name in INDEX_FILES:
+                os.replace(os.path.join(tmp_dir, name), os.path.join(path, name))
+            
+            previous = read_generation(path)
+            marker = {
+                "generation": (previous or {}).get("generation", 0) + 1,
+                "files": file_stamps(path),
+            }
+            marker_path = os.path.join(tmp_dir, GENERATION_FILE)
+            with open(marker_path, "w", encoding="utf-8") as f:
+                json.dump(marker, f)
+            os.replace(marker_path, os.path.join(path, GENERATION_FILE))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
     
-    def load(self, path: str) -> None:
+    def load(self, path: str, mmap: bool = False) -> None:
         """
         从本地加载向量存储
         
@@ -220,6 +757,8 @@ class VectorStoreManager:
         
         Args:
             path: 加载路径（目录路径）
+            mmap: 是否以只读内存映射方式加载索引，默认 False。
+                  适用于多进程共享同一索引的查询服务，加载后不能再添加文档
             
         Raises:
             ValueError: 如果 path 为空
@@ -234,26 +773,129 @@ class VectorStoreManager:
         if not os.path.exists(path):
             raise FileNotFoundError(f"Vector store path not found: {path}")
         
+        # 先完整加载新索引，再原子替换，加载期间查询继续使用旧索引
+        self._swap(self._read_store(path, mmap))
+    
+    def load_async(self, path: str, mmap: bool = False) -> Future:
+        """
+        在后台线程中加载向量存储
+        
+        加载完成后原子替换当前索引，调用方无需等待；期间的查询继续使用旧索引，
+        旧索引在其在途查询全部结束后释放。
+        
+        Args:
+            path: 加载路径（目录路径）
+            mmap: 是否以只读内存映射方式加载索引，默认 False
+        
+        Returns:
+            Future，成功时结果为新索引的版本号，失败时携带加载异常
+        
+        Raises:
+            ValueError: 如果 path 为空
+            FileNotFoundError: 如果路径不存在
+        """
+        if not path or not path.strip():
+            raise ValueError("Path cannot be empty")
+        
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Vector store path not found: {path}")
+        
+        future: Future = Future()
+        
+        def run():
+            try:
+                handle = self._swap(self._read_store(path, mmap))
+                future.set_result(handle.version)
+            except Exception as e:
+                future.set_exception(e)
+        
+        threading.Thread(target=run, name="index-loader", daemon=True).start()
+        return future
+    
+    def _read_store(self, path: str, mmap: bool, attempts: int = 20) -> FAISS:
+        """
+        从磁盘读取 FAISS 向量存储（不修改当前索引）
+        
+        目录中有代际标记时，只接受读取前后标记不变且文件与标记一致的结果；
+        读取期间有其他进程保存新索引则稍后重试。
+        
+        Raises:
+            RuntimeError: 如果多次重试后索引文件仍在变化
+        """
+        for _ in range(attempts):
+            marker = read_generation(path)
+            if marker is None:
+                return self._read_files(path, mmap)
+            if file_stamps(path) == marker["files"]:
+                store = self._read_files(path, mmap)
+                if read_generation(path) == marker and file_stamps(path) == marker["files"]:
+                    return store
+            # 保存尚未完成，或读取期间文件被替换
+            time.sleep(0.05)
+        raise RuntimeError(f"Index files kept changing while loading: {path}")
+    
+    def _read_files(self, path: str, mmap: bool) -> FAISS:
+        """读取 index.faiss / index.pkl"""
+        if mmap:
+            return self._load_mmap(path)
+        
         # 使用 load_local 方法加载向量存储
         # 需要传入 embeddings 以便后续查询时使用
         # allow_dangerous_deserialization=True 是因为 FAISS 使用 pickle 序列化
-        self.vector_store = FAISS.load_local(
+        return FAISS.load_local(
             path,
             embeddings=self.embeddings,
             allow_dangerous_deserialization=True
         )
     
-    def as_retriever(self, k: int = 4) -> VectorStoreRetriever:
+    def _load_mmap(self, path: str) -> FAISS:
+        """
+        以只读内存映射方式加载 FAISS 索引
+        
+        与 FAISS.load_local 读取相同的 index.faiss / index.pkl 文件，
+        但向量数据通过 mmap 映射而不是复制到进程堆内存中，
+        多个进程加载同一索引时共享操作系统的页缓存。
+        
+        IndexFlat 等索引在 IO_FLAG_MMAP 下仍会把向量复制到堆内存，
+        因此优先使用 IO_FLAG_MMAP_IFC（真正的零拷贝映射），
+        旧版本 faiss 没有该标志时退回普通读取。
+        
+        Args:
+            path: 加载路径（目录路径）
+        
+        Returns:
+            FAISS 向量存储实例（只读）
+        """
+        import faiss
+        
+        index_path = os.path.join(path, "index.faiss")
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+        if mmap_flag is None:
+            index = faiss.read_index(index_path)
+        else:
+            index = faiss.read_index(index_path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        with open(os.path.join(path, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id
+        )
+    
+    def as_retriever(self, k: int = 4) -> ManagedRetriever:
         """
         获取 LangChain Retriever 接口
         
-        返回一个 VectorStoreRetriever 实例，可以直接用于 LangChain 的 RetrievalQA 链。
+        返回一个 ManagedRetriever 实例，可以直接用于 LangChain 的 RetrievalQA 链。
+        Retriever 每次检索时都使用当前索引，索引替换后无需重新创建。
         
         Args:
             k: 检索返回的文档数量，默认 4
             
         Returns:
-            VectorStoreRetriever 实例
+            ManagedRetriever 实例
             
         Raises:
             ValueError: 如果向量存储未初始化
@@ -262,18 +904,14 @@ class VectorStoreManager:
         Validates:
             - Requirement 3.3: 支持配置返回结果数量 K
         """
-        if self.vector_store is None:
-            raise ValueError("Vector store not initialized. Call create_from_documents first.")
+        with self._acquire() as handle:
+            if handle is None:
+                raise ValueError("Vector store not initialized. Call create_from_documents first.")
         
         if k <= 0:
             raise ValueError("k must be greater than 0")
         
-        # 使用 as_retriever 方法获取 Retriever 接口
-        # search_kwargs 用于配置检索参数
-        return self.vector_store.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": k}
-        )
+        return ManagedRetriever(manager=self, k=k)
     
     @property
     def is_initialized(self) -> bool:
@@ -285,6 +923,42 @@ class VectorStoreManager:
         """
         return self.vector_store is not None
     
+    def get_documents(self, ids: list[str]) -> list[Document]:
+        """
+        根据文档块 ID 取回文档
+        
+        RAGResponse 只记录文档块 ID 时，通过本方法按需取回文档内容。
+        
+        Args:
+            ids: 文档块 ID 列表（即 docstore 中的 ID）
+        
+        Returns:
+            与 ids 顺序一致的 Document 列表
+        
+        Raises:
+            ValueError: 如果向量存储未初始化
+            KeyError: 如果有 ID 在当前索引中已不存在（例如索引被替换或重建后）
+        """
+        with self._acquire() as handle:
+            if handle is None:
+                raise ValueError("Vector store not initialized. Call create_from_documents first.")
+            return DocumentResolver(handle.store.docstore, handle.version)(ids)
+    
+    def document_resolver(self) -> Optional[DocumentResolver]:
+        """
+        获取绑定到当前索引版本的文档取回器
+        
+        RAGResponse 通过它按 ID 取回文档；之后索引被热替换，
+        取回器仍然引用生成响应时那一版的 docstore。
+        
+        Returns:
+            DocumentResolver，向量存储未初始化时返回 None
+        """
+        with self._acquire() as handle:
+            if handle is None:
+                return None
+            return DocumentResolver(handle.store.docstore, handle.version)
+    
     def get_document_count(self) -> int:
         """
         获取向量存储中的文档数量
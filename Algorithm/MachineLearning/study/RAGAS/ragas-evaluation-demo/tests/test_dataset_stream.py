@@ -0,0 +1,135 @@
+"""
+Tests for Dataset Stream Module
+
+Tests lazy parsing of JSONL and sharded datasets, error collection with line
+numbers, and bounded batching.
+"""
+
+import json
+
+import pytest
+
+from src.dataset_stream import (
+    SampleError, is_streaming_dataset, iter_batches, iter_samples, parse_sample, resolve_shards
+)
+
+
+def write_jsonl(path, lines):
+    """Write raw lines (dicts are JSON-encoded) to a JSONL file."""
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write((json.dumps(line, ensure_ascii=False) if isinstance(line, dict) else line) + "\n")
+
+
+class TestParseSample:
+    """Tests for parse_sample"""
+    
+    def test_parse_valid_sample(self):
+        """Test that a valid object becomes an EvaluationSample"""
+        sample = parse_sample({"question": "Q", "ground_truth": "GT", "category": "c"}, "line 1")
+        
+        assert sample.question == "Q"
+        assert sample.category == "c"
+    
+    def test_error_mentions_location(self):
+        """Test that validation errors include the sample location"""
+        with pytest.raises(ValueError, match="at line 7: missing 'ground_truth' field"):
+            parse_sample({"question": "Q"}, "line 7")
+
+
+class TestIterSamples:
+    """Tests for iter_samples"""
+    
+    def test_invalid_lines_are_reported_and_skipped(self, tmp_path):
+        """Test that bad lines are collected with line numbers without stopping the stream"""
+        path = tmp_path / "regression.jsonl"
+        write_jsonl(path, [
+            {"question": "Q1", "ground_truth": "GT1"},
+            "{not json",
+            "",
+            {"question": "Q2"},
+            {"question": "Q3", "ground_truth": "GT3"},
+        ])
+        errors = []
+        
+        samples = list(iter_samples(str(path), errors))
+        
+        assert [s.question for s in samples] == ["Q1", "Q3"]
+        assert [(e.line, isinstance(e, SampleError)) for e in errors] == [(2, True), (4, True)]
+        assert "Invalid JSON at line 2" in errors[0].message
+        assert "missing 'ground_truth'" in errors[1].message
+        assert str(errors[1]).startswith(f"{path}:4:")
+    
+    def test_samples_are_parsed_lazily(self, tmp_path):
+        """Test that samples are produced before the rest of the file is read"""
+        path = tmp_path / "big.jsonl"
+        write_jsonl(path, [{"question": "Q1", "ground_truth": "GT1"}, "{broken"])
+        errors = []
+        
+        stream = iter_samples(str(path), errors)
+        first = next(stream)
+        
+        assert first.question == "Q1"
+        assert errors == []
+    
+    def test_sharded_directory_and_glob(self, tmp_path):
+        """Test that shards in a directory or matching a glob are read in name order"""
+        write_jsonl(tmp_path / "part-0002.jsonl", [{"question": "Q2", "ground_truth": "GT"}])
+        write_jsonl(tmp_path / "part-0001.jsonl", [{"question": "Q1", "ground_truth": "GT"}])
+        (tmp_path / "legacy.json").write_text(
+            json.dumps({"samples": [{"question": "Q0", "ground_truth": "GT"}]}), encoding="utf-8"
+        )
+        (tmp_path / "notes.txt").write_text("ignored", encoding="utf-8")
+        
+        assert [s.question for s in iter_samples(str(tmp_path))] == ["Q0", "Q1", "Q2"]
+        assert [s.question for s in iter_samples(str(tmp_path / "part-*.jsonl"))] == ["Q1", "Q2"]
+    
+    def test_malformed_json_shard_is_skipped(self, tmp_path):
+        """Test that a .json shard that fails to parse is reported and the stream continues"""
+        (tmp_path / "part-0001.json").write_text('{"samples": [', encoding="utf-8")
+        write_jsonl(tmp_path / "part-0002.jsonl", [{"question": "Q2", "ground_truth": "GT"}])
+        errors = []
+        
+        samples = list(iter_samples(str(tmp_path), errors))
+        
+        assert [s.question for s in samples] == ["Q2"]
+        assert len(errors) == 1
+        assert errors[0].source.endswith("part-0001.json")
+        assert errors[0].line == 0
+        assert "Invalid JSON shard" in errors[0].message
+    
+    def test_list_of_paths(self, tmp_path):
+        """Test that a list of paths (e.g. a shell-expanded glob) is read in order"""
+        write_jsonl(tmp_path / "a.jsonl", [{"question": "QA", "ground_truth": "GT"}])
+        write_jsonl(tmp_path / "b.jsonl", [{"question": "QB", "ground_truth": "GT"}])
+        
+        paths = [str(tmp_path / "b.jsonl"), str(tmp_path / "a.jsonl")]
+        
+        assert [s.question for s in iter_samples(paths)] == ["QB", "QA"]
+    
+    def test_is_streaming_dataset(self, tmp_path):
+        """Test which dataset paths are routed to streaming evaluation"""
+        assert is_streaming_dataset("data/regression.jsonl")
+        assert is_streaming_dataset("data/*.json")
+        assert is_streaming_dataset(str(tmp_path))
+        assert is_streaming_dataset(["a.json", "b.json"])
+        assert not is_streaming_dataset("data/test_dataset.json")
+        assert not is_streaming_dataset(["data/test_dataset.json"])
+    
+    def test_missing_dataset_raises_error(self, tmp_path):
+        """Test that a path without dataset files raises FileNotFoundError"""
+        with pytest.raises(FileNotFoundError, match="Evaluation dataset file not found"):
+            resolve_shards(str(tmp_path / "missing-*.jsonl"))
+
+
+class TestIterBatches:
+    """Tests for iter_batches"""
+    
+    def test_batches_are_bounded(self):
+        """Test that a stream is split into batches of at most batch_size"""
+        assert [len(b) for b in iter_batches(iter(range(7)), 3)] == [3, 3, 1]
+    
+    def test_invalid_batch_size_raises_error(self):
+        """Test that batch_size <= 0 raises ValueError"""
+        with pytest.raises(ValueError, match="batch_size must be greater than 0"):
+            list(iter_batches([], 0))
@@ -12,7 +12,8 @@ from pathlib import Path
 
 from hypothesis import given, settings, strategies as st, assume
 
-from src.evaluator import RagasEvaluator
+from src.evaluator import RagasEvaluator, metric_means
+from src.judge_cache import JudgeCache
 from src.models import EvaluationSample, EvaluationResult, RAGResponse
 
 
@@ -171,6 +172,26 @@ class TestLoadDataset:
         assert samples[1].ground_truth == "RAGAS 是评测框架"
         assert samples[1].contexts is None
     
+    def test_load_dataset_with_category(self, tmp_path):
+        """Test that the optional category field is loaded and validated"""
+        dataset_path = tmp_path / "test_dataset.json"
+        dataset_path.write_text(json.dumps({"samples": [
+            {"question": "Q1", "ground_truth": "GT1", "category": "概念"},
+            {"question": "Q2", "ground_truth": "GT2"},
+        ]}), encoding="utf-8")
+        evaluator = RagasEvaluator(Mock())
+        
+        samples = evaluator.load_dataset(str(dataset_path))
+        
+        assert samples[0].category == "概念"
+        assert samples[1].category is None
+        
+        dataset_path.write_text(json.dumps({"samples": [
+            {"question": "Q1", "ground_truth": "GT1", "category": 1},
+        ]}), encoding="utf-8")
+        with pytest.raises(ValueError, match="'category' must be a string"):
+            evaluator.load_dataset(str(dataset_path))
+    
     def test_load_dataset_file_not_found(self):
         """Test loading from non-existent file raises FileNotFoundError"""
         mock_rag_chain = Mock()
@@ -359,11 +380,204 @@ class TestEvaluate:
         assert result.answer_relevancy == 0.90
         assert result.context_precision == 0.75
         assert result.context_recall == 0.80
+    
+    @patch("src.evaluator.OpenAIEmbeddings")
+    @patch("src.evaluator.ChatOpenAI")
+    @patch("src.evaluator.evaluate")
+    def test_evaluate_passes_concurrency_settings(self, mock_ragas_evaluate, mock_chat_openai, mock_embeddings):
+        """Test that max_workers, timeout and batch_size reach ragas.evaluate"""
+        mock_ragas_evaluate.return_value = MagicMock()
+        evaluator = RagasEvaluator(Mock(), api_key="test-key", max_workers=32, batch_size=50, timeout=60)
+        
+        evaluator.evaluate(Mock())
+        
+        kwargs = mock_ragas_evaluate.call_args.kwargs
+        assert kwargs["run_config"].max_workers == 32
+        assert kwargs["run_config"].timeout == 60
+        assert kwargs["batch_size"] == 50
+    
+    @patch("src.evaluator.OpenAIEmbeddings")
+    @patch("src.evaluator.ChatOpenAI")
+    @patch("src.evaluator.evaluate")
+    def test_evaluate_builds_results_frame_once(self, mock_ragas_evaluate, mock_chat_openai, mock_embeddings):
+        """Test that per-sample score lists are averaged and to_pandas is called once"""
+        import pandas as pd
+        
+        scores = {
+            "faithfulness": [1.0, 0.5],
+            "answer_relevancy": [0.8, float("nan")],
+            "context_precision": [0.0, 1.0],
+        }
+        df = pd.DataFrame({**scores, "context_recall": [0.25, 0.75]})
+        mock_result = MagicMock()
+        mock_result.__getitem__.side_effect = lambda key: scores[key]
+        mock_result.to_pandas.return_value = df
+        mock_ragas_evaluate.return_value = mock_result
+        evaluator = RagasEvaluator(Mock(), api_key="test-key")
+        
+        result = evaluator.evaluate(Mock())
+        
+        assert mock_result.to_pandas.call_count == 1
+        assert result.faithfulness == 0.75
+        assert result.answer_relevancy == 0.8
+        assert result.context_precision == 0.5
+        # Missing from the result mapping, taken from the results frame
+        assert result.context_recall == 0.5
+        assert len(result.details) == 2
+    
+    def test_metric_means_handles_missing_and_nan_columns(self):
+        """Test metric_means returns 0.0 for missing or all-NaN metrics"""
+        import pandas as pd
+        
+        df = pd.DataFrame({"faithfulness": [0.2, 0.4], "context_recall": [float("nan")] * 2})
+        
+        means = metric_means(df)
+        
+        assert means["faithfulness"] == pytest.approx(0.3)
+        assert means["context_recall"] == 0.0
+        assert means["answer_relevancy"] == 0.0
+
+
+class TestRunQuickEvaluation:
+    """Tests for RagasEvaluator.run_quick_evaluation method"""
+    
+    @staticmethod
+    def make_evaluator(tmp_path, count=100, score_fn=None):
+        """Create an evaluator whose evaluate() scores each question deterministically."""
+        dataset_path = tmp_path / "test_dataset.json"
+        dataset_path.write_text(json.dumps({"samples": [
+            {"question": f"Q{i}", "ground_truth": f"GT{i}", "category": "a" if i % 4 else "b"}
+            for i in range(count)
+        ]}), encoding="utf-8")
+        score_fn = score_fn or (lambda i: (i % 10) / 10)
+        
+        evaluator = RagasEvaluator(Mock())
+        evaluator.prepare_evaluation_data = Mock(side_effect=lambda samples: samples)
+        
+        def fake_evaluate(samples):
+            details = []
+            for sample in samples:
+                score = score_fn(int(sample.question[1:]))
+                details.append({"user_input": sample.question, **{
+                    name: score for name in
+                    ("faithfulness", "answer_relevancy", "context_precision", "context_recall")
+                }})
+            return evaluator.aggregate_details(details)
+        
+        evaluator.evaluate = Mock(side_effect=fake_evaluate)
+        return evaluator, str(dataset_path)
+    
+    def test_requires_sample_size_or_target_width(self, tmp_path):
+        """Test that one of the two quick modes must be selected"""
+        evaluator, path = self.make_evaluator(tmp_path)
+        
+        with pytest.raises(ValueError, match="Either sample_size or target_width"):
+            evaluator.run_quick_evaluation(path)
+    
+    def test_fixed_sample_size_is_stratified(self, tmp_path):
+        """Test that a fixed-size quick evaluation scores a stratified sample once"""
+        evaluator, path = self.make_evaluator(tmp_path)
+        
+        result, report = evaluator.run_quick_evaluation(path, sample_size=20)
+        
+        evaluated = evaluator.evaluate.call_args.args[0]
+        assert evaluator.evaluate.call_count == 1
+        assert len(evaluated) == 20
+        assert sum(s.category == "b" for s in evaluated) == 5
+        assert len(result.details) == 20
+        assert set(result.confidence_intervals) == {
+            "faithfulness", "answer_relevancy", "context_precision", "context_recall"
+        }
+        assert "95% CI" in report
+    
+    def test_sequential_mode_stops_at_target_width(self, tmp_path):
+        """Test that samples are added in rounds until intervals are narrow enough"""
+        evaluator, path = self.make_evaluator(tmp_path, count=200)
+        
+        result, _ = evaluator.run_quick_evaluation(
+            path, target_width=0.15, initial_size=10, step_size=10
+        )
+        
+        rounds = [len(call.args[0]) for call in evaluator.evaluate.call_args_list]
+        assert rounds[0] == 10
+        assert 1 < len(rounds) and sum(rounds) < 200
+        # No sample is evaluated twice
+        questions = [d["user_input"] for d in result.details]
+        assert len(questions) == len(set(questions)) == sum(rounds)
+        low, high = result.confidence_intervals["faithfulness"]
+        assert high - low <= 0.15
+        assert low <= result.faithfulness <= high
+    
+    def test_sequential_mode_stops_when_samples_run_out(self, tmp_path):
+        """Test that an unreachable width evaluates at most max_samples samples"""
+        evaluator, path = self.make_evaluator(tmp_path, count=40)
+        
+        result, _ = evaluator.run_quick_evaluation(
+            path, target_width=0.001, initial_size=10, step_size=15, max_samples=30
+        )
+        
+        assert [len(call.args[0]) for call in evaluator.evaluate.call_args_list] == [10, 15, 5]
+        assert len(result.details) == 30
+
+
+class TestRunStreamingEvaluation:
+    """Tests for RagasEvaluator.run_streaming_evaluation method"""
+    
+    def test_streaming_evaluation_runs_in_bounded_batches(self, tmp_path):
+        """Test that a JSONL dataset is evaluated batch by batch and invalid lines are reported"""
+        path = tmp_path / "regression.jsonl"
+        lines = [json.dumps({"question": f"Q{i}", "ground_truth": f"GT{i}"}) for i in range(7)]
+        lines.insert(3, json.dumps({"question": "bad"}))
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        
+        evaluator = RagasEvaluator(Mock())
+        evaluator.prepare_evaluation_data = Mock(side_effect=lambda samples: samples)
+        evaluator.evaluate = Mock(side_effect=lambda samples: evaluator.aggregate_details([
+            {"user_input": s.question, "response": "long answer", "faithfulness": 1.0, "context_recall": 0.5}
+            for s in samples
+        ]))
+        errors = []
+        
+        result, report = evaluator.run_streaming_evaluation(str(path), batch_size=3, errors=errors)
+        
+        assert [len(call.args[0]) for call in evaluator.evaluate.call_args_list] == [3, 3, 1]
+        assert [e.line for e in errors] == [4]
+        assert len(result.details) == 7
+        assert "response" not in result.details[0]
+        assert result.faithfulness == 1.0
+        assert result.context_recall == 0.5
+        assert "RAGAS 评测报告" in report
+    
+    def test_streaming_evaluation_without_valid_samples_raises_error(self, tmp_path):
+        """Test that a dataset with only invalid samples raises ValueError"""
+        path = tmp_path / "regression.jsonl"
+        path.write_text(json.dumps({"question": "bad"}) + "\n", encoding="utf-8")
+        evaluator = RagasEvaluator(Mock())
+        
+        with pytest.raises(ValueError, match="no valid samples"):
+            evaluator.run_streaming_evaluation(str(path))
 
 
 class TestGenerateReport:
     """Tests for RagasEvaluator.generate_report method"""
     
+    def test_generate_report_shows_confidence_intervals(self):
+        """Test that quick-evaluation intervals are shown next to the scores"""
+        result = EvaluationResult(
+            faithfulness=0.85,
+            answer_relevancy=0.90,
+            context_precision=0.75,
+            context_recall=0.80,
+            details=[{}, {}],
+            confidence_intervals={"faithfulness": (0.8, 0.9)},
+        )
+        evaluator = RagasEvaluator(Mock())
+        
+        report = evaluator.generate_report(result)
+        
+        assert "0.8500 (95% CI: 0.8000 - 0.9000)" in report
+        assert "2 个抽样样本" in report
+    
     def test_generate_report_contains_all_metrics(self):
         """Test generated report contains all metric names and values"""
         mock_rag_chain = Mock()
@@ -436,6 +650,44 @@ class TestRagasEvaluatorInit:
         
         assert evaluator.rag_chain is mock_rag_chain
         assert len(evaluator.metrics) == 4
+    
+    def test_metrics_are_created_lazily(self):
+        """Test that metric objects are only built on first access and then reused"""
+        evaluator = RagasEvaluator(Mock())
+        
+        assert evaluator._metrics is None
+        metrics = evaluator.metrics
+        assert [type(m).__name__ for m in metrics] == [
+            "Faithfulness", "ResponseRelevancy", "ContextPrecision", "ContextRecall"
+        ]
+        assert evaluator.metrics is metrics
+    
+    def test_init_with_invalid_concurrency_raises_error(self):
+        """Test that non-positive max_workers or batch_size raises ValueError"""
+        with pytest.raises(ValueError, match="max_workers must be greater than 0"):
+            RagasEvaluator(Mock(), max_workers=0)
+        with pytest.raises(ValueError, match="batch_size must be greater than 0"):
+            RagasEvaluator(Mock(), batch_size=0)
+    
+    @patch("src.evaluator.ChatOpenAI")
+    def test_judge_llm_uses_shared_cache(self, mock_chat_openai):
+        """Test that the judge LLM is created with the evaluator's prompt cache"""
+        cache = JudgeCache()
+        evaluator = RagasEvaluator(Mock(), api_key="test-key", judge_cache=cache)
+        
+        evaluator._get_llm()
+        
+        assert mock_chat_openai.call_args.kwargs["cache"] is cache
+    
+    @patch("src.evaluator.ChatOpenAI")
+    def test_judge_cache_can_be_disabled(self, mock_chat_openai):
+        """Test that no cache is passed to the judge LLM when disabled"""
+        evaluator = RagasEvaluator(Mock(), api_key="test-key", enable_cache=False)
+        
+        evaluator._get_llm()
+        
+        assert evaluator.judge_cache is None
+        assert "cache" not in mock_chat_openai.call_args.kwargs
 
 
 
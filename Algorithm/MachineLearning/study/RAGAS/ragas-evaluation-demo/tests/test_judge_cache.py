@@ -0,0 +1,68 @@
+"""
+Tests for Judge Cache Module
+
+Tests prompt caching and hit/miss accounting with in-memory and SQLite
+backends, using a fake chat model in place of the judge LLM.
+"""
+
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.outputs import Generation
+
+from src.judge_cache import JudgeCache, create_judge_cache
+
+
+class TestJudgeCache:
+    """Tests for JudgeCache"""
+    
+    def test_lookup_counts_hits_and_misses(self):
+        """Test that lookups are counted and updates are served back"""
+        cache = JudgeCache()
+        
+        assert cache.lookup("prompt", "llm") is None
+        cache.update("prompt", "llm", [Generation(text="answer")])
+        assert cache.lookup("prompt", "llm")[0].text == "answer"
+        
+        assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+    
+    def test_identical_prompts_call_llm_once(self):
+        """Test that a chat model with the cache only generates once per prompt"""
+        cache = JudgeCache()
+        llm = FakeListChatModel(responses=["first", "second"], cache=cache)
+        
+        answers = [llm.invoke("same prompt").content for _ in range(3)]
+        answers.append(asyncio.run(llm.ainvoke("same prompt")).content)
+        
+        assert answers == ["first"] * 4
+        assert cache.hits == 3
+        assert cache.misses == 1
+    
+    def test_clear_resets_entries_and_stats(self):
+        """Test that clear empties the backend and resets counters"""
+        cache = JudgeCache()
+        cache.update("prompt", "llm", [Generation(text="answer")])
+        cache.lookup("prompt", "llm")
+        
+        cache.clear()
+        
+        assert cache.hits == 0
+        assert cache.lookup("prompt", "llm") is None
+
+
+class TestCreateJudgeCache:
+    """Tests for create_judge_cache factory"""
+    
+    def test_create_in_memory_cache(self):
+        """Test that no path gives a process-local cache"""
+        assert isinstance(create_judge_cache(), JudgeCache)
+    
+    def test_sqlite_cache_persists_across_instances(self, tmp_path):
+        """Test that a SQLite-backed cache is reused by a later run"""
+        path = str(tmp_path / "cache" / "judge.db")
+        create_judge_cache(path).update("prompt", "llm", [Generation(text="answer")])
+        
+        cache = create_judge_cache(path)
+        
+        assert cache.lookup("prompt", "llm")[0].text == "answer"
+        assert cache.hits == 1
@@ -0,0 +1,122 @@
+"""
+Tests for Metadata Filter Module
+
+Tests bitmap construction from a vector store and predicate evaluation.
+"""
+
+import numpy as np
+import pytest
+from unittest.mock import Mock
+from langchain_core.documents import Document
+from hypothesis import given, settings, strategies as st
+
+from src.metadata_filter import MetadataBitmapIndex
+
+
+def make_store(metadatas):
+    """Create a mock FAISS store whose documents carry the given metadata."""
+    store = Mock()
+    store.index.ntotal = len(metadatas)
+    store.index_to_docstore_id = {i: f"id{i}" for i in range(len(metadatas))}
+    docs = {f"id{i}": Document(page_content=f"doc {i}", metadata=m) for i, m in enumerate(metadatas)}
+    store.docstore.search.side_effect = lambda doc_id: docs[doc_id]
+    return store
+
+
+def selected_positions(index, bitmap):
+    """Return the positions selected by a packed bitmap."""
+    return [i for i in range(index.size) if index.contains(bitmap, i)]
+
+
+class TestMetadataBitmapIndex:
+    """Tests for MetadataBitmapIndex"""
+    
+    def test_from_store_builds_bitmaps_per_field(self):
+        """Test that every requested metadata field gets a bitmap index"""
+        index = MetadataBitmapIndex.from_store(make_store([
+            {"source": "a.md", "page": 1},
+            {"source": "b.md", "page": 1},
+            {"source": "a.md"},
+        ]), fields=["source", "page"])
+        
+        assert index.size == 3
+        assert sorted(index.fields) == ["page", "source"]
+        assert selected_positions(index, index.evaluate({"source": "a.md"})) == [0, 2]
+        assert selected_positions(index, index.evaluate({"page": 1})) == [0, 1]
+    
+    def test_from_store_indexes_only_source_by_default(self):
+        """Test that high-cardinality fields are not indexed unless requested"""
+        index = MetadataBitmapIndex.from_store(make_store([
+            {"source": "a.md", "chunk_id": "a#0"},
+            {"source": "a.md", "chunk_id": "a#1"},
+        ]))
+        
+        assert index.fields == ["source"]
+    
+    def test_from_store_with_all_fields(self):
+        """Test that fields=None indexes every metadata field"""
+        index = MetadataBitmapIndex.from_store(make_store([{"source": "a.md", "page": 1}]), fields=None)
+        
+        assert sorted(index.fields) == ["page", "source"]
+    
+    def test_evaluate_or_within_field_and_across_fields(self):
+        """Test list values are OR-ed and multiple fields are AND-ed"""
+        index = MetadataBitmapIndex.from_store(make_store([
+            {"source": "a.md", "lang": "en"},
+            {"source": "b.md", "lang": "zh"},
+            {"source": "c.md", "lang": "en"},
+        ]), fields=["source", "lang"])
+        
+        bitmap = index.evaluate({"source": ["a.md", "b.md"], "lang": "en"})
+        
+        assert selected_positions(index, bitmap) == [0]
+        assert index.count(bitmap) == 1
+    
+    def test_list_metadata_values_are_indexed_per_element(self):
+        """Test that a document with list-valued metadata matches each element"""
+        index = MetadataBitmapIndex.from_store(make_store([
+            {"tags": ["rag", "eval"]},
+            {"tags": ["rag"]},
+        ]), fields=["tags"])
+        
+        assert index.count(index.evaluate({"tags": "eval"})) == 1
+        assert index.count(index.evaluate({"tags": "rag"})) == 2
+    
+    def test_unknown_value_selects_nothing(self):
+        """Test that predicates on unknown values or indexed-but-absent fields match no documents"""
+        index = MetadataBitmapIndex.from_store(make_store([{"source": "a.md"}]), fields=["source", "author"])
+        
+        assert index.count(index.evaluate({"source": "missing.md"})) == 0
+        assert index.count(index.evaluate({"author": "x"})) == 0
+    
+    def test_unindexed_field_raises_error(self):
+        """Test that predicates on fields without bitmaps raise ValueError"""
+        index = MetadataBitmapIndex.from_store(make_store([{"source": "a.md", "author": "x"}]))
+        
+        with pytest.raises(ValueError, match="Metadata field is not indexed: author"):
+            index.evaluate({"author": "x"})
+    
+    def test_evaluate_with_empty_predicates_raises_error(self):
+        """Test that empty predicates raise ValueError"""
+        index = MetadataBitmapIndex(0)
+        
+        with pytest.raises(ValueError, match="Filter predicates cannot be empty"):
+            index.evaluate({})
+    
+    @settings(max_examples=100)
+    @given(
+        sources=st.lists(st.sampled_from(["a", "b", "c", "d"]), min_size=1, max_size=40),
+        wanted=st.sets(st.sampled_from(["a", "b", "c", "d", "e"]), min_size=1)
+    )
+    def test_property_bitmap_matches_brute_force(self, sources, wanted):
+        """
+        For any document sources and filter values, the packed bitmap selects
+        exactly the positions whose source is among the filter values.
+        """
+        index = MetadataBitmapIndex.from_store(make_store([{"source": s} for s in sources]))
+        
+        bitmap = index.evaluate({"source": sorted(wanted)})
+        
+        assert bitmap.dtype == np.uint8
+        assert selected_positions(index, bitmap) == [i for i, s in enumerate(sources) if s in wanted]
+        assert index.count(bitmap) == sum(s in wanted for s in sources)
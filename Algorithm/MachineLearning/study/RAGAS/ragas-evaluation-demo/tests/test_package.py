@@ -0,0 +1,61 @@
+"""
+Tests for the src package exports
+
+Tests that package-level exports resolve lazily and that light entry points
+do not import heavy dependencies.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import src
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def imported_modules(statement: str) -> set[str]:
+    """Run an import statement in a fresh interpreter and return sys.modules keys."""
+    proc = subprocess.run(
+        [sys.executable, "-c", f"{statement}; import sys; print('\\n'.join(sys.modules))"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(proc.stdout.split())
+
+
+class TestLazyExports:
+    """Tests for PEP 562 lazy exports"""
+    
+    def test_exports_resolve_to_submodule_objects(self):
+        """Test that every name in __all__ resolves to the object in its submodule"""
+        from src.rag_chain import RAGChain
+        from src.models import RAGResponse
+        
+        assert src.RAGChain is RAGChain
+        assert src.RAGResponse is RAGResponse
+        assert all(hasattr(src, name) for name in src.__all__)
+    
+    def test_unknown_attribute_raises_error(self):
+        """Test that unknown names raise AttributeError"""
+        with pytest.raises(AttributeError, match="no attribute 'Missing'"):
+            src.Missing
+    
+    def test_light_imports_do_not_load_heavy_dependencies(self):
+        """Test that the package, data models and CLI module import without LangChain or RAGAS"""
+        modules = imported_modules("import src, src.models, main")
+        
+        assert "langchain_openai" not in modules
+        assert "ragas" not in modules
+        assert "faiss" not in modules
+    
+    def test_query_path_does_not_load_ragas(self):
+        """Test that the query components do not import the evaluation stack"""
+        modules = imported_modules("from src.rag_chain import RAGChain")
+        
+        assert "ragas" not in modules
+        assert "datasets" not in modules
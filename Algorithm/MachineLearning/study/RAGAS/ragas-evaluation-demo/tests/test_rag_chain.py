@@ -4,14 +4,16 @@ Tests for RAGChain Module
 Tests the RAG chain implementation using mocked LLM and vector store.
 """
 
+import pickle
 import pytest
 from unittest.mock import Mock, MagicMock, patch
 from langchain_core.documents import Document
 from hypothesis import given, settings, strategies as st
 
 from src.rag_chain import RAGChain
-from src.models import RAGResponse
+from src.models import RAGResponse, RerankStats
 from src.vector_store import VectorStoreManager
+from tests.test_vector_store import DeterministicEmbeddings
 
 
 class TestRAGChainInit:
@@ -189,6 +191,103 @@ class TestRAGChainQuery:
         mock_chain.invoke.assert_called_once_with({"query": "Test question"})
 
 
+class TestRAGChainRerank:
+    """Tests for RAGChain with the optional re-ranking stage"""
+    
+    def test_init_with_fetch_k_less_than_k_raises_error(self):
+        """Test that fetch_k < k raises ValueError when a reranker is set"""
+        mock_vsm = Mock(spec=VectorStoreManager)
+        mock_vsm.is_initialized = True
+        
+        with pytest.raises(ValueError, match="fetch_k must be greater than or equal to k"):
+            RAGChain(mock_vsm, api_key="test-key", k=5, reranker=Mock(), fetch_k=3)
+    
+    @patch('src.rag_chain.ChatOpenAI')
+    @patch('src.rag_chain.RetrievalQA')
+    def test_query_overfetches_and_passes_reranked_documents(self, mock_retrieval_qa, mock_chat_openai):
+        """Test that query over-fetches candidates and only sends the reranked top-k to the LLM"""
+        candidates = [Document(page_content=f"Candidate {i}") for i in range(6)]
+        mock_vsm = Mock(spec=VectorStoreManager)
+        mock_vsm.is_initialized = True
+        mock_vsm.as_retriever.return_value = Mock()
+        mock_vsm.similarity_search.return_value = candidates
+        
+        mock_chain = Mock()
+        mock_chain.combine_documents_chain.input_key = "input_documents"
+        mock_chain.combine_documents_chain.output_key = "output_text"
+        mock_chain.combine_documents_chain.invoke.return_value = {"output_text": "Reranked answer"}
+        mock_retrieval_qa.from_chain_type.return_value = mock_chain
+        
+        stats = RerankStats(
+            candidate_count=6,
+            selected_count=2,
+            rerank_latency_ms=1.5,
+            candidate_tokens=60,
+            baseline_tokens=25,
+            selected_tokens=20
+        )
+        mock_reranker = Mock()
+        mock_reranker.rerank.return_value = ([candidates[4], candidates[1]], stats)
+        
+        rag_chain = RAGChain(mock_vsm, api_key="test-key", k=2, reranker=mock_reranker, fetch_k=6)
+        response = rag_chain.query("What is RAG?")
+        
+        mock_vsm.similarity_search.assert_called_once_with("What is RAG?", k=6)
+        mock_reranker.rerank.assert_called_once_with("What is RAG?", candidates, top_n=2)
+        mock_chain.combine_documents_chain.invoke.assert_called_once_with({
+            "input_documents": [candidates[4], candidates[1]],
+            "question": "What is RAG?"
+        })
+        mock_chain.invoke.assert_not_called()
+        
+        assert response.answer == "Reranked answer"
+        assert response.contexts == ["Candidate 4", "Candidate 1"]
+        assert response.rerank_stats is stats
+        assert response.rerank_stats.tokens_saved == 5
+    
+    @patch('src.rag_chain.ChatOpenAI')
+    @patch('src.rag_chain.RetrievalQA')
+    def test_query_without_reranker_has_no_stats(self, mock_retrieval_qa, mock_chat_openai):
+        """Test that rerank_stats is None when re-ranking is disabled"""
+        mock_vsm = Mock(spec=VectorStoreManager)
+        mock_vsm.is_initialized = True
+        mock_vsm.as_retriever.return_value = Mock()
+        
+        mock_chain = Mock()
+        mock_chain.invoke.return_value = {"result": "Answer", "source_documents": []}
+        mock_retrieval_qa.from_chain_type.return_value = mock_chain
+        
+        rag_chain = RAGChain(mock_vsm, api_key="test-key")
+        response = rag_chain.query("Test question")
+        
+        assert response.rerank_stats is None
+        mock_vsm.similarity_search.assert_not_called()
+    
+    @patch('src.rag_chain.ChatOpenAI')
+    @patch('src.rag_chain.RetrievalQA')
+    def test_query_with_candidates_without_reranker_keeps_top_k(self, mock_retrieval_qa, mock_chat_openai):
+        """Test that pre-retrieved candidates are truncated to k without re-ranking"""
+        candidates = [Document(page_content=f"Candidate {i}") for i in range(5)]
+        mock_vsm = Mock(spec=VectorStoreManager)
+        mock_vsm.is_initialized = True
+        mock_vsm.as_retriever.return_value = Mock()
+        
+        mock_chain = Mock()
+        mock_chain.combine_documents_chain.input_key = "input_documents"
+        mock_chain.combine_documents_chain.output_key = "output_text"
+        mock_chain.combine_documents_chain.invoke.return_value = {"output_text": "Answer"}
+        mock_retrieval_qa.from_chain_type.return_value = mock_chain
+        
+        rag_chain = RAGChain(mock_vsm, api_key="test-key", k=2)
+        response = rag_chain.query_with_candidates("What is RAG?", candidates)
+        
+        assert rag_chain.candidate_k == 2
+        assert response.contexts == ["Candidate 0", "Candidate 1"]
+        assert response.answer == "Answer"
+        assert response.rerank_stats is None
+        mock_vsm.similarity_search.assert_not_called()
+
+
 class TestRAGResponse:
     """Tests for RAGResponse dataclass"""
     
@@ -206,6 +305,106 @@ class TestRAGResponse:
         assert response.answer == "RAG is a technique."
         assert response.contexts == ["Context 1", "Context 2"]
         assert response.source_documents == [doc]
+    
+    def test_rag_response_is_slotted(self):
+        """Test that responses carry no per-instance __dict__"""
+        response = RAGResponse(question="Q", answer="A", contexts=[], source_documents=[])
+        
+        assert not hasattr(response, "__dict__")
+    
+    def test_from_documents_derives_contexts_without_copying(self):
+        """Test that contexts are generated from the held documents"""
+        docs = [Document(page_content="Chunk A"), Document(page_content="Chunk B")]
+        
+        response = RAGResponse.from_documents("Q", "A", docs, resolver=Mock())
+        
+        assert response.chunk_ids is None
+        assert response.source_documents == docs
+        assert response.contexts == ["Chunk A", "Chunk B"]
+    
+    def test_from_documents_references_chunk_ids_and_materializes_lazily(self):
+        """Test that documents with store IDs are kept as IDs and resolved on access"""
+        docs = [Document(id="id-1", page_content="Chunk A"), Document(id="id-2", page_content="Chunk B")]
+        resolver = Mock(return_value=docs)
+        
+        response = RAGResponse.from_documents("Q", "A", docs, resolver=resolver)
+        
+        assert response.chunk_ids == ["id-1", "id-2"]
+        resolver.assert_not_called()
+        assert response.contexts == ["Chunk A", "Chunk B"]
+        resolver.assert_called_once_with(["id-1", "id-2"])
+    
+    def test_chunk_ids_are_resolved_once(self):
+        """Test that resolved documents are cached so a later index swap cannot change them"""
+        docs = [Document(id="id-1", page_content="Chunk A")]
+        resolver = Mock(side_effect=[docs, []])
+        response = RAGResponse.from_documents("Q", "A", docs, resolver=resolver)
+        
+        assert response.contexts == ["Chunk A"]
+        assert response.contexts == ["Chunk A"]
+        resolver.assert_called_once()
+    
+    def test_partially_resolved_chunk_ids_raise_error(self):
+        """Test that a resolver returning fewer documents than IDs is an error"""
+        docs = [Document(id="id-1", page_content="Chunk A"), Document(id="id-2", page_content="Chunk B")]
+        response = RAGResponse.from_documents("Q", "A", docs, resolver=Mock(return_value=docs[:1]))
+        
+        with pytest.raises(LookupError, match="Resolved 1 of 2 chunk IDs"):
+            response.contexts
+    
+    def test_response_is_unhashable(self):
+        """Test that responses stay unhashable like the original eq dataclass"""
+        response = RAGResponse(question="Q", answer="A", contexts=[], source_documents=[])
+        
+        with pytest.raises(TypeError):
+            hash(response)
+    
+    @patch('src.rag_chain.ChatOpenAI')
+    @patch('src.rag_chain.RetrievalQA')
+    def test_response_resolves_from_its_own_index_version_after_swap(self, mock_retrieval_qa, mock_chat_openai):
+        """Test that a chain response built before a hot swap still resolves its chunk IDs"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            manager = VectorStoreManager(api_key="test-api-key")
+            manager.create_from_documents([Document(page_content=f"old {i}") for i in range(3)])
+            candidates = manager.similarity_search("old 1", k=2)
+            rag_chain = RAGChain(manager, api_key="test-key", k=2)
+            
+            with patch.object(rag_chain, "_generate", return_value="answer"):
+                response = rag_chain.query_with_candidates("Q", candidates)
+            manager.create_from_documents([Document(page_content=f"new {i}") for i in range(3)])
+            
+            assert response.chunk_ids == [doc.id for doc in candidates]
+            assert response.contexts == [doc.page_content for doc in candidates]
+    
+    @patch('src.rag_chain.ChatOpenAI')
+    @patch('src.rag_chain.RetrievalQA')
+    def test_candidates_from_replaced_index_are_held_directly(self, mock_retrieval_qa, mock_chat_openai):
+        """Test that documents missing from the current index version are kept as documents"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            manager = VectorStoreManager(api_key="test-api-key")
+            manager.create_from_documents([Document(page_content=f"old {i}") for i in range(3)])
+            candidates = manager.similarity_search("old 1", k=2)
+            manager.create_from_documents([Document(page_content=f"new {i}") for i in range(3)])
+            rag_chain = RAGChain(manager, api_key="test-key", k=2)
+            
+            with patch.object(rag_chain, "_generate", return_value="answer"):
+                response = rag_chain.query_with_candidates("Q", candidates)
+            
+            assert response.chunk_ids is None
+            assert response.source_documents == candidates
+    
+    def test_response_is_picklable(self):
+        """Test that pickling resolves the documents and drops the resolver"""
+        docs = [Document(id="id-1", page_content="Chunk A")]
+        # lambda 本身不能被 pickle，序列化前必须先取回文档并释放 resolver
+        response = RAGResponse.from_documents("Q", "A", docs, resolver=lambda ids: docs)
+        
+        restored = pickle.loads(pickle.dumps(response))
+        
+        assert restored == response
+        assert restored.chunk_ids == ["id-1"]
 
 
 # =============================================================================
@@ -0,0 +1,178 @@
+"""
+Tests for Reranker Module
+
+Tests the cross-encoder re-ranking stage using a mocked cross-encoder model.
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+from langchain_core.documents import Document
+from hypothesis import given, settings, strategies as st
+
+from src.models import RerankStats
+from src.reranker import CrossEncoderReranker, create_reranker, estimate_tokens
+
+
+def make_reranker(scores):
+    """Create a reranker whose model returns the given scores."""
+    reranker = CrossEncoderReranker(batch_size=4)
+    mock_model = Mock()
+    mock_model.predict.return_value = scores
+    reranker._model = mock_model
+    return reranker
+
+
+class TestCrossEncoderRerankerInit:
+    """Tests for CrossEncoderReranker initialization"""
+    
+    def test_init_defaults(self):
+        """Test default configuration and lazy model loading"""
+        reranker = CrossEncoderReranker()
+        
+        assert reranker.model_name == "BAAI/bge-reranker-base"
+        assert reranker.batch_size == 16
+        assert reranker.device == "cpu"
+        assert reranker._model is None
+    
+    def test_init_with_empty_model_name_raises_error(self):
+        """Test that empty model name raises ValueError"""
+        with pytest.raises(ValueError, match="Model name cannot be empty"):
+            CrossEncoderReranker(model_name="  ")
+    
+    def test_init_with_invalid_batch_size_raises_error(self):
+        """Test that batch_size <= 0 raises ValueError"""
+        with pytest.raises(ValueError, match="batch_size must be greater than 0"):
+            CrossEncoderReranker(batch_size=0)
+    
+    def test_missing_sentence_transformers_raises_import_error(self):
+        """Test that a helpful ImportError is raised when sentence-transformers is missing"""
+        reranker = CrossEncoderReranker()
+        
+        with patch.dict("sys.modules", {"sentence_transformers": None}):
+            with pytest.raises(ImportError, match="sentence-transformers"):
+                reranker.score("q", [Document(page_content="doc")])
+
+
+class TestCrossEncoderRerankerRerank:
+    """Tests for CrossEncoderReranker.rerank method"""
+    
+    def test_rerank_orders_by_score_and_keeps_top_n(self):
+        """Test that documents are sorted by score and truncated to top_n"""
+        documents = [Document(page_content=f"Doc {i}") for i in range(4)]
+        reranker = make_reranker([0.1, 0.9, 0.3, 0.7])
+        
+        selected, stats = reranker.rerank("query", documents, top_n=2)
+        
+        assert [doc.page_content for doc in selected] == ["Doc 1", "Doc 3"]
+        assert isinstance(stats, RerankStats)
+        assert stats.candidate_count == 4
+        assert stats.selected_count == 2
+        assert stats.rerank_latency_ms >= 0
+    
+    def test_tokens_saved_measured_against_top_n_without_rerank(self):
+        """Test that savings compare with the top_n documents vector search would have sent"""
+        documents = [
+            Document(page_content="long " * 40),
+            Document(page_content="long " * 40),
+            Document(page_content="short"),
+            Document(page_content="short"),
+        ]
+        reranker = make_reranker([0.1, 0.9, 0.8, 0.2])
+        
+        selected, stats = reranker.rerank("query", documents, top_n=2)
+        
+        baseline = sum(estimate_tokens(doc.page_content) for doc in documents[:2])
+        assert stats.baseline_tokens == baseline
+        assert stats.selected_tokens == estimate_tokens("long " * 40) + estimate_tokens("short")
+        assert stats.tokens_saved == baseline - stats.selected_tokens
+        assert stats.tokens_saved < stats.candidate_tokens - stats.selected_tokens
+    
+    def test_rerank_scores_pairs_in_batches_on_model(self):
+        """Test that the model is called with (query, text) pairs and the batch size"""
+        documents = [Document(page_content="A"), Document(page_content="B")]
+        reranker = make_reranker([0.5, 0.2])
+        
+        reranker.rerank("query", documents, top_n=1)
+        
+        reranker._model.predict.assert_called_once_with(
+            [("query", "A"), ("query", "B")],
+            batch_size=4,
+            show_progress_bar=False
+        )
+    
+    def test_rerank_with_empty_candidates(self):
+        """Test that an empty candidate list yields an empty selection"""
+        reranker = make_reranker([])
+        
+        selected, stats = reranker.rerank("query", [], top_n=3)
+        
+        assert selected == []
+        assert stats.candidate_count == 0
+        assert stats.tokens_saved == 0
+        reranker._model.predict.assert_not_called()
+    
+    def test_rerank_with_invalid_top_n_raises_error(self):
+        """Test that top_n <= 0 raises ValueError"""
+        reranker = make_reranker([])
+        
+        with pytest.raises(ValueError, match="top_n must be greater than 0"):
+            reranker.rerank("query", [], top_n=0)
+    
+    @settings(max_examples=50)
+    @given(
+        scores=st.lists(
+            st.floats(min_value=-10, max_value=10, allow_nan=False),
+            min_size=1,
+            max_size=20
+        ),
+        top_n=st.integers(min_value=1, max_value=25)
+    )
+    def test_property_rerank_selection_is_best_subset(self, scores, top_n):
+        """
+        For any candidate scores, the selection holds min(top_n, n) documents in
+        non-increasing score order, and the savings are measured against the
+        first min(top_n, n) candidates.
+        """
+        documents = [Document(page_content=f"Document number {i}") for i in range(len(scores))]
+        reranker = make_reranker(scores)
+        
+        selected, stats = reranker.rerank("query", documents, top_n=top_n)
+        
+        assert len(selected) == min(top_n, len(documents))
+        selected_scores = [scores[documents.index(doc)] for doc in selected]
+        assert selected_scores == sorted(selected_scores, reverse=True)
+        assert min(selected_scores) >= sorted(scores, reverse=True)[len(selected) - 1]
+        assert stats.baseline_tokens == sum(estimate_tokens(doc.page_content) for doc in documents[:top_n])
+        assert stats.tokens_saved == stats.baseline_tokens - stats.selected_tokens
+
+
+class TestEstimateTokens:
+    """Tests for estimate_tokens helper"""
+    
+    def test_estimate_tokens_fallback_counts_cjk_per_char(self):
+        """Test the heuristic used when tiktoken is unavailable"""
+        with patch("src.reranker._tokenizer", False):
+            assert estimate_tokens("检索增强") == 4
+            assert estimate_tokens("abcdefgh") == 2
+            assert estimate_tokens("") == 0
+    
+    def test_estimate_tokens_is_positive_for_text(self):
+        """Test that non-empty text has a positive token estimate"""
+        assert estimate_tokens("What is retrieval-augmented generation?") > 0
+
+
+class TestCreateReranker:
+    """Tests for create_reranker factory"""
+    
+    def test_create_reranker_disabled(self):
+        """Test that no reranker is created when disabled or unconfigured"""
+        assert create_reranker({}) is None
+        assert create_reranker({"enabled": False}) is None
+    
+    def test_create_reranker_enabled(self):
+        """Test that config values are passed to the reranker"""
+        reranker = create_reranker({"enabled": True, "model": "my-model", "batch_size": 8})
+        
+        assert isinstance(reranker, CrossEncoderReranker)
+        assert reranker.model_name == "my-model"
+        assert reranker.batch_size == 8
@@ -0,0 +1,113 @@
+"""
+Tests for Sampling Module
+
+Tests stratified sampling of evaluation samples and bootstrap confidence
+intervals used by the quick evaluation mode.
+"""
+
+import math
+from collections import Counter
+
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from src.models import EvaluationSample
+from src.sampling import (
+    bootstrap_intervals,
+    max_interval_width,
+    stratified_order,
+    stratified_sample,
+)
+
+
+def make_samples(categories):
+    """Create evaluation samples with the given categories."""
+    return [
+        EvaluationSample(question=f"Q{i}", ground_truth=f"GT{i}", category=category)
+        for i, category in enumerate(categories)
+    ]
+
+
+class TestStratifiedSampling:
+    """Tests for stratified_order and stratified_sample"""
+    
+    def test_sample_keeps_category_proportions(self):
+        """Test that a sample has the same category mix as the dataset"""
+        samples = make_samples(["a"] * 60 + ["b"] * 30 + ["c"] * 10)
+        
+        selected = stratified_sample(samples, 20, seed=1)
+        
+        assert Counter(s.category for s in selected) == {"a": 12, "b": 6, "c": 2}
+    
+    def test_sample_is_reproducible_with_seed(self):
+        """Test that the same seed selects the same samples"""
+        samples = make_samples(["a", "b"] * 10)
+        
+        first = stratified_sample(samples, 5, seed=7)
+        second = stratified_sample(samples, 5, seed=7)
+        
+        assert [s.question for s in first] == [s.question for s in second]
+    
+    def test_sample_larger_than_dataset_returns_all(self):
+        """Test that oversized samples return every sample once"""
+        samples = make_samples([None] * 3)
+        
+        assert len(stratified_sample(samples, 10, seed=0)) == 3
+    
+    def test_sample_with_invalid_size_raises_error(self):
+        """Test that size <= 0 raises ValueError"""
+        with pytest.raises(ValueError, match="Sample size must be greater than 0"):
+            stratified_sample(make_samples(["a"]), 0)
+    
+    @settings(max_examples=100)
+    @given(categories=st.lists(st.sampled_from(["a", "b", "c", None]), min_size=1, max_size=60))
+    def test_property_every_prefix_is_stratified(self, categories):
+        """
+        For any dataset, the stratified order is a permutation of all samples and
+        every prefix holds each category within one sample of its proportional share.
+        """
+        samples = make_samples(categories)
+        totals = Counter(categories)
+        
+        order = stratified_order(samples, seed=0)
+        
+        assert sorted(s.question for s in order) == sorted(s.question for s in samples)
+        taken = Counter()
+        for n, sample in enumerate(order, start=1):
+            taken[sample.category] += 1
+            for category, total in totals.items():
+                assert abs(taken[category] - n * total / len(samples)) < 1 + 1e-9
+
+
+class TestBootstrapIntervals:
+    """Tests for bootstrap_intervals"""
+    
+    def test_interval_contains_mean_and_ignores_nan(self):
+        """Test that the interval brackets the sample mean and NaN scores are skipped"""
+        details = [{"faithfulness": v} for v in [0.2, 0.4, 0.6, 0.8, 1.0]]
+        details.append({"faithfulness": float("nan")})
+        
+        intervals = bootstrap_intervals(details, ["faithfulness", "context_recall"], seed=0)
+        
+        low, high = intervals["faithfulness"]
+        assert low <= 0.6 <= high
+        assert "context_recall" not in intervals
+    
+    def test_interval_narrows_with_more_samples(self):
+        """Test that more samples give a narrower interval"""
+        small = [{"m": v} for v in [0.0, 1.0] * 5]
+        large = [{"m": v} for v in [0.0, 1.0] * 200]
+        
+        small_width = max_interval_width(bootstrap_intervals(small, ["m"], seed=0))
+        large_width = max_interval_width(bootstrap_intervals(large, ["m"], seed=0))
+        
+        assert large_width < small_width
+    
+    def test_invalid_confidence_raises_error(self):
+        """Test that confidence outside (0, 1) raises ValueError"""
+        with pytest.raises(ValueError, match="confidence must be between 0 and 1"):
+            bootstrap_intervals([], ["m"], confidence=1.0)
+    
+    def test_max_interval_width_without_intervals_is_infinite(self):
+        """Test that no intervals means the target width is never reached"""
+        assert max_interval_width({}) == math.inf
@@ -0,0 +1,82 @@
+"""
+Tests for Serialization Module
+
+Tests Arrow round trips of RAG responses and evaluation samples.
+"""
+
+import pytest
+from unittest.mock import Mock
+from langchain_core.documents import Document
+
+from src.models import EvaluationSample, RAGResponse, RerankStats
+
+pytest.importorskip("pyarrow")
+
+from src.serialization import (
+    read_responses,
+    read_samples,
+    responses_to_table,
+    write_responses,
+    write_samples,
+)
+
+
+class TestResponseSerialization:
+    """Tests for RAGResponse Arrow serialization"""
+    
+    def test_round_trip_with_contexts(self, tmp_path):
+        """Test that document-backed responses round trip with their contexts"""
+        stats = RerankStats(
+            candidate_count=20, selected_count=4, rerank_latency_ms=12.5,
+            candidate_tokens=800, baseline_tokens=150, selected_tokens=160
+        )
+        responses = [
+            RAGResponse.from_documents("Q1", "A1", [Document(page_content="C1")], rerank_stats=stats),
+            RAGResponse(question="Q2", answer="A2", contexts=[], source_documents=[]),
+        ]
+        path = str(tmp_path / "responses.arrow")
+        
+        write_responses(path, responses)
+        loaded = read_responses(path)
+        
+        assert loaded == responses
+        assert loaded[0].rerank_stats == stats
+    
+    def test_chunk_id_responses_store_ids_only(self, tmp_path):
+        """Test that ID-backed responses are written without context text and resolve on read"""
+        docs = [Document(id="id-1", page_content="Chunk text")]
+        response = RAGResponse.from_documents("Q", "A", docs, resolver=Mock(return_value=docs))
+        path = str(tmp_path / "responses.arrow")
+        
+        table = responses_to_table([response])
+        assert table.column("contexts").to_pylist() == [None]
+        assert table.column("chunk_ids").to_pylist() == [["id-1"]]
+        
+        write_responses(path, [response])
+        resolver = Mock(return_value=docs)
+        loaded = read_responses(path, resolver=resolver)
+        
+        assert loaded[0].chunk_ids == ["id-1"]
+        assert loaded[0].contexts == ["Chunk text"]
+        resolver.assert_called_once_with(["id-1"])
+
+
+class TestSampleSerialization:
+    """Tests for EvaluationSample Arrow serialization"""
+    
+    def test_round_trip(self, tmp_path):
+        """Test that samples round trip including optional fields"""
+        samples = [
+            EvaluationSample(question="Q1", ground_truth="GT1", contexts=["C"], category="概念"),
+            EvaluationSample(question="Q2", ground_truth="GT2"),
+        ]
+        path = str(tmp_path / "samples.arrow")
+        
+        write_samples(path, samples)
+        
+        assert read_samples(path) == samples
+    
+    def test_read_missing_file_raises_error(self, tmp_path):
+        """Test that reading a missing file raises FileNotFoundError"""
+        with pytest.raises(FileNotFoundError, match="Arrow file not found"):
+            read_samples(str(tmp_path / "missing.arrow"))
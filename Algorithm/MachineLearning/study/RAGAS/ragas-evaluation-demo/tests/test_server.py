@@ -0,0 +1,260 @@
+"""
+Tests for RAG Query Server Module
+
+Tests request batching, index watching, the query service and the HTTP
+endpoints using mocked RAG chain and vector store components.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+from unittest.mock import Mock
+from langchain_core.documents import Document
+
+from src.models import RAGResponse
+from src.server import IndexWatcher, QueryBatcher, RAGHTTPServer, RAGQueryService
+
+
+def make_service(**kwargs):
+    """Create a RAGQueryService around a mocked RAG chain."""
+    mock_vsm = Mock()
+    mock_vsm.get_document_count.return_value = 3
+    mock_vsm.version = 1
+    mock_vsm.retiring_count = 0
+    mock_vsm.batch_similarity_search.side_effect = lambda queries, k: [
+        [Document(page_content=f"{q} doc {i}", metadata={"source": f"{q}.md"}) for i in range(k)]
+        for q in queries
+    ]
+    
+    mock_chain = Mock()
+    mock_chain.vector_store_manager = mock_vsm
+    mock_chain.candidate_k = 2
+    mock_chain.query_with_candidates.side_effect = lambda question, candidates: RAGResponse(
+        question=question,
+        answer=f"answer to {question}",
+        contexts=[doc.page_content for doc in candidates],
+        source_documents=candidates
+    )
+    return RAGQueryService(mock_chain, **kwargs)
+
+
+class TestQueryBatcher:
+    """Tests for QueryBatcher"""
+    
+    def test_init_with_invalid_batch_size_raises_error(self):
+        """Test that max_batch_size <= 0 raises ValueError"""
+        with pytest.raises(ValueError, match="max_batch_size must be greater than 0"):
+            QueryBatcher(Mock(), max_batch_size=0)
+    
+    def test_submit_without_start_raises_error(self):
+        """Test that submitting before start raises RuntimeError"""
+        batcher = QueryBatcher(Mock())
+        
+        with pytest.raises(RuntimeError, match="not running"):
+            batcher.submit("q", 1)
+    
+    def test_concurrent_requests_are_coalesced(self):
+        """Test that concurrent submissions are served by a single batched search"""
+        calls = []
+        
+        def search_fn(queries, k):
+            calls.append((list(queries), k))
+            return [[Document(page_content=f"{q}-{i}") for i in range(k)] for q in queries]
+        
+        batcher = QueryBatcher(search_fn, max_batch_size=8, max_wait_ms=200)
+        batcher.start()
+        results = {}
+        
+        def worker(name, k):
+            results[name] = batcher.submit(name, k)
+        
+        try:
+            threads = [threading.Thread(target=worker, args=(f"q{i}", i + 1)) for i in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            batcher.stop()
+        
+        assert len(calls) == 1
+        assert sorted(calls[0][0]) == ["q0", "q1", "q2", "q3"]
+        assert calls[0][1] == 4
+        # Each request is sliced back to its own k
+        for i in range(4):
+            assert [doc.page_content for doc in results[f"q{i}"]] == [f"q{i}-{j}" for j in range(i + 1)]
+        assert batcher.batch_count == 1
+        assert batcher.request_count == 4
+    
+    def test_search_errors_are_propagated(self):
+        """Test that an exception in the batched search is raised to each caller"""
+        batcher = QueryBatcher(Mock(side_effect=RuntimeError("index unavailable")), max_wait_ms=0)
+        batcher.start()
+        try:
+            with pytest.raises(RuntimeError, match="index unavailable"):
+                batcher.submit("q", 2)
+        finally:
+            batcher.stop()
+
+
+class TestIndexWatcher:
+    """Tests for IndexWatcher"""
+    
+    def test_signature_none_when_files_missing(self, tmp_path):
+        """Test that an incomplete index directory has no signature"""
+        (tmp_path / "index.faiss").write_bytes(b"x")
+        watcher = IndexWatcher(str(tmp_path), Mock())
+        
+        assert watcher.signature() is None
+    
+    def test_reload_triggered_after_index_is_rewritten(self, tmp_path):
+        """Test that on_change fires once a rewritten index is stable"""
+        (tmp_path / "index.faiss").write_bytes(b"v1")
+        (tmp_path / "index.pkl").write_bytes(b"v1")
+        changed = threading.Event()
+        watcher = IndexWatcher(str(tmp_path), changed.set, interval=0.05)
+        watcher.start()
+        try:
+            time.sleep(0.1)
+            (tmp_path / "index.faiss").write_bytes(b"version-2")
+            assert changed.wait(timeout=2)
+        finally:
+            watcher.stop()
+    
+    def test_signature_follows_generation_marker(self, tmp_path):
+        """Test that a directory with a generation marker is signed by its generation"""
+        (tmp_path / "index.faiss").write_bytes(b"v1")
+        (tmp_path / "index.pkl").write_bytes(b"v1")
+        (tmp_path / "index.generation").write_text(json.dumps({"generation": 3, "files": {}}))
+        watcher = IndexWatcher(str(tmp_path), Mock())
+        
+        assert watcher.signature() == ("generation", 3)
+        
+        # 索引文件被替换但标记未更新（保存尚未完成）时签名不变
+        (tmp_path / "index.faiss").write_bytes(b"version-2")
+        assert watcher.signature() == ("generation", 3)
+
+
+class TestRAGQueryService:
+    """Tests for RAGQueryService"""
+    
+    def test_query_uses_batched_retrieval(self):
+        """Test that query retrieves through the batcher and answers from candidates"""
+        service = make_service()
+        service.start()
+        try:
+            result = service.query("What is RAG?")
+        finally:
+            service.stop()
+        
+        assert result["answer"] == "answer to What is RAG?"
+        assert result["contexts"] == ["What is RAG? doc 0", "What is RAG? doc 1"]
+        assert result["sources"] == ["What is RAG?.md", "What is RAG?.md"]
+        assert result["latency_ms"] >= result["retrieval_ms"] >= 0
+        service.vector_store_manager.batch_similarity_search.assert_called_once_with(["What is RAG?"], 2)
+    
+    def test_query_with_empty_question_raises_error(self):
+        """Test that empty question raises ValueError"""
+        service = make_service()
+        
+        with pytest.raises(ValueError, match="Question cannot be empty"):
+            service.query("  ")
+    
+    def test_reload_loads_index_in_background_with_mmap(self):
+        """Test that reload loads the persisted index read-only without blocking queries"""
+        service = make_service(index_path="data/vector_store")
+        future = Mock()
+        future.result.return_value = 2
+        service.vector_store_manager.load_async.return_value = future
+        
+        service.reload()
+        
+        service.vector_store_manager.load_async.assert_called_once_with("data/vector_store", mmap=True)
+        service.vector_store_manager.load.assert_not_called()
+    
+    def test_health(self):
+        """Test the health report contents"""
+        service = make_service()
+        
+        health = service.health()
+        
+        assert health["status"] == "ok"
+        assert health["pid"] == os.getpid()
+        assert health["index_version"] == 1
+        assert health["document_count"] == 3
+
+
+class TestRAGHTTPServer:
+    """End-to-end tests for the HTTP endpoints (single process)"""
+    
+    @pytest.fixture
+    def base_url(self):
+        service = make_service()
+        httpd = RAGHTTPServer(("127.0.0.1", 0), service)
+        service.start()
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{httpd.server_address[1]}"
+        httpd.shutdown()
+        httpd.server_close()
+        service.stop()
+    
+    def test_health_endpoint(self, base_url):
+        """Test GET /health"""
+        with urllib.request.urlopen(f"{base_url}/health") as resp:
+            body = json.loads(resp.read())
+        
+        assert resp.status == 200
+        assert body["status"] == "ok"
+    
+    def test_query_endpoint(self, base_url):
+        """Test POST /query"""
+        request = urllib.request.Request(
+            f"{base_url}/query",
+            data=json.dumps({"question": "什么是 RAG？"}).encode("utf-8"),
+            method="POST"
+        )
+        with urllib.request.urlopen(request) as resp:
+            body = json.loads(resp.read())
+        
+        assert body["answer"] == "answer to 什么是 RAG？"
+        assert len(body["contexts"]) == 2
+    
+    def test_query_endpoint_rejects_missing_question(self, base_url):
+        """Test that POST /query without a question returns 400"""
+        request = urllib.request.Request(f"{base_url}/query", data=b"{}", method="POST")
+        
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            urllib.request.urlopen(request)
+        
+        assert exc_info.value.code == 400
+    
+    def test_accepted_connections_are_blocking(self):
+        """Test that connections accepted from a non-blocking listener are set back to blocking"""
+        httpd = RAGHTTPServer(("127.0.0.1", 0), make_service())
+        httpd.socket.setblocking(False)
+        client = socket.create_connection(httpd.server_address)
+        try:
+            for _ in range(100):
+                try:
+                    conn, _ = httpd.get_request()
+                    break
+                except BlockingIOError:
+                    time.sleep(0.01)
+            assert conn.getblocking()
+            conn.close()
+        finally:
+            client.close()
+            httpd.server_close()
+    
+    def test_unknown_path_returns_404(self, base_url):
+        """Test that unknown paths return 404"""
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            urllib.request.urlopen(f"{base_url}/unknown")
+        
+        assert exc_info.value.code == 404
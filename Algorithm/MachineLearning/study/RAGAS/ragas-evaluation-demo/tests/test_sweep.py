@@ -0,0 +1,124 @@
+"""
+Tests for Sweep Module
+
+Tests grid expansion, work sharing across configs and the comparison table,
+using deterministic embeddings and mocked LLM and RAGAS calls.
+"""
+
+import json
+import pytest
+from unittest.mock import Mock, patch
+
+from src.models import EvaluationResult
+from src.sweep import SweepConfig, SweepResult, SweepRunner, expand_grid, format_comparison_table
+from src.vector_store import VectorStoreManager
+from tests.test_vector_store import DeterministicEmbeddings
+
+
+def make_result(score):
+    """Create an EvaluationResult with the same score for every metric."""
+    return EvaluationResult(
+        faithfulness=score,
+        answer_relevancy=score,
+        context_precision=score,
+        context_recall=score,
+        details=[],
+    )
+
+
+class TestExpandGrid:
+    """Tests for expand_grid"""
+    
+    def test_expand_grid_skips_invalid_overlap(self):
+        """Test that combinations with overlap >= size are skipped"""
+        configs = expand_grid([100, 300], [50, 150], [2, 4])
+        
+        assert SweepConfig(100, 150, 2) not in configs
+        assert len(configs) == 6
+        assert {c.chunking for c in configs} == {(100, 50), (300, 50), (300, 150)}
+
+
+class TestSweepRunner:
+    """Tests for SweepRunner"""
+    
+    @pytest.fixture
+    def paths(self, tmp_path):
+        docs = tmp_path / "documents"
+        docs.mkdir()
+        (docs / "rag.md").write_text(
+            "\n\n".join(f"RAG 段落 {i}：检索增强生成把检索到的文档放进提示词。" * 3 for i in range(10)),
+            encoding="utf-8"
+        )
+        dataset = tmp_path / "dataset.json"
+        dataset.write_text(json.dumps({"samples": [
+            {"question": f"问题 {i}", "ground_truth": f"答案 {i}"} for i in range(3)
+        ]}, ensure_ascii=False), encoding="utf-8")
+        return str(docs), str(dataset)
+    
+    def test_init_with_invalid_workers_raises_error(self):
+        """Test that max_workers <= 0 raises ValueError"""
+        with pytest.raises(ValueError, match="max_workers must be greater than 0"):
+            SweepRunner("docs", "dataset.json", max_workers=0)
+    
+    def test_run_with_empty_configs_raises_error(self, paths):
+        """Test that an empty grid raises ValueError"""
+        with pytest.raises(ValueError, match="Sweep configs cannot be empty"):
+            SweepRunner(*paths).run([])
+    
+    @patch("src.rag_chain.ChatOpenAI")
+    @patch("src.rag_chain.RetrievalQA")
+    @patch("src.vector_store.OpenAIEmbeddings")
+    def test_run_shares_embedding_and_retrieval(self, mock_embeddings_cls, mock_retrieval_qa, mock_chat_openai, paths):
+        """Test that each chunking is embedded and searched once at max k and sliced per config"""
+        mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+        mock_chain = Mock()
+        mock_chain.combine_documents_chain.input_key = "input_documents"
+        mock_chain.combine_documents_chain.output_key = "output_text"
+        mock_chain.combine_documents_chain.invoke.return_value = {"output_text": "答案"}
+        mock_retrieval_qa.from_chain_type.return_value = mock_chain
+        
+        datasets = {}
+        
+        def fake_evaluate(evaluator, dataset):
+            datasets[evaluator.rag_chain.k] = dataset
+            return make_result(0.5)
+        
+        configs = expand_grid([60, 120], [10], [1, 3])
+        runner = SweepRunner(*paths, api_key="test-key", max_workers=2)
+        
+        with patch.object(VectorStoreManager, "create_from_documents", autospec=True,
+                          side_effect=VectorStoreManager.create_from_documents) as create_spy, \
+                patch.object(VectorStoreManager, "batch_similarity_search", autospec=True,
+                             side_effect=VectorStoreManager.batch_similarity_search) as search_spy, \
+                patch("src.sweep.RagasEvaluator.evaluate", autospec=True, side_effect=fake_evaluate):
+            results = runner.run(configs)
+        
+        assert create_spy.call_count == 2
+        assert search_spy.call_count == 2
+        assert all(call.kwargs["k"] == 3 for call in search_spy.call_args_list)
+        assert [r.config for r in results] == configs
+        assert all(len(contexts) == 1 for contexts in datasets[1]["contexts"])
+        assert all(len(contexts) == 3 for contexts in datasets[3]["contexts"])
+        # Configs with the same chunking share the index and its embedding cost
+        assert results[0].chunk_count == results[1].chunk_count
+        assert results[0].embedding_tokens == results[1].embedding_tokens
+        assert results[0].chunk_count > results[2].chunk_count
+        assert results[1].prompt_tokens > results[0].prompt_tokens
+
+
+class TestFormatComparisonTable:
+    """Tests for format_comparison_table"""
+    
+    def test_table_is_sorted_by_average_score(self):
+        """Test that the best config is listed first with all columns"""
+        results = [
+            SweepResult(SweepConfig(500, 50, 2), make_result(0.6), 10, 1.0, 100.0, 1000, 400),
+            SweepResult(SweepConfig(300, 50, 4), make_result(0.8), 16, 1.2, 120.0, 1100, 700),
+        ]
+        
+        table = format_comparison_table(results).splitlines()
+        
+        assert len(table) == 4
+        assert "size=300 overlap=50 k=4" in table[2]
+        assert "0.8000" in table[2]
+        assert "size=500 overlap=50 k=2" in table[3]
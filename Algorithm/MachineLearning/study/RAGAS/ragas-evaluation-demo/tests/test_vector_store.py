@@ -5,6 +5,8 @@ Tests the vector storage and retrieval functionality.
 """
 
 import os
+import threading
+import time
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 import numpy as np
@@ -12,7 +14,15 @@ import numpy as np
 from langchain_core.documents import Document
 from hypothesis import given, settings, strategies as st, assume
 
-from src.vector_store import VectorStoreManager
+from src.vector_store import IndexHandle, ManagedRetriever, VectorStoreManager, file_stamps, read_generation
+
+
+def make_mock_store():
+    """Create a mocked FAISS store with an empty document mapping."""
+    store = Mock()
+    store.index.ntotal = 0
+    store.index_to_docstore_id = {}
+    return store
 
 
 class TestVectorStoreManagerInit:
@@ -62,7 +72,7 @@ class TestVectorStoreManagerCreateFromDocuments:
                 mock_embeddings = Mock()
                 mock_embeddings_cls.return_value = mock_embeddings
                 
-                mock_vector_store = Mock()
+                mock_vector_store = make_mock_store()
                 mock_faiss.from_documents.return_value = mock_vector_store
                 
                 manager = VectorStoreManager(api_key="test-api-key")
@@ -97,7 +107,7 @@ class TestVectorStoreManagerAddDocuments:
         """Test that empty documents list raises ValueError"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_faiss.from_documents.return_value = Mock()
+                mock_faiss.from_documents.return_value = make_mock_store()
                 
                 manager = VectorStoreManager(api_key="test-api-key")
                 manager.create_from_documents([Document(page_content="Initial")])
@@ -109,7 +119,7 @@ class TestVectorStoreManagerAddDocuments:
         """Test successful addition of documents"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_vector_store = Mock()
+                mock_vector_store = make_mock_store()
                 mock_faiss.from_documents.return_value = mock_vector_store
                 
                 manager = VectorStoreManager(api_key="test-api-key")
@@ -136,7 +146,7 @@ class TestVectorStoreManagerSimilaritySearch:
         """Test that empty query raises ValueError"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_faiss.from_documents.return_value = Mock()
+                mock_faiss.from_documents.return_value = make_mock_store()
                 
                 manager = VectorStoreManager(api_key="test-api-key")
                 manager.create_from_documents([Document(page_content="Test")])
@@ -148,7 +158,7 @@ class TestVectorStoreManagerSimilaritySearch:
         """Test that whitespace-only query raises ValueError"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_faiss.from_documents.return_value = Mock()
+                mock_faiss.from_documents.return_value = make_mock_store()
                 
                 manager = VectorStoreManager(api_key="test-api-key")
                 manager.create_from_documents([Document(page_content="Test")])
@@ -160,7 +170,7 @@ class TestVectorStoreManagerSimilaritySearch:
         """Test that k <= 0 raises ValueError"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_faiss.from_documents.return_value = Mock()
+                mock_faiss.from_documents.return_value = make_mock_store()
                 
                 manager = VectorStoreManager(api_key="test-api-key")
                 manager.create_from_documents([Document(page_content="Test")])
@@ -175,7 +185,7 @@ class TestVectorStoreManagerSimilaritySearch:
         """Test successful similarity search"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_vector_store = Mock()
+                mock_vector_store = make_mock_store()
                 expected_results = [
                     Document(page_content="Result 1"),
                     Document(page_content="Result 2")
@@ -195,7 +205,7 @@ class TestVectorStoreManagerSimilaritySearch:
         """Test that default k is 4"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_vector_store = Mock()
+                mock_vector_store = make_mock_store()
                 mock_vector_store.similarity_search.return_value = []
                 mock_faiss.from_documents.return_value = mock_vector_store
                 
@@ -214,7 +224,7 @@ class TestVectorStoreManagerSimilaritySearchWithScore:
         """Test successful similarity search with scores"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_vector_store = Mock()
+                mock_vector_store = make_mock_store()
                 doc1 = Document(page_content="Result 1")
                 doc2 = Document(page_content="Result 2")
                 expected_results = [(doc1, 0.1), (doc2, 0.2)]
@@ -245,7 +255,7 @@ class TestVectorStoreManagerSaveLoad:
         """Test that empty path raises ValueError"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_faiss.from_documents.return_value = Mock()
+                mock_faiss.from_documents.return_value = make_mock_store()
                 
                 manager = VectorStoreManager(api_key="test-api-key")
                 manager.create_from_documents([Document(page_content="Test")])
@@ -257,7 +267,10 @@ class TestVectorStoreManagerSaveLoad:
         """Test successful save operation"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_vector_store = Mock()
+                mock_vector_store = make_mock_store()
+                mock_vector_store.save_local.side_effect = lambda folder: [
+                    open(os.path.join(folder, name), "wb").close() for name in ("index.faiss", "index.pkl")
+                ]
                 mock_faiss.from_documents.return_value = mock_vector_store
                 
                 manager = VectorStoreManager(api_key="test-api-key")
@@ -266,8 +279,9 @@ class TestVectorStoreManagerSaveLoad:
                 save_path = str(tmp_path / "vector_store")
                 manager.save(save_path)
                 
-                mock_vector_store.save_local.assert_called_once_with(save_path)
-                assert os.path.exists(save_path)
+                # 先写入临时目录，再替换到目标目录，临时目录随后被清理
+                mock_vector_store.save_local.assert_called_once()
+                assert sorted(os.listdir(save_path)) == ["index.faiss", "index.generation", "index.pkl"]
     
     def test_load_with_empty_path_raises_error(self):
         """Test that empty path raises ValueError"""
@@ -292,7 +306,7 @@ class TestVectorStoreManagerSaveLoad:
                 mock_embeddings = Mock()
                 mock_embeddings_cls.return_value = mock_embeddings
                 
-                mock_loaded_store = Mock()
+                mock_loaded_store = make_mock_store()
                 mock_faiss.load_local.return_value = mock_loaded_store
                 
                 manager = VectorStoreManager(api_key="test-api-key")
@@ -310,8 +324,417 @@ class TestVectorStoreManagerSaveLoad:
                     embeddings=mock_embeddings,
                     allow_dangerous_deserialization=True
                 )
+    
+    def test_load_with_mmap_round_trip(self, tmp_path):
+        """Test that an index saved to disk can be loaded read-only via mmap"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            
+            manager = VectorStoreManager(api_key="test-api-key")
+            manager.create_from_documents([
+                Document(page_content="alpha"),
+                Document(page_content="beta"),
+                Document(page_content="gamma")
+            ])
+            save_path = str(tmp_path / "vector_store")
+            manager.save(save_path)
+            
+            loaded = VectorStoreManager(api_key="test-api-key")
+            loaded.load(save_path, mmap=True)
+            
+            assert loaded.get_document_count() == 3
+            assert loaded.similarity_search("beta", k=1)[0].page_content == "beta"
+    
+    def test_save_over_mmapped_index_keeps_loaded_copy_intact(self, tmp_path):
+        """Test that overwriting a saved index does not disturb a process that has it mapped"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            
+            manager = VectorStoreManager(api_key="test-api-key")
+            manager.create_from_documents([Document(page_content="alpha"), Document(page_content="beta")])
+            save_path = str(tmp_path / "vector_store")
+            manager.save(save_path)
+            
+            loaded = VectorStoreManager(api_key="test-api-key")
+            loaded.load(save_path, mmap=True)
+            
+            manager.create_from_documents([Document(page_content=f"doc {i}") for i in range(50)])
+            manager.save(save_path)
+            
+            assert loaded.get_document_count() == 2
+            assert loaded.similarity_search("beta", k=1)[0].page_content == "beta"
+            assert sorted(os.listdir(save_path)) == ["index.faiss", "index.generation", "index.pkl"]
+            
+            reloaded = VectorStoreManager(api_key="test-api-key")
+            reloaded.load(save_path, mmap=True)
+            assert reloaded.get_document_count() == 50
+    
+    def test_save_writes_generation_marker_last(self, tmp_path):
+        """Test that each save bumps the generation marker and records the file stamps"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            
+            manager = VectorStoreManager(api_key="test-api-key")
+            manager.create_from_documents([Document(page_content="alpha")])
+            save_path = str(tmp_path / "vector_store")
+            manager.save(save_path)
+            manager.save(save_path)
+            
+            marker = read_generation(save_path)
+            assert marker["generation"] == 2
+            assert marker["files"] == file_stamps(save_path)
+    
+    def test_load_rejects_files_from_different_saves(self, tmp_path):
+        """Test that an index.faiss / index.pkl pair not matching the marker is not loaded"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            
+            manager = VectorStoreManager(api_key="test-api-key")
+            manager.create_from_documents([Document(page_content="alpha")])
+            save_path = str(tmp_path / "vector_store")
+            manager.save(save_path)
+            
+            # 模拟另一次保存只替换了 index.faiss、尚未写入新标记
+            manager.create_from_documents([Document(page_content=f"doc {i}") for i in range(5)])
+            other_path = str(tmp_path / "other")
+            manager.save(other_path)
+            os.replace(os.path.join(other_path, "index.faiss"), os.path.join(save_path, "index.faiss"))
+            
+            loaded = VectorStoreManager(api_key="test-api-key")
+            with pytest.raises(RuntimeError, match="kept changing"):
+                loaded._read_store(save_path, mmap=True, attempts=2)
+
+
+class TestVectorStoreManagerBatchSimilaritySearch:
+    """Tests for batch_similarity_search method"""
+    
+    def test_batch_similarity_search_without_initialization_raises_error(self):
+        """Test that batch search without initialization raises ValueError"""
+        with patch('src.vector_store.OpenAIEmbeddings'):
+            manager = VectorStoreManager(api_key="test-api-key")
+            
+            with pytest.raises(ValueError, match="Vector store not initialized"):
+                manager.batch_similarity_search(["query"])
+    
+    def test_batch_similarity_search_with_empty_queries_raises_error(self):
+        """Test that an empty query list or empty query raises ValueError"""
+        with patch('src.vector_store.OpenAIEmbeddings'):
+            with patch('src.vector_store.FAISS') as mock_faiss:
+                mock_faiss.from_documents.return_value = make_mock_store()
+                manager = VectorStoreManager(api_key="test-api-key")
+                manager.create_from_documents([Document(page_content="Test")])
+                
+                with pytest.raises(ValueError, match="Queries list cannot be empty"):
+                    manager.batch_similarity_search([])
+                with pytest.raises(ValueError, match="Query cannot be empty"):
+                    manager.batch_similarity_search(["ok", "  "])
+    
+    def test_batch_similarity_search_matches_single_queries(self):
+        """Test that batched results equal per-query similarity_search results with one embedding call"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            embeddings = DeterministicEmbeddings(dimension=16)
+            mock_embeddings_cls.return_value = embeddings
+            
+            manager = VectorStoreManager(api_key="test-api-key")
+            manager.create_from_documents([Document(page_content=f"doc {i}") for i in range(8)])
+            queries = ["doc 1", "doc 5", "something else"]
+            
+            with patch.object(embeddings, "embed_documents", wraps=embeddings.embed_documents) as spy:
+                batched = manager.batch_similarity_search(queries, k=3)
+                assert spy.call_count == 1
+            
+            for query, docs in zip(queries, batched):
+                expected = manager.similarity_search(query, k=3)
+                assert [d.page_content for d in docs] == [d.page_content for d in expected]
+    
+    def test_batch_similarity_search_k_larger_than_store(self):
+        """Test that k larger than the number of vectors returns all documents"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            
+            manager = VectorStoreManager(api_key="test-api-key")
+            manager.create_from_documents([Document(page_content="a"), Document(page_content="b")])
+            
+            results = manager.batch_similarity_search(["a"], k=10)
+            
+            assert len(results) == 1
+            assert len(results[0]) == 2
+
+
+class TestVectorStoreManagerFilteredSearch:
+    """Tests for metadata-filtered similarity search"""
+    
+    @staticmethod
+    def make_manager(embeddings):
+        manager = VectorStoreManager(api_key="test-api-key", metadata_fields=("source", "lang"))
+        manager.create_from_documents([
+            Document(page_content=f"doc {i}", metadata={"source": f"file{i % 3}.md", "lang": "en" if i < 6 else "zh"})
+            for i in range(12)
+        ])
+        return manager
+    
+    def test_similarity_search_returns_only_matching_documents(self):
+        """Test that a filter restricts results to matching metadata while keeping k"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            manager = self.make_manager(mock_embeddings_cls.return_value)
+            
+            results = manager.similarity_search("doc 1", k=3, filter={"source": "file1.md"})
+            
+            assert len(results) == 3
+            assert all(doc.metadata["source"] == "file1.md" for doc in results)
+    
+    def test_filtered_search_matches_brute_force_ranking(self):
+        """Test that filtered results equal the unfiltered ranking restricted to matches"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            manager = self.make_manager(mock_embeddings_cls.return_value)
+            predicates = {"source": ["file0.md", "file2.md"], "lang": "en"}
+            
+            filtered = manager.similarity_search_with_score("query", k=3, filter=predicates)
+            ranked = manager.similarity_search_with_score("query", k=12)
+            expected = [
+                (doc.page_content, score) for doc, score in ranked
+                if doc.metadata["source"] in predicates["source"] and doc.metadata["lang"] == "en"
+            ][:3]
+            
+            assert [(doc.page_content, pytest.approx(score)) for doc, score in filtered] == expected
+    
+    def test_filter_without_matches_returns_empty(self):
+        """Test that a filter matching nothing returns no documents"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            manager = self.make_manager(mock_embeddings_cls.return_value)
+            
+            assert manager.similarity_search("doc 1", k=3, filter={"source": "missing.md"}) == []
+            assert manager.batch_similarity_search(["a", "b"], k=3, filter={"lang": "fr"}) == [[], []]
+    
+    def test_filter_on_unindexed_field_raises_error(self):
+        """Test that filtering on a field without bitmaps raises ValueError"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            manager = self.make_manager(mock_embeddings_cls.return_value)
+            
+            with pytest.raises(ValueError, match="Metadata field is not indexed: author"):
+                manager.similarity_search("doc 1", k=3, filter={"author": "x"})
+    
+    def test_metadata_index_is_built_when_index_is_created(self):
+        """Test that the bitmaps are precomputed before the first filtered query"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            manager = self.make_manager(mock_embeddings_cls.return_value)
+            
+            handle = manager._handle
+            assert handle.metadata_index is not None
+            assert sorted(handle.metadata_index.fields) == ["lang", "source"]
+            assert manager.build_metadata_index() is handle.metadata_index
+    
+    def test_batch_filtered_search_matches_single_queries(self):
+        """Test that batched filtered results equal per-query filtered results"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            manager = self.make_manager(mock_embeddings_cls.return_value)
+            queries = ["doc 2", "doc 7", "other"]
+            
+            batched = manager.batch_similarity_search(queries, k=2, filter={"lang": "zh"})
+            
+            for query, docs in zip(queries, batched):
+                expected = manager.similarity_search(query, k=2, filter={"lang": "zh"})
+                assert [d.page_content for d in docs] == [d.page_content for d in expected]
+    
+    def test_overfetch_fallback_when_selector_unsupported(self):
+        """Test that indexes without search-time filtering fall back to over-fetch and post-filter"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            manager = self.make_manager(mock_embeddings_cls.return_value)
+            expected = manager.similarity_search("query", k=3, filter={"source": "file2.md"})
+            
+            with patch("faiss.IDSelectorBitmap", side_effect=TypeError("unsupported")):
+                results = manager.similarity_search("query", k=3, filter={"source": "file2.md"})
+            
+            assert [d.page_content for d in results] == [d.page_content for d in expected]
+    
+    def test_metadata_index_is_rebuilt_after_add_documents(self):
+        """Test that documents added after the bitmaps were built are filterable"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            manager = self.make_manager(mock_embeddings_cls.return_value)
+            assert manager.build_metadata_index().size == 12
+            
+            manager.add_documents([Document(page_content="new doc", metadata={"source": "new.md"})])
+            results = manager.similarity_search("new doc", k=2, filter={"source": "new.md"})
+            
+            assert [d.page_content for d in results] == ["new doc"]
+            assert manager.build_metadata_index().size == 13
+
+
+class TestVectorStoreManagerGetDocuments:
+    """Tests for get_documents method"""
+    
+    def test_get_documents_resolves_ids_in_order(self):
+        """Test that chunk IDs returned by search resolve back to the same documents"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            manager = VectorStoreManager(api_key="test-api-key")
+            manager.create_from_documents([Document(page_content=f"doc {i}") for i in range(5)])
+            results = manager.similarity_search("doc 3", k=3)
+            
+            resolved = manager.get_documents([doc.id for doc in reversed(results)])
+            
+            assert [d.page_content for d in resolved] == [d.page_content for d in reversed(results)]
+    
+    def test_get_documents_with_missing_id_raises_error(self):
+        """Test that IDs no longer in the index are reported instead of silently skipped"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            manager = VectorStoreManager(api_key="test-api-key")
+            manager.create_from_documents([Document(page_content="doc")])
+            doc_id = manager.similarity_search("doc", k=1)[0].id
+            
+            with pytest.raises(KeyError, match="missing"):
+                manager.get_documents([doc_id, "missing"])
+    
+    def test_document_resolver_keeps_resolving_after_index_swap(self):
+        """Test that a resolver pinned before a hot swap still resolves from its own index version"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            manager = VectorStoreManager(api_key="test-api-key")
+            manager.create_from_documents([Document(page_content=f"old {i}") for i in range(3)])
+            results = manager.similarity_search("old 1", k=2)
+            resolver = manager.document_resolver()
+            
+            manager.create_from_documents([Document(page_content=f"new {i}") for i in range(3)])
+            
+            ids = [doc.id for doc in results]
+            assert resolver.covers(results)
+            assert resolver(ids) == results
+            with pytest.raises(KeyError):
+                manager.get_documents(ids)
+            assert not manager.document_resolver().covers(results)
+    
+    def test_get_documents_without_initialization_raises_error(self):
+        """Test that resolving IDs without a store raises ValueError"""
+        with patch('src.vector_store.OpenAIEmbeddings'):
+            manager = VectorStoreManager(api_key="test-api-key")
+            
+            with pytest.raises(ValueError, match="Vector store not initialized"):
+                manager.get_documents(["id"])
+
+
+class TestIndexHandle:
+    """Tests for IndexHandle reference counting and retirement"""
+    
+    def test_retire_waits_for_in_flight_queries(self):
+        """Test that a retired handle frees its store only after in-flight queries release it"""
+        store = Mock()
+        handle = IndexHandle(store, version=1)
+        assert handle.acquire() is True
+        
+        assert handle.retire(timeout=0.05) is False
+        assert handle.store is store
+        assert handle.acquire() is False
+        
+        handle.release()
+        assert handle.retire(timeout=1) is True
+        assert handle.store is None
 
 
+class TestVectorStoreManagerHotSwap:
+    """Tests for versioned index swapping"""
+    
+    def test_version_increments_on_each_new_index(self, tmp_path):
+        """Test that create and load each produce a new index version"""
+        with patch('src.vector_store.OpenAIEmbeddings'):
+            with patch('src.vector_store.FAISS') as mock_faiss:
+                mock_faiss.from_documents.return_value = make_mock_store()
+                mock_faiss.load_local.return_value = make_mock_store()
+                manager = VectorStoreManager(api_key="test-api-key")
+                assert manager.version == 0
+                
+                manager.create_from_documents([Document(page_content="Test")])
+                assert manager.version == 1
+                
+                manager.load(str(tmp_path))
+                assert manager.version == 2
+                assert manager.vector_store is mock_faiss.load_local.return_value
+    
+    def test_in_flight_query_keeps_old_index_until_drained(self):
+        """Test that a swap is immediate for new queries while in-flight queries finish on the old index"""
+        with patch('src.vector_store.OpenAIEmbeddings'):
+            with patch('src.vector_store.FAISS') as mock_faiss:
+                entered = threading.Event()
+                proceed = threading.Event()
+                old_store = make_mock_store()
+                
+                def slow_search(query, k):
+                    entered.set()
+                    proceed.wait(timeout=5)
+                    return [Document(page_content="old")]
+                
+                old_store.similarity_search.side_effect = slow_search
+                new_store = make_mock_store()
+                new_store.similarity_search.return_value = [Document(page_content="new")]
+                mock_faiss.from_documents.side_effect = [old_store, new_store]
+                
+                manager = VectorStoreManager(api_key="test-api-key")
+                manager.create_from_documents([Document(page_content="v1")])
+                results = {}
+                query_thread = threading.Thread(
+                    target=lambda: results.update(old=manager.similarity_search("q", k=1))
+                )
+                query_thread.start()
+                assert entered.wait(timeout=5)
+                
+                manager.create_from_documents([Document(page_content="v2")])
+                
+                # New queries see the new index immediately; the old one is still draining
+                assert manager.vector_store is new_store
+                assert manager.similarity_search("q", k=1)[0].page_content == "new"
+                assert manager.retiring_count == 1
+                
+                proceed.set()
+                query_thread.join(timeout=5)
+                assert results["old"][0].page_content == "old"
+                
+                deadline = time.time() + 5
+                while manager.retiring_count and time.time() < deadline:
+                    time.sleep(0.01)
+                assert manager.retiring_count == 0
+    
+    def test_load_async_swaps_in_background(self, tmp_path):
+        """Test that load_async does not block and resolves to the new version"""
+        with patch('src.vector_store.OpenAIEmbeddings'):
+            with patch('src.vector_store.FAISS') as mock_faiss:
+                loading = threading.Event()
+                loaded_store = make_mock_store()
+                
+                def slow_load(*args, **kwargs):
+                    loading.wait(timeout=5)
+                    return loaded_store
+                
+                current_store = make_mock_store()
+                mock_faiss.from_documents.return_value = current_store
+                mock_faiss.load_local.side_effect = slow_load
+                
+                manager = VectorStoreManager(api_key="test-api-key")
+                manager.create_from_documents([Document(page_content="v1")])
+                
+                future = manager.load_async(str(tmp_path))
+                assert manager.vector_store is current_store
+                assert not future.done()
+                
+                loading.set()
+                assert future.result(timeout=5) == 2
+                assert manager.vector_store is loaded_store
+    
+    def test_load_async_with_nonexistent_path_raises_error(self):
+        """Test that load_async validates the path eagerly"""
+        with patch('src.vector_store.OpenAIEmbeddings'):
+            manager = VectorStoreManager(api_key="test-api-key")
+            
+            with pytest.raises(FileNotFoundError, match="Vector store path not found"):
+                manager.load_async("/nonexistent/path")
+
 class TestVectorStoreManagerAsRetriever:
     """Tests for as_retriever method"""
     
@@ -327,7 +750,7 @@ class TestVectorStoreManagerAsRetriever:
         """Test that k <= 0 raises ValueError"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_faiss.from_documents.return_value = Mock()
+                mock_faiss.from_documents.return_value = make_mock_store()
                 
                 manager = VectorStoreManager(api_key="test-api-key")
                 manager.create_from_documents([Document(page_content="Test")])
@@ -339,39 +762,47 @@ class TestVectorStoreManagerAsRetriever:
         """Test successful retriever creation"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_vector_store = Mock()
-                mock_retriever = Mock()
-                mock_vector_store.as_retriever.return_value = mock_retriever
-                mock_faiss.from_documents.return_value = mock_vector_store
+                mock_faiss.from_documents.return_value = make_mock_store()
                 
                 manager = VectorStoreManager(api_key="test-api-key")
                 manager.create_from_documents([Document(page_content="Test")])
                 
                 retriever = manager.as_retriever(k=5)
                 
-                assert retriever == mock_retriever
-                mock_vector_store.as_retriever.assert_called_once_with(
-                    search_type="similarity",
-                    search_kwargs={"k": 5}
-                )
+                assert isinstance(retriever, ManagedRetriever)
+                assert retriever.manager is manager
+                assert retriever.k == 5
     
     def test_as_retriever_default_k(self):
         """Test that default k is 4"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_vector_store = Mock()
-                mock_vector_store.as_retriever.return_value = Mock()
-                mock_faiss.from_documents.return_value = mock_vector_store
+                mock_faiss.from_documents.return_value = make_mock_store()
                 
                 manager = VectorStoreManager(api_key="test-api-key")
                 manager.create_from_documents([Document(page_content="Test")])
                 
-                manager.as_retriever()
-                
-                mock_vector_store.as_retriever.assert_called_once_with(
-                    search_type="similarity",
-                    search_kwargs={"k": 4}
-                )
+                assert manager.as_retriever().k == 4
+    
+    def test_as_retriever_follows_index_swap(self):
+        """Test that a retriever created before a swap searches the new index"""
+        with patch('src.vector_store.OpenAIEmbeddings') as mock_embeddings_cls:
+            mock_embeddings_cls.return_value = DeterministicEmbeddings(dimension=16)
+            
+            manager = VectorStoreManager(api_key="test-api-key")
+            manager.create_from_documents([Document(page_content="old")])
+            retriever = manager.as_retriever(k=1)
+            old_store = manager.vector_store
+            
+            manager.create_from_documents([Document(page_content="new")])
+            
+            assert retriever.invoke("query")[0].page_content == "new"
+            # 旧索引没有被 Retriever 持有，在途查询结束后被释放
+            deadline = time.time() + 2
+            while manager.retiring_count and time.time() < deadline:
+                time.sleep(0.01)
+            assert manager.retiring_count == 0
+            assert old_store is not manager.vector_store
 
 
 class TestVectorStoreManagerGetDocumentCount:
@@ -389,7 +820,7 @@ class TestVectorStoreManagerGetDocumentCount:
         """Test successful document count retrieval"""
         with patch('src.vector_store.OpenAIEmbeddings'):
             with patch('src.vector_store.FAISS') as mock_faiss:
-                mock_vector_store = Mock()
+                mock_vector_store = make_mock_store()
                 mock_index = Mock()
                 mock_index.ntotal = 10
                 mock_vector_store.index = mock_index
@@ -0,0 +1,241 @@
+import argparse
+import asyncio
+import json
+import time
+
+from pathlib import Path
+
+from client_factory import CHAT_TIMEOUT, aclose_clients, get_async_client
+from resilient_embedding import CircuitBreaker, acall_with_retry
+
+# 离线批量推理：从 JSONL 读取提示词，限并发、限速地调用模型，结果逐行追加写入 JSONL。
+# 输入每行：{"id": "1", "prompt": "..."}，可选 "system"，或直接给出 "messages" 列表
+# 输出每行：{"id", "output", "usage", "latency_ms"}，失败时为 {"id", "error"}；
+# 输入中无法解码、无法解析或缺少 prompt/messages 的行记为 {"id", "line", "error"}，不中断整批
+# 重新运行时跳过输出文件中已成功的 id，失败的会重试
+
+
+# 令牌桶限速：每分钟最多 rate_per_minute 次请求，允许 burst 个请求的突发
+class RateLimiter:
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class BatchStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.skipped = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_ms = 0.0
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start
+        done = self.succeeded + self.failed
+        total_tokens = self.prompt_tokens + self.completion_tokens
+        return {
+            "done": done,
+            "skipped": self.skipped,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "error_rate": self.failed / done if done else 0.0,
+            "requests_per_s": done / elapsed if elapsed else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tokens_per_s": total_tokens / elapsed if elapsed else 0.0,
+            "avg_latency_ms": self.latency_ms / self.succeeded if self.succeeded else 0.0,
+            "elapsed_s": elapsed,
+        }
+
+    def print_progress(self):
+        r = self.report()
+        print(f"完成 {r['done']}（成功 {r['succeeded']}，失败 {r['failed']}，错误率 {r['error_rate']:.1%}），"
+              f"{r['requests_per_s']:.1f} 请求/s，{r['tokens_per_s']:.0f} tokens/s，"
+              f"平均延迟 {r['avg_latency_ms']:.0f} ms，tokens {r['prompt_tokens']}+{r['completion_tokens']}")
+
+
+def completed_ids(output_path):
+    # 输出文件中已经成功的 id；最后一行可能因中断只写了一半（甚至截断在多字节字符中间），
+    # 按字节读取，忽略无法解码或解析的行
+    done = set()
+    path = Path(output_path)
+    if not path.exists():
+        return done
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line.decode("utf-8"))
+            except ValueError:
+                continue
+            if isinstance(record, dict) and "id" in record and "error" not in record:
+                done.add(str(record["id"]))
+    return done
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, 2)
+        return f.read(1) == b"\n"
+
+
+def parse_record(line):
+    # 解析一行输入；UnicodeDecodeError 和 JSONDecodeError 都是 ValueError
+    record = json.loads(line.decode("utf-8"))
+    if not isinstance(record, dict):
+        raise ValueError(f"expected a JSON object, got {type(record).__name__}")
+    if not isinstance(record.get("messages"), list) and not isinstance(record.get("prompt"), str):
+        raise ValueError('record needs a "prompt" string or a "messages" list')
+    return record
+
+
+def to_messages(record):
+    if "messages" in record:
+        return record["messages"]
+    messages = []
+    if record.get("system"):
+        messages.append({"role": "system", "content": record["system"]})
+    messages.append({"role": "user", "content": record["prompt"]})
+    return messages
+
+
+async def run_batch(input_path, output_path, model="qwen-plus", concurrency=16, requests_per_minute=600,
+                    max_retries=3, progress_interval=10.0, client=None, **request_options):
+    client = client or get_async_client()
+    limiter = RateLimiter(requests_per_minute, burst=concurrency)
+    breaker = CircuitBreaker(failure_threshold=max(concurrency, 5), reset_timeout=30)
+    stats = BatchStats()
+    done = completed_ids(output_path)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    out = open(output_path, "a", encoding="utf-8")
+    if out.tell() and not _ends_with_newline(output_path):
+        # 上次中断留下的半行单独成行，避免和本次第一条结果粘在一起
+        out.write("\n")
+
+    def write(record):
+        # 单线程事件循环里逐行写入并 flush，中断后最多丢失正在进行中的请求
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+
+    async def produce():
+        # 边读边投递，不把整个输入文件读进内存；按字节读取、逐行解码，一行编码错误不影响其他行
+        with open(input_path, "rb") as f:
+            for n, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = parse_record(line)
+                except ValueError as e:
+                    # 坏行和请求失败一样逐条记录，不让一行输入中断整批
+                    stats.failed += 1
+                    write({"id": str(n), "line": n, "error": f"{type(e).__name__}: {e}"})
+                    continue
+                record.setdefault("id", str(n))
+                if str(record["id"]) in done:
+                    stats.skipped += 1
+                    continue
+                await queue.put(record)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work():
+        while True:
+            record = await queue.get()
+            if record is None:
+                return
+            await limiter.acquire()
+            start = time.perf_counter()
+            try:
+                completion = await acall_with_retry(
+                    lambda: client.chat.completions.create(
+                        model=model,
+                        messages=to_messages(record),
+                        timeout=CHAT_TIMEOUT,
+                        **request_options
+                    ),
+                    breaker,
+                    max_retries=max_retries
+                )
+            except Exception as e:
+                stats.failed += 1
+                write({"id": record["id"], "error": f"{type(e).__name__}: {e}"})
+                continue
+            latency_ms = (time.perf_counter() - start) * 1000
+            usage = completion.usage
+            stats.succeeded += 1
+            stats.latency_ms += latency_ms
+            if usage is not None:
+                stats.prompt_tokens += usage.prompt_tokens
+                stats.completion_tokens += usage.completion_tokens
+            write({
+                "id": record["id"],
+                "output": completion.choices[0].message.content,
+                "usage": usage.model_dump() if usage is not None else None,
+                "latency_ms": round(latency_ms, 1),
+            })
+
+    async def report():
+        while True:
+            await asyncio.sleep(progress_interval)
+            stats.print_progress()
+
+    reporter = asyncio.create_task(report())
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    finally:
+        reporter.cancel()
+        out.close()
+
+    if stats.skipped:
+        print(f"跳过已完成的 {stats.skipped} 条")
+    stats.print_progress()
+    return stats.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSONL 批量推理")
+    parser.add_argument("input", help="输入 JSONL，每行包含 id 和 prompt（或 messages）")
+    parser.add_argument("output", help="输出 JSONL，追加写入，重新运行时跳过已成功的 id")
+    parser.add_argument("--model", default="qwen-plus")
+    parser.add_argument("--concurrency", type=int, default=16, help="同时在途的请求数")
+    parser.add_argument("--rpm", type=float, default=600, help="每分钟最多发出的请求数")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--temperature", type=float, default=None)
+    args = parser.parse_args()
+
+    options = {} if args.temperature is None else {"temperature": args.temperature}
+
+    async def main():
+        try:
+            return await run_batch(
+                args.input, args.output,
+                model=args.model,
+                concurrency=args.concurrency,
+                requests_per_minute=args.rpm,
+                max_retries=args.max_retries,
+                **options
+            )
+        finally:
+            # 共享的异步客户端要在创建连接的同一个事件循环里关闭
+            await aclose_clients()
+
+    summary = asyncio.run(main())
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
@@ -0,0 +1,205 @@
+import asyncio
+import atexit
+import importlib.util
+import os
+import threading
+import time
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+
+# 百炼 OpenAI 兼容接口。common_demo 下所有脚本都通过这里获取客户端，
+# 同一进程内共享一个连接池，避免每个调用方各自建连、重复 TLS 握手
+DEFAULT_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+
+# 连接池大小和超时，可以用环境变量覆盖
+POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+# 默认读超时按对话请求设置；embedding 这类小请求在调用处传更短的 timeout
+READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "120"))
+
+# 各类调用建议的超时（秒），调用方通过 create(..., timeout=...) 按次传入
+EMBEDDING_TIMEOUT = 15
+CHAT_TIMEOUT = 120
+
+# 安装了 h2 才能启用 HTTP/2，服务端不支持时 ALPN 协商会自动退回 HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+# 连接复用统计：通过 httpcore 的 trace 扩展记录每个请求是否新建了 TCP 连接、是否做了 TLS 握手
+class ConnectionStats:
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.connect_seconds = 0.0
+        self.http_versions = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def on_request(self, request):
+        with self._lock:
+            self.requests += 1
+
+    def trace(self, event, info):
+        if event in ("connection.connect_tcp.started", "connection.start_tls.started"):
+            self._local.started = time.perf_counter()
+        elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            elapsed = time.perf_counter() - getattr(self._local, "started", time.perf_counter())
+            with self._lock:
+                self.connect_seconds += elapsed
+                if event == "connection.connect_tcp.complete":
+                    self.connections += 1
+                else:
+                    self.tls_handshakes += 1
+
+    async def atrace(self, event, info):
+        # 异步客户端要求 trace 回调是协程；各请求在同一线程中交错执行，
+        # 这里只计数，不统计建连耗时
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections += 1
+        elif event == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+
+    def on_response(self, response):
+        with self._lock:
+            version = response.http_version
+            self.http_versions[version] = self.http_versions.get(version, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            reused = max(self.requests - self.connections, 0)
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+                "connect_seconds": self.connect_seconds,
+                "http_versions": dict(self.http_versions),
+            }
+
+
+connection_stats = ConnectionStats()
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+
+
+def _limits(pool_size):
+    return httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout():
+    return httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def create_client(api_key=None, base_url=None, pool_size=POOL_SIZE, http2=None):
+    # 新建一个独立的同步客户端；一般应使用共享的 get_client()
+    def on_request(request):
+        connection_stats.on_request(request)
+        request.extensions["trace"] = connection_stats.trace
+
+    http_client = httpx.Client(
+        limits=_limits(pool_size),
+        timeout=_timeout(),
+        http2=HTTP2_AVAILABLE if http2 is None else http2,
+        event_hooks={"request": [on_request], "response": [connection_stats.on_response]},
+    )
+    return OpenAI(
+        # 若没有配置环境变量，请用百炼API Key将下行替换为：api_key="sk-xxx",
+        api_key=api_key or os.getenv("DASHSCOPE_API_KEY"),
+        base_url=base_url or os.getenv("DASHSCOPE_BASE_URL", DEFAULT_BASE_URL),
+        http_client=http_client,
+    )
+
+
+def create_async_client(api_key=None, base_url=None, pool_size=POOL_SIZE, http2=None):
+    # 新建一个独立的异步客户端；一般应使用共享的 get_async_client()
+    async def on_request(request):
+        connection_stats.on_request(request)
+        request.extensions["trace"] = connection_stats.atrace
+
+    async def on_response(response):
+        connection_stats.on_response(response)
+
+    http_client = httpx.AsyncClient(
+        limits=_limits(pool_size),
+        timeout=_timeout(),
+        http2=HTTP2_AVAILABLE if http2 is None else http2,
+        event_hooks={"request": [on_request], "response": [on_response]},
+    )
+    return AsyncOpenAI(
+        api_key=api_key or os.getenv("DASHSCOPE_API_KEY"),
+        base_url=base_url or os.getenv("DASHSCOPE_BASE_URL", DEFAULT_BASE_URL),
+        http_client=http_client,
+    )
+
+
+def get_client():
+    # 进程内共享的同步客户端，第一次调用时创建
+    global _client
+    with _lock:
+        if _client is None:
+            _client = create_client()
+        return _client
+
+
+def get_async_client():
+    # 进程内共享的异步客户端。httpx.AsyncClient 的连接绑定在创建它的事件循环上，
+    # 同一进程只应在一个事件循环里使用它
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            _async_client = create_async_client()
+        return _async_client
+
+
+async def aclose_clients():
+    # 在使用过异步客户端的事件循环里关闭它：连接绑定在这个循环上，循环结束后就无法正常关闭了
+    global _async_client
+    with _lock:
+        async_client, _async_client = _async_client, None
+    if async_client is not None:
+        await async_client.close()
+
+
+def close_clients():
+    # 关闭共享的同步和异步客户端（进程退出时自动调用）
+    global _client, _async_client
+    with _lock:
+        client, _client = _client, None
+        async_client, _async_client = _async_client, None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            loop.create_task(async_client.close())
+            return
+        try:
+            asyncio.run(async_client.close())
+        except RuntimeError:
+            # 连接所在的事件循环已经结束，只能由进程退出时回收；异步调用方应在循环内 await aclose_clients()
+            pass
+
+
+def print_connection_stats():
+    stats = connection_stats.stats()
+    print(f"HTTP 连接: {stats['requests']} 次请求, 新建 {stats['connections']} 个连接, "
+          f"TLS 握手 {stats['tls_handshakes']} 次, 复用率 {stats['reuse_rate']:.1%}, "
+          f"建连耗时 {stats['connect_seconds']:.2f}s, 协议 {stats['http_versions']}")
+
+
+atexit.register(close_clients)
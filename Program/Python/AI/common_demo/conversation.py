@@ -0,0 +1,121 @@
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from prompt_builder import count_tokens
+
+SUMMARY_PROMPT = (
+    "你负责压缩对话历史。请用简洁的中文总结下面的对话，保留用户已经提供的关键信息"
+    "（偏好、参数、约束）和助手已经给出的结论，不要添加对话中没有的内容。"
+)
+
+# 每条消息在角色、分隔符上的额外开销（估计值）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def message_tokens(messages):
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+# 多轮对话管理：system prompt 固定在最前面，之后是较早对话的摘要和最近若干轮原文。
+# 历史超过 token 预算的 summarize_ratio 时，在后台把较早的轮次连同旧摘要压缩成新摘要，
+# 前台对话不等待；摘要回来之前如果已经超出预算，本轮请求里先不带最早的消息，保证每轮提示词大小有上限。
+# 历史本身只由摘要缩短，请求里暂时省略的消息之后仍会被摘要覆盖
+class ConversationManager:
+    def __init__(self, client, system_prompt, model="qwen-plus", token_budget=2000,
+                 summarize_ratio=0.75, keep_recent=4, summary_model=None):
+        self.client = client
+        self.system_prompt = system_prompt
+        self.model = model
+        self.summary_model = summary_model or model
+        self.token_budget = token_budget
+        self.summarize_ratio = summarize_ratio
+        # 摘要时保留的最近消息条数（原文）
+        self.keep_recent = keep_recent
+        self.summary = ""
+        self.turn_tokens = []  # 每轮发送的提示词 token 数
+        self.dropped = 0  # 最近一次请求中因超出预算而省略的消息数（摘要尚未覆盖它们）
+        self._turns = []  # (序号, 消息)
+        self._seq = 0
+        self._pending = None  # 进行中的摘要任务
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarizer")
+
+    def add_message(self, role, content):
+        with self._lock:
+            self._seq += 1
+            self._turns.append((self._seq, {"role": role, "content": content}))
+        self._maybe_summarize()
+
+    def build_messages(self):
+        with self._lock:
+            head = [{"role": "system", "content": self.system_prompt}]
+            if self.summary:
+                head.append({"role": "system", "content": f"之前对话的摘要：{self.summary}"})
+            history = [m for _, m in self._turns]
+        # 超出预算时只在本次请求里从最早的消息开始省略，至少保留最后一条（当前问题）；
+        # 不修改 self._turns，哪些消息离开历史由摘要决定
+        start = 0
+        budget = self.token_budget - message_tokens(head)
+        used = message_tokens(history)
+        while len(history) - start > 1 and used > budget:
+            used -= message_tokens(history[start:start + 1])
+            start += 1
+        self.dropped = start
+        messages = head + history[start:]
+        self.turn_tokens.append(message_tokens(messages))
+        return messages
+
+    def chat(self, user_input):
+        # 发送一轮对话并记录回复
+        self.add_message("user", user_input)
+        completion = self.client.chat.completions.create(model=self.model, messages=self.build_messages())
+        answer = completion.choices[0].message.content
+        self.add_message("assistant", answer)
+        return answer
+
+    def _maybe_summarize(self):
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                return
+            history = [m for _, m in self._turns]
+            used = message_tokens(history) + count_tokens(self.summary)
+            if used < self.token_budget * self.summarize_ratio or len(self._turns) <= self.keep_recent:
+                return
+            old = self._turns[:len(self._turns) - self.keep_recent]
+            covered = old[-1][0]
+            self._pending = self._executor.submit(self._summarize, self.summary, [m for _, m in old])
+            self._pending.add_done_callback(lambda future: self._apply_summary(future, covered))
+
+    def _summarize(self, summary, messages):
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        if summary:
+            transcript = f"已有摘要：{summary}\n\n新增对话：\n{transcript}"
+        completion = self.client.chat.completions.create(
+            model=self.summary_model,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": transcript},
+            ]
+        )
+        return completion.choices[0].message.content
+
+    def _apply_summary(self, future, covered):
+        try:
+            summary = future.result()
+        except Exception as e:
+            # 摘要失败不影响对话，下次超过阈值时再试
+            print(f"对话摘要失败: {e}")
+            return
+        with self._lock:
+            self.summary = summary
+            self._turns = [(seq, m) for seq, m in self._turns if seq > covered]
+
+    def wait(self):
+        # 等待进行中的摘要完成
+        pending = self._pending
+        if pending is not None:
+            pending.exception()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
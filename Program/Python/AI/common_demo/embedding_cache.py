@@ -0,0 +1,165 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+from typing import List
+import numpy as np
+
+
+# 本地 embedding 缓存：以 (模型, 维度, 文本哈希) 为键把向量存进 SQLite，
+# 按最近使用时间做 LRU 淘汰。重复的文档和查询不再请求 embedding 接口。
+# 数据库在第一次读写时才打开，创建缓存对象（例如模块导入时）不会在当前目录生成文件；
+# path 为 None 时使用环境变量 EMBEDDING_CACHE_PATH，默认 embedding_cache.db
+class EmbeddingCache:
+    def __init__(self, path: str = None, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        # 条目数在打开时统计一次，之后随写入和淘汰增减，写入时不再 COUNT(*) 全表
+        self._count = 0
+
+    def _connection(self):
+        # 调用方需持有 self._lock
+        if self._conn is None:
+            path = self.path or os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+            self._conn.commit()
+            self.path = path
+            self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, dimensions, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model}:{dimensions}:{digest}"
+
+    def _select(self, conn, columns: str, keys: List[str]) -> list:
+        # SQLite 单条语句的参数个数有上限，分段查询
+        rows = []
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows += conn.execute(
+                f"SELECT {columns} FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+        return rows
+
+    def get_many(self, keys: List[str]) -> dict:
+        # 返回命中的 {key: 向量}，并刷新它们的最近使用时间
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for key, blob in self._select(conn, "key, vector", keys):
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                conn.commit()
+        return found
+
+    def put_many(self, items: dict) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            # 只查本批的键，已存在的键是覆盖写入，不增加条目数
+            existing = len(self._select(conn, "key", list(items)))
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items.items()]
+            )
+            self._count += len(items) - existing
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        if self._count > self.max_entries:
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (self._count - self.max_entries,)
+            )
+            self._count = self.max_entries
+
+    def record(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def __len__(self):
+        with self._lock:
+            self._connection()
+            return self._count
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 包装任意 embedding 函数：先查缓存，只把未命中的文本（去重后）交给原函数批量请求。
+# 原函数提供异步的 acall 时，acall 走同样的查缓存 / 回填逻辑
+class CachedEmbeddingFunction:
+    def __init__(self, embedding_function, cache: EmbeddingCache):
+        self.embedding_function = embedding_function
+        self.cache = cache
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._lookup(input)
+        if missing:
+            self._fill(vectors, missing, self.embedding_function(list(missing.values())))
+        return [vectors[key] for key in keys]
+
+    async def acall(self, input: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._lookup(input)
+        if missing:
+            self._fill(vectors, missing, await self.embedding_function.acall(list(missing.values())))
+        return [vectors[key] for key in keys]
+
+    def _lookup(self, input):
+        # 返回 (每条输入的键, 命中的 {键: 向量}, 未命中的 {键: 文本})
+        if isinstance(input, str):
+            input = [input]
+        model = getattr(self.embedding_function, "model", "")
+        dimensions = getattr(self.embedding_function, "dimensions", None)
+        keys = [self.cache.make_key(model, dimensions, text) for text in input]
+        vectors = self.cache.get_many(list(dict.fromkeys(keys)))
+
+        missing = {}
+        for key, text in zip(keys, input):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        hits = sum(1 for key in keys if key in vectors)
+        self.cache.record(hits, len(keys) - hits)
+        return keys, vectors, missing
+
+    def _fill(self, vectors, missing, embeddings):
+        fresh = dict(zip(missing, embeddings))
+        self.cache.put_many(fresh)
+        vectors.update(fresh)
@@ -1,10 +1,17 @@
+import asyncio
 import os
 import random
-import json
 import sys
 
 from datetime import datetime
-from openai import OpenAI
+from client_factory import CHAT_TIMEOUT, get_async_client, get_client
+from conversation import ConversationManager
+from stream_accumulator import AsyncStreamReader, SSEParser, StreamAccumulator
+from tool_engine import ToolEngine, ToolRegistry, chat_with_tools
+from vision_input import ImageEncoder
+
+# 图片按内容哈希缓存缩放后的 data URI，多轮对话重复发送同一张图时不再重新下载和编码
+image_encoder = ImageEncoder()
 
 
 def simple_chat_test(client):
@@ -32,30 +39,25 @@ def simple_chat_test(client):
         return 1
 
 def conversation_chat_test(client):
-    def get_response(messages):
-        # 模型列表：https://help.aliyun.com/zh/model-studio/getting-started/models
-        completion = client.chat.completions.create(model="qwen-plus", messages=messages)
-        return completion
-
-    # 初始化一个 messages 数组
-    messages = [
-        {
-            "role": "system",
-            "content": """你是一名百炼手机商店的店员，你负责给用户推荐手机。手机有两个参数：屏幕尺寸（包括6.1英寸、6.5英寸、6.7英寸）、分辨率（包括2K、4K）。
+    # 对话管理器固定 system prompt，较早的轮次在后台压缩成摘要，每轮发送的提示词不超过 token_budget
+    conversation = ConversationManager(
+        client,
+        system_prompt="""你是一名百炼手机商店的店员，你负责给用户推荐手机。手机有两个参数：屏幕尺寸（包括6.1英寸、6.5英寸、6.7英寸）、分辨率（包括2K、4K）。
             你一次只能向用户提问一个参数。如果用户提供的信息不全，你需要反问他，让他提供没有提供的参数。如果参数收集完成，你要说：我已了解您的购买意向，然后说出收集的参数详情，并告知客户请稍等。""",
-        }
-    ]
+        model="qwen-plus",  # 模型列表：https://help.aliyun.com/zh/model-studio/getting-started/models
+        token_budget=1500
+    )
     assistant_output = "欢迎光临百炼手机商店，您需要购买什么尺寸的手机呢？"
     print(f"模型输出：{assistant_output}\n")
-    while "我已了解您的购买意向" not in assistant_output:
-        user_input = input("请输入：")
-        # 将用户问题信息添加到messages列表中
-        messages.append({"role": "user", "content": user_input})
-        assistant_output = get_response(messages).choices[0].message.content
-        # 将大模型的回复信息添加到messages列表中
-        messages.append({"role": "assistant", "content": assistant_output})
-        print(f"模型输出：{assistant_output}")
-        print("\n")
+    try:
+        while "我已了解您的购买意向" not in assistant_output:
+            user_input = input("请输入：")
+            assistant_output = conversation.chat(user_input)
+            print(f"模型输出：{assistant_output}")
+            print(f"（本轮提示词约 {conversation.turn_tokens[-1]} tokens）")
+            print("\n")
+    finally:
+        conversation.close()
 
 '''
 某次返回 通，对应 UTF：E9 80 9A
@@ -85,66 +87,72 @@ def flowoutput_chat_test(client):
         {"role": "system", "content": "You are a helpful assistant."},
         {"role": "user", "content": "你是谁？"}
     ],
-    stream=True
+    stream=True,
+    # 最后一个chunk的choices字段为空列表，携带 Token 使用量
+    stream_options={"include_usage": True}
     )
 
-    full_content = ""
+    # 增量片段由累加器收集，最后只拼接一次
+    accumulator = StreamAccumulator()
     print("流式输出内容为：")
-    for chunk in completion:
-        # 如果stream_options.include_usage为True，则最后一个chunk的choices字段为空列表，需要跳过（可以通过chunk.usage获取 Token 使用量）
-        if chunk.choices:
-            full_content += chunk.choices[0].delta.content
-            print(chunk.choices[0].delta.content)
-    print(f"完整内容为：{full_content}")
+    for kind, text in accumulator.iter(completion):
+        print(text)
+    print(f"完整内容为：{accumulator.answer}")
+    print(f"Token 使用量：{accumulator.usage}")
 
-def function_call_test(client):
-    # 定义工具列表，模型在选择使用哪个工具时会参考工具的name和description
-    tools = [
-        # 工具1 获取当前时刻的时间
-        {
-            "type": "function",
-            "function": {
-                "name": "get_current_time",
-                "description": "当你想知道现在的时间时非常有用。",
-                # 因为获取当前时间无需输入参数，因此parameters为空字典
-                "parameters": {}
-            }
-        },  
-        # 工具2 获取指定城市的天气
-        {
-            "type": "function",
-            "function": {
-                "name": "get_current_weather",
-                "description": "当你想查询指定城市的天气时非常有用。",
-                "parameters": {  
-                    "type": "object",
-                    "properties": {
-                        # 查询天气时需要提供位置，因此参数设置为location
-                        "location": {
-                            "type": "string",
-                            "description": "城市或县区，比如北京市、杭州市、余杭区等。"
-                        }
-                    }
-                },
-                "required": [
-                    "location"
-                ]
-            }
-        }
-    ]
+async def async_flowoutput_chat_test(client):
+    # 异步版本：读取任务和打印之间有有界队列，打印跟不上时读取会暂停
+    completion = await client.chat.completions.create(
+        model="qwen-plus",
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": "你是谁？"}
+        ],
+        stream=True,
+        stream_options={"include_usage": True}
+    )
 
-    # 模拟天气查询工具。返回结果示例：“北京今天是雨天。”
-    def get_current_weather(arguments):
-        # 定义备选的天气条件列表
-        weather_conditions = ["晴天", "多云", "雨天"]
-        # 随机选择一个天气条件
-        random_weather = random.choice(weather_conditions)
-        # 从 JSON 中提取位置信息
-        location = arguments["location"]
-        # 返回格式化的天气信息
-        return f"{location}今天是{random_weather}。"
+    # async with 保证提前退出（break、异常、取消）时读取任务被取消、连接被关闭
+    async with AsyncStreamReader(completion, maxsize=32) as reader:
+        print("流式输出内容为：")
+        async for kind, text in reader:
+            print(text, end='', flush=True)
+    print(f"\n完整内容为：{reader.accumulator.answer}")
+    print(f"Token 使用量：{reader.accumulator.usage}")
 
-    # 查询当前时间的工具。返回结果示例：“当前时间：2024-04-15 17:15:18。“
+def raw_flowoutput_chat_test(client):
+    # 不经过 SDK 的流式解析，直接读取 SSE 字节流：SSEParser 负责拼接被拆开的行和 UTF-8 字符。
+    # with_streaming_response 返回原始响应，请求仍走共享客户端的连接池、鉴权和重试
+    parser = SSEParser()
+    accumulator = StreamAccumulator()
+    with client.chat.completions.with_streaming_response.create(
+        model="qwen-plus",
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": "你是谁？"}
+        ],
+        stream=True,
+        stream_options={"include_usage": True},
+        timeout=CHAT_TIMEOUT
+    ) as response:
+        print("流式输出内容为：")
+        for data in response.iter_bytes():
+            for event in parser.feed(data):
+                item = accumulator.feed(event)
+                if item is not None:
+                    print(item[1], end='', flush=True)
+            if parser.done:
+                break
+    print(f"\n完整内容为：{accumulator.answer}")
+    print(f"Token 使用量：{accumulator.usage}")
+
+def function_call_test(client):
+    # 工具注册表，模型在选择使用哪个工具时会参考工具的name和description
+    registry = ToolRegistry()
+
+    # 工具1 获取当前时刻的时间。返回结果示例：“当前时间：2024-04-15 17:15:18。“
+    # 因为获取当前时间无需输入参数，因此parameters为空字典
+    @registry.register(description="当你想知道现在的时间时非常有用。", parameters={}, timeout=2)
     def get_current_time():
         # 获取当前日期和时间
         current_datetime = datetime.now()
@@ -153,60 +161,48 @@ def function_call_test(client):
         # 返回格式化后的当前时间
         return f"当前时间：{formatted_time}。"
 
-    # 封装模型响应函数
-    def get_response(messages):
-        completion = client.chat.completions.create(
-            model="qwen-plus",  # 模型列表：https://help.aliyun.com/zh/model-studio/getting-started/models
-            messages=messages,
-            tools=tools
-            )
-        return completion
-
-    def call_with_messages():
-        print('\n')
-        messages = [
-                {
-                    "content": input('请输入：'),  # 提问示例："现在几点了？" "一个小时后几点" "北京天气如何？"
-                    "role": "user"
+    # 工具2 模拟天气查询工具。返回结果示例：“北京今天是雨天。”
+    @registry.register(
+        description="当你想查询指定城市的天气时非常有用。",
+        parameters={
+            "type": "object",
+            "properties": {
+                # 查询天气时需要提供位置，因此参数设置为location
+                "location": {
+                    "type": "string",
+                    "description": "城市或县区，比如北京市、杭州市、余杭区等。"
                 }
-        ]
-        print("-"*60)
-        # 模型的第一轮调用
-        i = 1
-        first_response = get_response(messages)
-        assistant_output = first_response.choices[0].message
-        print(f"\n第{i}轮大模型输出信息：{first_response}\n")
-        if  assistant_output.content is None:
-            assistant_output.content = ""
-        messages.append(assistant_output)
-        # 如果不需要调用工具，则直接返回最终答案
-        if assistant_output.tool_calls == None:  # 如果模型判断无需调用工具，则将assistant的回复直接打印出来，无需进行模型的第二轮调用
-            print(f"无需调用工具，我可以直接回复：{assistant_output.content}")
-            return
-        # 如果需要调用工具，则进行模型的多轮调用，直到模型判断无需调用工具
-        while assistant_output.tool_calls != None:
-            # 如果判断需要调用查询天气工具，则运行查询天气工具
-            tool_info = {"content": "","role": "tool", "tool_call_id": assistant_output.tool_calls[0].id}
-            if assistant_output.tool_calls[0].function.name == "get_current_weather":
-                # 提取位置参数信息
-                argumens = json.loads(assistant_output.tool_calls[0].function.arguments)
-                tool_info["content"] = get_current_weather(argumens)
-            # 如果判断需要调用查询时间工具，则运行查询时间工具
-            elif assistant_output.tool_calls[0].function.name == 'get_current_time':
-                tool_info["content"] = get_current_time()
-            tool_output = tool_info["content"]
-            print(f"工具输出信息：{tool_output}\n")
-            print("-"*60)
-            messages.append(tool_info)
-            assistant_output = get_response(messages).choices[0].message
-            if assistant_output.content is None:
-                assistant_output.content = ""
-            messages.append(assistant_output)
-            i += 1
-            print(f"第{i}轮大模型输出信息：{assistant_output}\n")
-        print(f"最终答案：{assistant_output.content}")
+            },
+            "required": [
+                "location"
+            ]
+        },
+        timeout=5
+    )
+    def get_current_weather(location):
+        # 定义备选的天气条件列表
+        weather_conditions = ["晴天", "多云", "雨天"]
+        # 随机选择一个天气条件
+        random_weather = random.choice(weather_conditions)
+        # 返回格式化的天气信息
+        return f"{location}今天是{random_weather}。"
 
-    call_with_messages()
+    # 一条 assistant 消息里的多个工具调用并行执行，结果在同一轮一起返回给模型
+    engine = ToolEngine(registry)
+
+    print('\n')
+    messages = [
+            {
+                "content": input('请输入：'),  # 提问示例："现在几点了？" "一个小时后几点" "北京和杭州天气如何？"
+                "role": "user"
+            }
+    ]
+    print("-"*60)
+    try:
+        answer = chat_with_tools(client, messages, engine, model="qwen-plus")  # 模型列表：https://help.aliyun.com/zh/model-studio/getting-started/models
+        print(f"最终答案：{answer}")
+    finally:
+        engine.close()
 
 
 def multi_model_visual_understand_test(client):
@@ -227,9 +223,11 @@ def multi_model_visual_understand_test(client):
             ],
         }
     ]
+    request_messages, payload_stats = image_encoder.prepare_messages(messages)
+    image_encoder.print_stats(payload_stats)
     completion = client.chat.completions.create(
         model="qwen-vl-max-latest",
-        messages=messages,
+        messages=request_messages,
         )
     print(f"第一轮输出：{completion.choices[0].message.content}")
     assistant_message = completion.choices[0].message
@@ -243,72 +241,64 @@ def multi_model_visual_understand_test(client):
             }
             ]
         })
+    # 历史里保留原始图片地址：URL 原样发送，本地图片第二轮直接命中缓存
+    request_messages, payload_stats = image_encoder.prepare_messages(messages)
+    image_encoder.print_stats(payload_stats)
     completion = client.chat.completions.create(
         model="qwen-vl-max-latest",
-        messages=messages,
+        messages=request_messages,
         )
     print(f"第二轮输出：{completion.choices[0].message.content}")
 
 def multi_model_visual_think_test(client):    
-    reasoning_content = ""  # 定义完整思考过程
-    answer_content = ""     # 定义完整回复
-    is_answering = False   # 判断是否结束思考过程并开始回复
-
+    messages = [
+        {
+            "role": "system",
+            "content": [{"type": "text", "text": "You are a helpful assistant."}],
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": "https://img.alicdn.com/imgextra/i1/O1CN01gDEY8M1W114Hi3XcN_!!6000000002727-0-tps-1024-406.jpg"
+                    },
+                },
+                {"type": "text", "text": "这道题怎么解答？"},
+            ],
+        },
+    ]
+    request_messages, payload_stats = image_encoder.prepare_messages(messages)
+    image_encoder.print_stats(payload_stats)
     # 创建聊天完成请求
     completion = client.chat.completions.create(
         model="qvq-max",  # 此处以 qvq-max 为例，可按需更换模型名称
-        messages=[
-            {
-                "role": "system",
-                "content": [{"type": "text", "text": "You are a helpful assistant."}],
-            },
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": "https://img.alicdn.com/imgextra/i1/O1CN01gDEY8M1W114Hi3XcN_!!6000000002727-0-tps-1024-406.jpg"
-                        },
-                    },
-                    {"type": "text", "text": "这道题怎么解答？"},
-                ],
-            },
-        ],
+        messages=request_messages,
         stream=True,
-        # 解除以下注释会在最后一个chunk返回Token使用量
-        # stream_options={
-        #     "include_usage": True
-        # }
+        # 最后一个chunk返回Token使用量
+        stream_options={
+            "include_usage": True
+        }
     )
 
     print("\n" + "=" * 20 + "思考过程" + "=" * 20 + "\n")
 
-    for chunk in completion:
-        # 如果chunk.choices为空，则打印usage
-        if not chunk.choices:
-            print("\nUsage:")
-            print(chunk.usage)
-        else:
-            delta = chunk.choices[0].delta
-            # 打印思考过程
-            if hasattr(delta, 'reasoning_content') and delta.reasoning_content != None:
-                print(delta.reasoning_content, end='', flush=True)
-                reasoning_content += delta.reasoning_content
-            else:
-                # 开始回复
-                if delta.content != "" and is_answering is False:
-                    print("\n" + "=" * 20 + "完整回复" + "=" * 20 + "\n")
-                    is_answering = True
-                # 打印回复过程
-                print(delta.content, end='', flush=True)
-                answer_content += delta.content
+    # 累加器把思考过程（reasoning_content）和回复（content）分到两个通道
+    accumulator = StreamAccumulator()
+    is_answering = False   # 判断是否结束思考过程并开始回复
+    for kind, text in accumulator.iter(completion):
+        if kind == "answer" and is_answering is False:
+            print("\n" + "=" * 20 + "完整回复" + "=" * 20 + "\n")
+            is_answering = True
+        print(text, end='', flush=True)
 
+    print("\nUsage:")
+    print(accumulator.usage)
     # print("=" * 20 + "完整思考过程" + "=" * 20 + "\n")
-    # print(reasoning_content)
+    # print(accumulator.reasoning)
     # print("=" * 20 + "完整回复" + "=" * 20 + "\n")
-    # print(answer_content)
-    multi_model_visual_think_test(client)
+    # print(accumulator.answer)
 
 
 def embedding_test(client):    
@@ -322,15 +312,13 @@ def embedding_test(client):
     print(completion.model_dump_json())
 
 if __name__ == "__main__":    
-    client = OpenAI(
-        # 若没有配置环境变量，请用百炼API Key将下行替换为：api_key="sk-xxx",
-        api_key=os.getenv("DASHSCOPE_API_KEY"),
-        #api_key='sk-12345678', # 如何获取API Key：https://help.aliyun.com/zh/model-studio/developer-reference/get-api-key
-        base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-    )
+    # 共享连接池的客户端（见 client_factory.py），API Key 从环境变量 DASHSCOPE_API_KEY 读取
+    client = get_client()
     #simple_chat_test(client)
     #conversation_chat_test(client)
     #flowoutput_chat_test(client)
+    #asyncio.run(async_flowoutput_chat_test(get_async_client()))
+    #raw_flowoutput_chat_test(client)
     #function_call_test(client)
     #multi_model_visual_understand_test(client)
     #multi_model_visual_think_test(client)
@@ -1,58 +1,140 @@
 import chromadb
 from openai import OpenAI
 
+import argparse
+import asyncio
+import hashlib
 import json
+import logging
 
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import List
-import numpy as np
 import os
+import time
 
- 
-client = OpenAI(
-    # 若没有配置环境变量，请用百炼API Key将下行替换为：api_key="sk-xxx",
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    #api_key='sk-12345678', # 如何获取API Key：https://help.aliyun.com/zh/model-studio/developer-reference/get-api-key
-    base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
+from client_factory import (
+    CHAT_TIMEOUT, EMBEDDING_TIMEOUT, aclose_clients, get_async_client, get_client, print_connection_stats
+)
+from embedding_cache import CachedEmbeddingFunction, EmbeddingCache
+from prompt_builder import PromptBuilder
+from stream_accumulator import StreamAccumulator
+from resilient_embedding import (
+    CircuitBreaker, DeadLetterQueue, EmbeddingError, ReembedWorker, acall_with_retry, call_with_retry
 )
+
+ 
+# 共享连接池的客户端（见 client_factory.py），API Key 从环境变量 DASHSCOPE_API_KEY 读取
+client = get_client()
+# 异步客户端，供并发处理多个查询的 rag_pipeline_async 使用
+async_client = get_async_client()
 model = "text-embedding-v3"
 dimensions = 1024
+# 百炼 text-embedding-v3 单次请求最多 10 条文本
+embedding_batch_size = 10
+# 同时在途的 embedding 请求数
+embedding_workers = 4
 
 class OpenAICompatibleEmbeddingFunction:
-    def __init__(self, client: OpenAI, model: str, dimensions: int):
+    def __init__(self, client: OpenAI, model: str, dimensions: int, batch_size: int = 10, max_workers: int = 4,
+                 breaker: CircuitBreaker = None, max_retries: int = 3, async_client=None):
         self.client = client
+        self.async_client = async_client
         self.model = model
         self.dimensions = dimensions
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+    
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        # 查询时传入的是单个字符串
+        if isinstance(input, str):
+            input = [input]
+        # 按服务商的单次请求上限切分，多个批次并发请求，结果按输入顺序拼回
+        batches = [input[i:i + self.batch_size] for i in range(0, len(input), self.batch_size)]
+        if len(batches) <= 1:
+            return self._embed_batch(input)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+            results = pool.map(self._embed_batch, batches)
+        return [embedding for batch in results for embedding in batch]
     
-    def __call__(self, input: List[str]) -> List[List[float]]:        
+    async def acall(self, input: List[str]) -> List[List[float]]:
+        # __call__ 的异步版本，使用异步客户端，多个批次并发请求，退避期间不阻塞事件循环
+        if isinstance(input, str):
+            input = [input]
+        batches = [input[i:i + self.batch_size] for i in range(0, len(input), self.batch_size)]
+        results = await asyncio.gather(*(self._aembed_batch(batch) for batch in batches))
+        return [embedding for batch in results for embedding in batch]
+
+    def _request(self, input: List[str]) -> dict:
+        return dict(
+            model=self.model,
+            input=input,
+            dimensions=self.dimensions,
+            encoding_format="float",
+            timeout=EMBEDDING_TIMEOUT
+        )
+
+    def _embed_batch(self, input: List[str]) -> List[List[float]]:
+        # 失败时重试，重试耗尽或熔断时抛出 EmbeddingError，绝不返回零向量：
+        # 零向量一旦写入向量库会污染之后的每一次检索
         try:
-            completion = self.client.embeddings.create(
-                model=self.model,
-                input=input,
-                dimensions=self.dimensions,
-                encoding_format="float"
+            completion = call_with_retry(
+                lambda: self.client.embeddings.create(**self._request(input)),
+                self.breaker,
+                max_retries=self.max_retries
             )
+        except EmbeddingError:
+            raise
+        except Exception as e:
+            raise EmbeddingError(f"获取嵌入向量失败: {e}", input) from e
+        return self._parse(completion)
 
-            data = json.loads(completion.model_dump_json())
-            
-            # 确定向量维度
-            if self.dimensions is None and len(data['data']) > 0:
-                self.dimensions = len(data['data'][0]['embedding'])
-            
-            # 提取所有嵌入向量
-            embeddings = [item['embedding'] for item in data['data']]
-            return embeddings
-            
+    async def _aembed_batch(self, input: List[str]) -> List[List[float]]:
+        try:
+            completion = await acall_with_retry(
+                lambda: self.async_client.embeddings.create(**self._request(input)),
+                self.breaker,
+                max_retries=self.max_retries
+            )
+        except EmbeddingError:
+            raise
         except Exception as e:
-            print(f"获取嵌入向量失败: {e}")
-            # 返回与预期维度相同的零向量
-            dim = self.dimensions or 1536  # 默认维度
-            return [list(np.zeros(dim)) for _ in input]
-
-# 1. 初始化Embedding函数
-embedding_function = OpenAICompatibleEmbeddingFunction(
-    client=client,
-    model=model,
-    dimensions=dimensions
+            raise EmbeddingError(f"获取嵌入向量失败: {e}", input) from e
+        return self._parse(completion)
+
+    def _parse(self, completion) -> List[List[float]]:
+        data = json.loads(completion.model_dump_json())
+        
+        # 确定向量维度
+        if self.dimensions is None and len(data['data']) > 0:
+            self.dimensions = len(data['data'][0]['embedding'])
+        
+        # 提取所有嵌入向量
+        embeddings = [item['embedding'] for item in data['data']]
+        return embeddings
+
+# 1. 初始化Embedding函数，外面包一层本地缓存，重复的文档和查询不再请求接口
+embedding_breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+# embedding 失败的文本块进入死信队列，由后台任务在服务恢复后补写
+dead_letters = DeadLetterQueue(os.getenv("EMBEDDING_DLQ_PATH", "embedding_dlq.jsonl"))
+# 缓存数据库在第一次使用时才打开，导入本模块不会创建文件
+embedding_cache = EmbeddingCache(
+    path=os.getenv("EMBEDDING_CACHE_PATH"),
+    max_entries=100000
+)
+embedding_function = CachedEmbeddingFunction(
+    OpenAICompatibleEmbeddingFunction(
+        client=client,
+        model=model,
+        dimensions=dimensions,
+        batch_size=embedding_batch_size,
+        max_workers=embedding_workers,
+        breaker=embedding_breaker,
+        async_client=async_client
+    ),
+    embedding_cache
 )
 
 def init_db(collection): 
@@ -78,10 +160,228 @@ def init_db(collection):
 
     print("数据已成功写入向量数据库")
 
+# 批量导入：把目录下的文本文件切块后分批嵌入、分批 upsert
+def split_text(text, chunk_size=500, chunk_overlap=50):
+    # 按段落累积到 chunk_size，超长段落按字符硬切，相邻块保留 chunk_overlap 个字符的重叠
+    chunks = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > chunk_size:
+            chunks.append(current)
+            current = current[-chunk_overlap:] if chunk_overlap else ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+        while len(current) > chunk_size:
+            chunks.append(current[:chunk_size])
+            current = current[chunk_size - chunk_overlap:]
+    if current:
+        chunks.append(current)
+    return chunks
+
+def list_files(directory, patterns=("*.txt", "*.md")):
+    root = Path(directory)
+    return sorted({path for pattern in patterns for path in root.rglob(pattern) if path.is_file()})
+
+def chunk_file(root, path, chunk_size=500, chunk_overlap=50, text=None):
+    # 返回 (ids, documents, metadatas)，ID 由相对路径和块序号组成，重复导入时保持不变
+    relative = Path(path).relative_to(root).as_posix()
+    if text is None:
+        text = Path(path).read_text(encoding="utf-8", errors="ignore")
+    ids, documents, metadatas = [], [], []
+    for index, chunk in enumerate(split_text(text, chunk_size, chunk_overlap)):
+        ids.append(f"{relative}#{index}")
+        documents.append(chunk)
+        metadatas.append({"source": relative, "chunk": index})
+    return ids, documents, metadatas
+
+def load_directory(directory, patterns=("*.txt", "*.md"), chunk_size=500, chunk_overlap=50):
+    ids, documents, metadatas = [], [], []
+    for path in list_files(directory, patterns):
+        file_ids, file_documents, file_metadatas = chunk_file(directory, path, chunk_size, chunk_overlap)
+        ids += file_ids
+        documents += file_documents
+        metadatas += file_metadatas
+    return ids, documents, metadatas
+
+def existing_ids(collection, ids, batch_size=500):
+    # 查询集合中已存在的 ID，用于中断后从断点继续导入
+    found = set()
+    for i in range(0, len(ids), batch_size):
+        result = collection.get(ids=ids[i:i + batch_size], include=[])
+        found.update(result["ids"])
+    return found
+
+def upsert_chunks(collection, ids, documents, metadatas, upsert_batch_size=100):
+    # 返回成功写入的 ID 集合。每个 upsert 批次内部再按 embedding_batch_size 切分并发请求；
+    # 当前批次写入 Chroma 的同时，下一批次的 embedding 已经在后台计算
+    batches = [list(range(i, min(i + upsert_batch_size, len(ids)))) for i in range(0, len(ids), upsert_batch_size)]
+    written = set()
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        future = prefetch.submit(embedding_function, [documents[i] for i in batches[0]]) if batches else None
+        for n, batch in enumerate(batches):
+            try:
+                embeddings, error = future.result(), None
+            except EmbeddingError as e:
+                embeddings, error = None, e
+            if n + 1 < len(batches):
+                future = prefetch.submit(embedding_function, [documents[i] for i in batches[n + 1]])
+            batch_ids = [ids[i] for i in batch]
+            batch_documents = [documents[i] for i in batch]
+            batch_metadatas = [metadatas[i] for i in batch]
+            if error is not None:
+                # 这一批先进入死信队列，不写入向量库，由后台任务或下次导入补写
+                dead_letters.add(batch_ids, batch_documents, batch_metadatas, str(error))
+                print(f"{len(batch)} 个文本块 embedding 失败，已加入死信队列: {error}")
+                continue
+            try:
+                collection.upsert(
+                    ids=batch_ids,
+                    documents=batch_documents,
+                    metadatas=batch_metadatas,
+                    embeddings=embeddings
+                )
+            except Exception as e:
+                # 已写入的批次不受影响，重新运行时会跳过它们
+                print(f"写入数据库失败: {e}")
+                break
+            if len(dead_letters):
+                dead_letters.remove(batch_ids)
+            written.update(batch_ids)
+            print(f"已导入 {len(written)}/{len(ids)}")
+    return written
+
+def ingest_directory(collection, directory, upsert_batch_size=100, chunk_size=500, chunk_overlap=50):
+    start = time.perf_counter()
+    ids, documents, metadatas = load_directory(directory, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    done = existing_ids(collection, ids)
+    pending = [i for i, doc_id in enumerate(ids) if doc_id not in done]
+    print(f"共 {len(ids)} 个文本块，已存在 {len(ids) - len(pending)} 个，待导入 {len(pending)} 个")
+
+    pending_ids = [ids[i] for i in pending]
+    written = upsert_chunks(
+        collection,
+        pending_ids,
+        [documents[i] for i in pending],
+        [metadatas[i] for i in pending],
+        upsert_batch_size
+    )
+    # 只统计本次导入的块，死信队列里之前运行遗留的条目不算在内
+    dead_ids = {item["id"] for item in dead_letters.pending()}
+    failed = sum(1 for doc_id in pending_ids if doc_id in dead_ids)
+
+    elapsed = time.perf_counter() - start
+    print(f"导入完成: 写入 {len(written)} 个文本块，本次进入死信队列 {failed} 个，耗时 {elapsed:.1f}s")
+    return {"total": len(ids), "skipped": len(ids) - len(pending), "written": len(written),
+            "dead_lettered": failed, "seconds": elapsed}
+
+# 持久化模式的增量同步：manifest 记录每个文件的 mtime、大小、内容哈希和它产生的块 ID。
+# 启动时 mtime 和大小都没变的文件只需一次 stat，不读取也不哈希；
+# 变化的文件再比较内容哈希，只有内容确实变了的文件才重新切块、嵌入和 upsert
+def load_manifest(manifest_path):
+    path = Path(manifest_path)
+    if not path.exists():
+        return {"embedding_model": None, "dimensions": None, "files": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest_path, manifest):
+    path = Path(manifest_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    tmp.replace(path)
+
+def open_collection(chroma_client, name="knowledge_base"):
+    # 创建或获取集合(相当于表)
+    return chroma_client.get_or_create_collection(
+        name=name,
+        embedding_function=embedding_function  # 使用我们选择的嵌入模型
+    )
+
+def sync_directory(chroma_client, directory, manifest_path, collection_name="knowledge_base",
+                   upsert_batch_size=100, chunk_size=500, chunk_overlap=50):
+    start = time.perf_counter()
+    manifest = load_manifest(manifest_path)
+    embedder = embedding_function.embedding_function
+    if (manifest["embedding_model"], manifest["dimensions"]) != (embedder.model, embedder.dimensions):
+        # 换了嵌入模型或维度，旧向量全部作废：旧模型的向量和新查询不在同一个向量空间，
+        # 维度变了的集合也无法再写入新向量，因此删除整个集合重建，而不只是清空 manifest
+        if manifest["embedding_model"] is not None:
+            print("嵌入模型或维度已变化，重建集合并重新导入全部文件")
+            try:
+                chroma_client.delete_collection(collection_name)
+            except Exception:
+                pass  # 集合已不存在
+        manifest = {"embedding_model": embedder.model, "dimensions": embedder.dimensions, "files": {}}
+        # 先落盘新的 manifest，避免中途退出后下次启动又把新集合当作旧模型的数据删掉
+        save_manifest(manifest_path, manifest)
+    files = manifest["files"]
+    collection = open_collection(chroma_client, collection_name)
+
+    unchanged = 0
+    changed = []  # (relative, entry, ids, documents, metadatas)
+    seen = set()
+    for path in list_files(directory):
+        relative = path.relative_to(directory).as_posix()
+        seen.add(relative)
+        stat = path.stat()
+        entry = files.get(relative)
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            unchanged += 1
+            continue
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if entry and entry["sha256"] == digest:
+            # 只是 touch 过，内容没变
+            entry["mtime"], entry["size"] = stat.st_mtime, stat.st_size
+            unchanged += 1
+            continue
+        file_ids, file_documents, file_metadatas = chunk_file(directory, path, chunk_size, chunk_overlap, text)
+        new_entry = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": digest, "ids": file_ids}
+        changed.append((relative, new_entry, file_ids, file_documents, file_metadatas))
+
+    # 删除已移除文件的块，以及变化文件中不再存在的旧块
+    stale = [doc_id for relative, entry in files.items() if relative not in seen for doc_id in entry["ids"]]
+    for relative, new_entry, file_ids, _, _ in changed:
+        new_ids = set(file_ids)
+        stale += [doc_id for doc_id in files.get(relative, {}).get("ids", []) if doc_id not in new_ids]
+    if stale:
+        collection.delete(ids=stale)
+    for relative in [relative for relative in files if relative not in seen]:
+        del files[relative]
+
+    written = upsert_chunks(
+        collection,
+        [doc_id for item in changed for doc_id in item[2]],
+        [doc for item in changed for doc in item[3]],
+        [meta for item in changed for meta in item[4]],
+        upsert_batch_size
+    )
+    # 只有全部块都写入成功的文件才记入 manifest，其余文件下次启动时重试
+    updated = 0
+    for relative, new_entry, file_ids, _, _ in changed:
+        if all(doc_id in written for doc_id in file_ids):
+            files[relative] = new_entry
+            updated += 1
+    save_manifest(manifest_path, manifest)
+
+    elapsed = time.perf_counter() - start
+    print(f"同步完成: 未变化 {unchanged} 个文件，更新 {updated}/{len(changed)} 个文件，"
+          f"删除 {len(stale)} 个旧文本块，耗时 {elapsed:.2f}s")
+    return {"unchanged": unchanged, "changed": len(changed), "updated": updated,
+            "deleted_chunks": len(stale), "seconds": elapsed}
+
 # 2. 向量化用户查询并搜索
 def search_documents(query, collection, n_results=1):
     # 向量化查询
-    query_embeddings = embedding_function(query)
+    try:
+        query_embeddings = embedding_function(query)
+    except EmbeddingError as e:
+        print(f"查询向量化失败: {e}")
+        return None
     results = None
     try:
         # 在数据库中搜索
@@ -95,27 +395,30 @@ def search_documents(query, collection, n_results=1):
     return results
 
 # 3. 与大模型整合生成回答
+# system 就是 prompt。说明文字是常量并放在最前面，每次请求的前缀逐字节相同，
+# 服务端的前缀缓存可以命中；变化的上下文和问题放在 user 消息里
+SYSTEM_PROMPT = "你是一个知识渊博的助手，根据提供的上下文回答问题。如果你不知道答案，就说你不知道。"
+# 上下文最多占用的 token 数，按检索排名依次放入，超出部分截断
+CONTEXT_TOKEN_BUDGET = 2000
+prompt_builder = PromptBuilder(SYSTEM_PROMPT, context_budget=CONTEXT_TOKEN_BUDGET)
+
+def build_messages(query, context):
+    # context 为检索到的文档列表（按相关度排序），也兼容已拼好的字符串
+    documents = [context] if isinstance(context, str) else list(context)
+    messages, _ = prompt_builder.build(query, documents)
+    return messages
+
 def generate_response_with_llm(query, context):
     resp = ""
-    user_message = f"""基于以下上下文信息回答问题。如果你不知道答案，就说你不知道。
-    
-    上下文:
-    {context}
+    messages = build_messages(query, context)
     
-    问题: {query}
-    回答:"""
-    
-    print(f"user_message: {user_message}")
+    print(f"user_message: {messages[-1]['content']}")
 
     try:
         completion = client.chat.completions.create(
             model="deepseek-r1", # 模型列表：https://help.aliyun.com/zh/model-studio/getting-started/models
-            messages=[
-                #system 就是 prompt
-                {'role': 'system', 'content': '你是一个知识渊博的助手，根据提供的上下文回答问题。'},
-                #user 就是 提问内容
-                {'role': 'user', 'content': user_message}
-                ]
+            messages=messages,
+            timeout=CHAT_TIMEOUT
         )
 
         resp = completion.choices[0].message.content
@@ -124,32 +427,177 @@ def generate_response_with_llm(query, context):
 
     return resp
 
+# 流式生成：思考过程和回答分开逐段产出 ("reasoning", 文本) / ("answer", 文本)，
+# 结束时打印首 token 延迟（TTFT）和生成速度；传入 stats 字典可以拿到这些数据
+def stream_response_with_llm(query, context, stats=None):
+    stats = {} if stats is None else stats
+    start = time.perf_counter()
+    first_token = first_answer = None
+    accumulator = StreamAccumulator()
+
+    try:
+        completion = client.chat.completions.create(
+            model="deepseek-r1",
+            messages=build_messages(query, context),
+            stream=True,
+            # 最后一个 chunk 的 choices 为空，携带本次的 token 用量
+            stream_options={"include_usage": True},
+            timeout=CHAT_TIMEOUT
+        )
+        for kind, text in accumulator.iter(completion):
+            now = time.perf_counter()
+            if first_token is None:
+                first_token = now
+            if kind == "answer" and first_answer is None:
+                first_answer = now
+            yield kind, text
+    except Exception as e:
+        print(f"stream_response_with_llm 失败: {e}")
+
+    end = time.perf_counter()
+    # 优先使用服务端统计的 token 数（包含思考过程），否则按收到的 chunk 数估算
+    if accumulator.usage is not None:
+        tokens = accumulator.usage.completion_tokens
+    else:
+        tokens = len(accumulator.reasoning_parts) + len(accumulator.answer_parts)
+    generating = end - first_token if first_token is not None else 0.0
+    stats.update({
+        "ttft_s": first_token - start if first_token is not None else None,
+        "answer_ttft_s": first_answer - start if first_answer is not None else None,
+        "completion_tokens": tokens,
+        "tokens_per_s": tokens / generating if generating > 0 else 0.0,
+        "total_s": end - start,
+    })
+    ttft = f"{stats['ttft_s']:.2f}s" if stats["ttft_s"] is not None else "-"
+    answer_ttft = f"{stats['answer_ttft_s']:.2f}s" if stats["answer_ttft_s"] is not None else "-"
+    print(f"\n[TTFT {ttft}, 首个回答 token {answer_ttft}, {tokens} tokens, "
+          f"{stats['tokens_per_s']:.1f} tokens/s, 总耗时 {stats['total_s']:.2f}s]")
+
 # 4. 完整的RAG流程
 def rag_pipeline(query, collection):
     # 搜索相关文档
     search_results = search_documents(query, collection)
     
-    # 提取文档内容
-    retrieved_docs = search_results['documents'][0]
+    # 提取文档内容，检索失败时不带上下文
+    retrieved_docs = search_results['documents'][0] if search_results else []
     
-    # 合并上下文
-    context = "\n".join(retrieved_docs)
+    # 上下文由提示词构建器按 token 预算拼接
+    context = retrieved_docs
     
     # 生成回答
     answer = generate_response_with_llm(query, context)
     
     return answer
 
+def rag_pipeline_stream(query, collection):
+    # 与 rag_pipeline 相同，但边生成边打印，返回完整回答
+    search_results = search_documents(query, collection)
+    context = search_results['documents'][0] if search_results else []
+
+    answer_parts = []
+    current = None
+    for kind, text in stream_response_with_llm(query, context):
+        if kind != current:
+            print("\n" + "=" * 20 + ("思考过程" if kind == "reasoning" else "完整回复") + "=" * 20 + "\n")
+            current = kind
+        print(text, end='', flush=True)
+        if kind == "answer":
+            answer_parts.append(text)
+    return "".join(answer_parts)
+
+# 5. 异步并发的RAG流程：多个查询共享一次 embedding 请求，
+# 检索和生成在信号量限制的并发度下同时进行，哪个先完成就先返回哪个
+async def aembed_queries(queries):
+    # 与同步路径共用缓存查询和回填逻辑，未命中的查询合并请求，超过单次上限时才拆成多个并发请求
+    return await embedding_function.acall(queries)
+
+async def answer_query_async(query, query_embedding, collection, semaphore, n_results=1):
+    async with semaphore:
+        try:
+            # Chroma 客户端是同步的，放到线程里执行，不阻塞事件循环
+            results = await asyncio.to_thread(
+                collection.query, query_embeddings=[query_embedding], n_results=n_results
+            )
+            retrieved_docs = results['documents'][0]
+        except Exception as e:
+            print(f"查询数据库失败: {e}")
+            retrieved_docs = []
+
+        try:
+            completion = await async_client.chat.completions.create(
+                model="deepseek-r1",
+                messages=build_messages(query, retrieved_docs),
+                timeout=CHAT_TIMEOUT
+            )
+            return query, completion.choices[0].message.content
+        except Exception as e:
+            print(f"generate_response_with_llm 失败: {e}")
+            return query, ""
+
+async def rag_pipeline_async(queries, collection, max_concurrency=4):
+    try:
+        query_embeddings = await aembed_queries(queries)
+    except Exception as e:
+        print(f"查询向量化失败: {e}")
+        for query in queries:
+            yield query, ""
+        return
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = [
+        asyncio.create_task(answer_query_async(query, embedding, collection, semaphore))
+        for query, embedding in zip(queries, query_embeddings)
+    ]
+    for task in asyncio.as_completed(tasks):
+        yield await task
+
+async def run_queries_async(queries, collection, max_concurrency=4):
+    try:
+        async for query, answer in rag_pipeline_async(queries, collection, max_concurrency):
+            print(f"问题: {query}\n\n回答: {answer}\n" + "=" * 50)
+    finally:
+        # 共享的异步客户端要在创建连接的同一个事件循环里关闭
+        await aclose_clients()
+
 if __name__ == "__main__": 
+    parser = argparse.ArgumentParser(description="本地 RAG 示例")
+    parser.add_argument("directory", nargs="?", help="批量导入该目录下的 .txt/.md 文件")
+    parser.add_argument("--persist", metavar="PATH",
+                        help="使用持久化的 Chroma 数据库（如 rag_db），启动时只同步新增或变化的文件")
+    parser.add_argument("--cache", metavar="PATH",
+                        help="embedding 缓存数据库路径（默认 EMBEDDING_CACHE_PATH 环境变量；"
+                             "持久化模式下放在 --persist 目录中，否则为 embedding_cache.db）")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="大于 0 时并发处理所有问题（异步客户端），按完成顺序输出回答")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式输出思考过程和回答，并报告首 token 延迟和生成速度")
+    args = parser.parse_args()
+    # 输出每次请求的 prompt token 统计
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.cache:
+        embedding_cache.path = args.cache
+    elif args.persist and not embedding_cache.path:
+        embedding_cache.path = str(Path(args.persist, "embedding_cache.db"))
+
     # 初始化向量数据库
-    #chroma_client = chromadb.PersistentClient(path="rag_db")  # 数据会保存在当前目录的rag_db文件夹中
-    chroma_client = chromadb.Client()
-    # 创建或获取集合(相当于表)
-    collection = chroma_client.get_or_create_collection(
-        name="knowledge_base",
-        embedding_function=embedding_function  # 使用我们选择的嵌入模型
-    )
-    init_db(collection)
+    if args.persist:
+        chroma_client = chromadb.PersistentClient(path=args.persist)  # 数据会保存在 args.persist 目录中
+    else:
+        chroma_client = chromadb.Client()
+    if args.directory and args.persist:
+        # 持久化模式：按 manifest 增量同步，热启动耗时与语料规模无关
+        sync_directory(chroma_client, args.directory, Path(args.persist, "manifest_knowledge_base.json"))
+    collection = open_collection(chroma_client)
+    if args.directory and not args.persist:
+        # 批量导入目录下的 .txt/.md 文件
+        ingest_directory(collection, args.directory)
+    elif not args.directory and collection.count() == 0:
+        init_db(collection)
+
+    # 后台定期补写死信队列中的文本块
+    reembed_worker = ReembedWorker(collection, embedding_function, dead_letters, embedding_breaker, interval=30)
+    reembed_worker.start()
 
     user_queries = [
         "苹果公司有哪些著名成果？",
@@ -158,7 +606,23 @@ if __name__ == "__main__":
     ]
 
     print(f"\n\n\n" + "=" * 50)
-    for user_query in user_queries:
-        print(f"问题: {user_query}\n")
-        response = rag_pipeline(user_query, collection)
-        print(f"\n回答: {response}\n" + "=" * 50)
\ No newline at end of file
+    if args.concurrency > 0:
+        asyncio.run(run_queries_async(user_queries, collection, args.concurrency))
+    elif args.stream:
+        for user_query in user_queries:
+            print(f"问题: {user_query}\n")
+            rag_pipeline_stream(user_query, collection)
+            print("=" * 50)
+    else:
+        for user_query in user_queries:
+            print(f"问题: {user_query}\n")
+            response = rag_pipeline(user_query, collection)
+            print(f"\n回答: {response}\n" + "=" * 50)
+
+    stats = embedding_cache.stats()
+    print(f"embedding 缓存: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, "
+          f"命中率 {stats['hit_rate']:.1%}, 缓存条目 {stats['entries']}")
+    print_connection_stats()
+    reembed_worker.stop()
+    if len(dead_letters):
+        print(f"死信队列中还有 {len(dead_letters)} 个文本块，下次运行时会重新导入")
\ No newline at end of file
@@ -0,0 +1,313 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from prompt_builder import count_tokens
+
+# 本地 OpenAI 兼容模拟服务，用于离线压测客户端流程：
+#   python mock_server.py --port 8000 --latency lognormal:200,0.5 --tokens-per-s 80 --error-rate 0.02
+#   export DASHSCOPE_BASE_URL=http://127.0.0.1:8000/v1
+# 之后 local_rag.py、llm_test.py、batch_runner.py 通过 client_factory 连接的就是这个服务。
+# 支持 /v1/chat/completions（流式、非流式、工具调用、思考过程）和 /v1/embeddings
+
+
+# 延迟分布（毫秒）：fixed:50、uniform:20,80、normal:100,20、lognormal:中位数,sigma
+class LatencyDistribution:
+    def __init__(self, kind="fixed", params=(0.0,)):
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def from_spec(cls, spec):
+        kind, _, values = spec.partition(":")
+        params = tuple(float(v) for v in values.split(",")) if values else (0.0,)
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"未知的延迟分布: {kind}")
+        return cls(kind, params)
+
+    def sample_ms(self):
+        if self.kind == "uniform":
+            value = random.uniform(*self.params[:2])
+        elif self.kind == "normal":
+            value = random.gauss(*self.params[:2])
+        elif self.kind == "lognormal":
+            median, sigma = self.params[:2]
+            value = median * random.lognormvariate(0, sigma)
+        else:
+            value = self.params[0]
+        return max(value, 0.0)
+
+
+class MockConfig:
+    def __init__(self, latency=None, tokens_per_s=50.0, output_tokens=64, error_rate=0.0,
+                 error_statuses=(429, 500), embedding_latency=None):
+        self.latency = latency or LatencyDistribution()
+        self.embedding_latency = embedding_latency or self.latency
+        self.tokens_per_s = tokens_per_s
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+
+
+class MockStats:
+    def __init__(self):
+        self.requests = {}
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, path, error=False):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            self.errors += int(error)
+
+    def snapshot(self):
+        with self._lock:
+            return {"requests": dict(self.requests), "errors": self.errors}
+
+
+def _text_tokens(messages):
+    total = 0
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        total += count_tokens(content) + 4
+    return total
+
+
+def _fake_arguments(schema):
+    # 按参数 schema 生成一个合法的参数，字符串参数用示例值
+    arguments = {}
+    for name, prop in (schema or {}).get("properties", {}).items():
+        kind = prop.get("type")
+        arguments[name] = {"integer": 1, "number": 1.0, "boolean": True}.get(kind, "北京市")
+    return arguments
+
+
+def _embedding(text, dimensions):
+    # 同一文本总是得到同一个单位向量，检索结果可复现
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockOpenAI/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self) -> MockConfig:
+        return self.server.config
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/health", "/v1/stats"):
+            self._send_json(200, self.server.stats.snapshot())
+        else:
+            self._send_error(404, "not_found", f"Unknown path {self.path}")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_error(400, "invalid_request_error", "Invalid JSON body")
+            return
+
+        path = self.path.rstrip("/")
+        if path not in ("/v1/chat/completions", "/v1/embeddings"):
+            self._send_error(404, "not_found", f"Unknown path {self.path}")
+            return
+
+        # 错误注入：按概率返回限流或服务端错误
+        if random.random() < self.config.error_rate:
+            self.server.stats.record(path, error=True)
+            status = random.choice(self.config.error_statuses)
+            self._send_error(status, "rate_limit_error" if status == 429 else "server_error", "Injected error")
+            return
+        self.server.stats.record(path)
+
+        if path == "/v1/embeddings":
+            self._embeddings(body)
+        else:
+            self._chat(body)
+
+    def _embeddings(self, body):
+        time.sleep(self.config.embedding_latency.sample_ms() / 1000)
+        inputs = body.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        dimensions = body.get("dimensions") or 1024
+        tokens = sum(count_tokens(text) for text in inputs)
+        self._send_json(200, {
+            "object": "list",
+            "model": body.get("model", "mock-embedding"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": _embedding(text, dimensions)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _chat(self, body):
+        messages = body.get("messages", [])
+        model = body.get("model", "mock-chat")
+        prompt_tokens = _text_tokens(messages)
+        tools = body.get("tools") or []
+        # 用户消息之后第一次回复时请求工具；收到工具结果后给出最终回答
+        wants_tools = tools and messages and messages[-1].get("role") == "user"
+        reasoning = "r1" in model or "qvq" in model
+        completion_id = f"chatcmpl-{uuid.uuid4()}"
+        created = int(time.time())
+
+        # 首 token 延迟
+        time.sleep(self.config.latency.sample_ms() / 1000)
+
+        if wants_tools:
+            selected = tools if body.get("parallel_tool_calls", True) else tools[:1]
+            tool_calls = [
+                {
+                    "index": i,
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                    "type": "function",
+                    "function": {
+                        "name": tool["function"]["name"],
+                        "arguments": json.dumps(_fake_arguments(tool["function"].get("parameters")), ensure_ascii=False),
+                    },
+                }
+                for i, tool in enumerate(selected)
+            ]
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": 10 * len(tool_calls),
+                     "total_tokens": prompt_tokens + 10 * len(tool_calls)}
+            if body.get("stream"):
+                self._stream(body, completion_id, created, model, [], [], usage, tool_calls)
+            else:
+                self._send_json(200, {
+                    "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "finish_reason": "tool_calls", "message": {
+                        "role": "assistant", "content": "", "tool_calls": tool_calls}}],
+                    "usage": usage,
+                })
+            return
+
+        answer = ["模"] + ["拟"] * (self.config.output_tokens - 1)
+        thinking = ["想"] * (self.config.output_tokens // 2) if reasoning else []
+        completion_tokens = len(answer) + len(thinking)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+
+        if body.get("stream"):
+            self._stream(body, completion_id, created, model, thinking, answer, usage)
+            return
+
+        # 非流式：等待全部 token 生成完再返回
+        if self.config.tokens_per_s > 0:
+            time.sleep(completion_tokens / self.config.tokens_per_s)
+        message = {"role": "assistant", "content": "".join(answer)}
+        if thinking:
+            message["reasoning_content"] = "".join(thinking)
+        self._send_json(200, {
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+            "usage": usage,
+        })
+
+    def _stream(self, body, completion_id, created, model, thinking, answer, usage, tool_calls=None):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(delta, finish_reason=None):
+            return {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], "usage": None}
+
+        interval = 1 / self.config.tokens_per_s if self.config.tokens_per_s > 0 else 0
+        try:
+            self._write_event(chunk({"role": "assistant", "content": ""}))
+            for token in thinking:
+                time.sleep(interval)
+                self._write_event(chunk({"content": None, "reasoning_content": token}))
+            for token in answer:
+                time.sleep(interval)
+                self._write_event(chunk({"content": token}))
+            if tool_calls:
+                self._write_event(chunk({"content": None, "tool_calls": tool_calls}))
+            self._write_event(chunk({}, "tool_calls" if tool_calls else "stop"))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self._write_event({"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                                   "model": model, "choices": [], "usage": usage})
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前断开
+            self.close_connection = True
+
+    def _write_event(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, data: bytes):
+        # HTTP/1.1 分块传输编码，连接在流结束后可以继续复用
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, error_type, message):
+        self._send_json(status, {"error": {"message": message, "type": error_type, "code": status}})
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config: MockConfig):
+        super().__init__(address, MockHandler)
+        self.config = config
+        self.stats = MockStats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="fixed:200",
+                        help="对话首 token 延迟分布（毫秒）：fixed:200、uniform:100,300、normal:200,50、lognormal:200,0.5")
+    parser.add_argument("--embedding-latency", default="fixed:50", help="embedding 请求延迟分布（毫秒）")
+    parser.add_argument("--tokens-per-s", type=float, default=50, help="生成速度，0 表示不限速")
+    parser.add_argument("--output-tokens", type=int, default=64, help="每个回复的 token 数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误的概率")
+    parser.add_argument("--error-status", default="429,500", help="注入错误时随机选用的状态码")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=LatencyDistribution.from_spec(args.latency),
+        embedding_latency=LatencyDistribution.from_spec(args.embedding_latency),
+        tokens_per_s=args.tokens_per_s,
+        output_tokens=args.output_tokens,
+        error_rate=args.error_rate,
+        error_statuses=tuple(int(s) for s in args.error_status.split(",")),
+    )
+    server = MockServer((args.host, args.port), config)
+    print(f"模拟服务已启动: http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
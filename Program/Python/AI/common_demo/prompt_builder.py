@@ -0,0 +1,89 @@
+import logging
+
+from typing import List
+
+logger = logging.getLogger("prompt_builder")
+
+# tiktoken 是可选依赖：本地分词很快，但词表与 qwen/deepseek 不完全一致，只用于预算估计；
+# 没有安装时按字符估算（中日韩字符约 1 token，其他字符约 4 个 1 token）
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    cjk = sum(1 for ch in text if "⺀" <= ch <= "鿿" or "가" <= ch <= "힯")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    if _encoding is not None:
+        tokens = _encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else _encoding.decode(tokens[:max_tokens])
+    # 按估算比例截断，再逐步收缩到预算以内
+    end = len(text)
+    while end > 0 and count_tokens(text[:end]) > max_tokens:
+        end = min(end - 1, end * max_tokens // count_tokens(text[:end]))
+    return text[:end]
+
+
+# 提示词构建器：system 消息和说明文字是常量，每次请求逐字节相同，
+# 变化的上下文和问题都放在末尾，服务端的前缀缓存（prompt caching）才能命中。
+# 检索到的文档按排名依次放入，超过 context_budget 个 token 的部分被截断或丢弃
+class PromptBuilder:
+    def __init__(self, system_prompt: str, context_budget: int = 2000, min_fragment_tokens: int = 50):
+        self.system_prompt = system_prompt
+        self.context_budget = context_budget
+        # 剩余预算不足以放下这么多 token 时，不再放入截断的文档片段
+        self.min_fragment_tokens = min_fragment_tokens
+        self.prefix_tokens = count_tokens(system_prompt)
+
+    def fit_context(self, documents: List[str]):
+        kept = []
+        used = 0
+        truncated = False
+        separator_tokens = count_tokens("\n\n")
+        for doc in documents:
+            separator = separator_tokens if kept else 0
+            remaining = self.context_budget - used - separator
+            tokens = count_tokens(doc)
+            if tokens > remaining:
+                truncated = True
+                if remaining < self.min_fragment_tokens:
+                    break
+                doc = truncate_to_tokens(doc, remaining)
+                tokens = count_tokens(doc)
+            kept.append(doc)
+            used += separator + tokens
+            if truncated:
+                break
+        return kept, used, truncated
+
+    def build(self, query: str, documents: List[str]):
+        kept, context_tokens, truncated = self.fit_context(documents)
+        context = "\n\n".join(kept)
+        user_message = f"上下文:\n{context}\n\n问题: {query}\n回答:"
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": user_message},
+        ]
+        stats = {
+            "prefix_tokens": self.prefix_tokens,
+            "context_tokens": context_tokens,
+            "prompt_tokens": self.prefix_tokens + count_tokens(user_message),
+            "documents": len(kept),
+            "retrieved": len(documents),
+            "truncated": truncated,
+        }
+        logger.info(
+            "prompt tokens: %d (静态前缀 %d, 上下文 %d/%d, 文档 %d/%d%s)",
+            stats["prompt_tokens"], stats["prefix_tokens"], context_tokens, self.context_budget,
+            len(kept), len(documents), ", 已截断" if truncated else ""
+        )
+        return messages, stats
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import random
+import threading
+import time
+
+from pathlib import Path
+from typing import List
+
+import openai
+
+
+class EmbeddingError(Exception):
+    # embedding 请求在重试后仍然失败，texts 为失败的文本
+    def __init__(self, message, texts=None):
+        super().__init__(message)
+        self.texts = texts or []
+
+
+class CircuitOpenError(EmbeddingError):
+    pass
+
+
+# 熔断器：连续失败 failure_threshold 次后打开，reset_timeout 秒内直接拒绝请求；
+# 之后进入半开状态放行一次试探请求，成功则关闭，失败则重新打开
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # 只放行一个试探请求，其余请求在结果出来前继续被拒绝
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        # 试探请求没有得出结论（被取消或中断）时交还试探名额，下一次请求重新试探
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+
+
+def _settle(breaker: CircuitBreaker, error: Exception) -> bool:
+    # 每次失败都要给熔断器一个结论，否则半开状态的试探名额永远不会释放。
+    # 可重试的错误记为失败；400 之类的错误说明服务已经正常应答，记为成功
+    retryable = is_retryable(error)
+    if retryable:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return retryable
+
+
+def is_retryable(error: Exception) -> bool:
+    # 网络错误、超时、限流和服务端错误可以重试；参数错误等 4xx 重试也不会成功
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, ConnectionError, TimeoutError))
+
+
+def call_with_retry(fn, breaker: CircuitBreaker, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+    # 指数退避 + 随机抖动，每次尝试前先检查熔断器
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError("服务熔断中，暂停请求")
+        try:
+            result = fn()
+        except Exception as e:
+            if not _settle(breaker, e) or attempt >= max_retries:
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+            attempt += 1
+        except BaseException:
+            # 被中断时交还试探名额
+            breaker.release()
+            raise
+        else:
+            breaker.record_success()
+            return result
+
+
+async def acall_with_retry(fn, breaker: CircuitBreaker, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+    # call_with_retry 的异步版本，fn 返回协程，退避期间不阻塞事件循环
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError("服务熔断中，暂停请求")
+        try:
+            result = await fn()
+        except Exception as e:
+            if not _settle(breaker, e) or attempt >= max_retries:
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            attempt += 1
+        except BaseException:
+            # 任务被取消时交还试探名额
+            breaker.release()
+            raise
+        else:
+            breaker.record_success()
+            return result
+
+
+# 死信队列：embedding 失败的文本块先落盘，不写入向量库，等服务恢复后由后台任务补写
+class DeadLetterQueue:
+    def __init__(self, path: str = "embedding_dlq.jsonl"):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._items = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        self._items[item["id"]] = item
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[dict], error: str):
+        with self._lock:
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                attempts = self._items.get(doc_id, {}).get("attempts", 0) + 1
+                self._items[doc_id] = {
+                    "id": doc_id,
+                    "document": document,
+                    "metadata": metadata,
+                    "error": error,
+                    "attempts": attempts,
+                    "failed_at": time.time(),
+                }
+            self._flush()
+
+    def remove(self, ids: List[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._items.pop(doc_id, None)
+            self._flush()
+
+    def pending(self, limit: int = None) -> List[dict]:
+        with self._lock:
+            items = list(self._items.values())
+        return items[:limit] if limit else items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def _flush(self):
+        # 先写临时文件再替换，进程中途退出也不会留下半截文件
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for item in self._items.values():
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        tmp.replace(self.path)
+
+
+# 后台补写任务：定期取出死信队列中的文本块重新 embedding，成功后写入向量库并出队
+class ReembedWorker:
+    def __init__(self, collection, embedding_function, dlq: DeadLetterQueue, breaker: CircuitBreaker,
+                 interval: float = 30.0, batch_size: int = 50):
+        self.collection = collection
+        self.embedding_function = embedding_function
+        self.dlq = dlq
+        self.breaker = breaker
+        self.interval = interval
+        self.batch_size = batch_size
+        self.reembedded = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="reembed-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def run_once(self) -> int:
+        written = 0
+        items = self.dlq.pending()
+        for i in range(0, len(items), self.batch_size):
+            batch = items[i:i + self.batch_size]
+            ids = [item["id"] for item in batch]
+            documents = [item["document"] for item in batch]
+            metadatas = [item["metadata"] for item in batch]
+            try:
+                embeddings = self.embedding_function(documents)
+                self.collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+            except CircuitOpenError:
+                # 熔断期间跳过本轮，等下一个周期
+                break
+            except Exception as e:
+                self.dlq.add(ids, documents, metadatas, str(e))
+                break
+            self.dlq.remove(ids)
+            written += len(ids)
+        self.reembedded += written
+        return written
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if len(self.dlq):
+                written = self.run_once()
+                if written:
+                    print(f"死信队列补写 {written} 个文本块，剩余 {len(self.dlq)} 个")
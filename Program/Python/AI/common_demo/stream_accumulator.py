@@ -0,0 +1,156 @@
+import asyncio
+import codecs
+import json
+
+
+# 增量 SSE 解析器：按收到的字节块喂入，返回其中完整的 data 事件（已 JSON 解码）。
+# 一个 UTF-8 字符（如“通” E9 80 9A）或一行 data 可能被拆在两个 TCP 包里，
+# 用增量解码器和行缓冲拼接，不会解出半个字符或半个 JSON
+class SSEParser:
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._data = []
+        self.done = False
+
+    def feed(self, chunk: bytes):
+        events = []
+        self._buffer += self._decoder.decode(chunk)
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            line = line.rstrip("\r")
+            if not line:
+                # 空行表示一个事件结束
+                if self._data:
+                    payload = "\n".join(self._data)
+                    self._data = []
+                    if payload == "[DONE]":
+                        self.done = True
+                    else:
+                        events.append(json.loads(payload))
+            elif line.startswith("data:"):
+                self._data.append(line[5:].lstrip(" "))
+            # 其余字段（event:、id:、注释行）在 chat completions 流里用不到
+        return events
+
+
+def _get(obj, name):
+    # 同时支持 SDK 的 chunk 对象和 SSEParser 解出的 dict
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+# 流式结果累加器：思考过程和回答分两个通道，增量片段先放进列表，
+# 最后只拼接一次，长回复不会因为反复 += 字符串而产生平方级的内存拷贝。
+# 开启 stream_options={"include_usage": True} 时，最后一个 choices 为空的 chunk 携带 usage
+class StreamAccumulator:
+    def __init__(self):
+        self.reasoning_parts = []
+        self.answer_parts = []
+        self.usage = None
+        self.finish_reason = None
+        self.chunks = 0
+
+    def feed(self, chunk):
+        # 返回 ("reasoning" | "answer", 文本)，没有文本增量时返回 None
+        self.chunks += 1
+        choices = _get(chunk, "choices")
+        if not choices:
+            usage = _get(chunk, "usage")
+            if usage is not None:
+                self.usage = usage
+            return None
+        choice = choices[0]
+        if _get(choice, "finish_reason"):
+            self.finish_reason = _get(choice, "finish_reason")
+        delta = _get(choice, "delta")
+        if delta is None:
+            return None
+        reasoning = _get(delta, "reasoning_content")
+        if reasoning:
+            self.reasoning_parts.append(reasoning)
+            return "reasoning", reasoning
+        content = _get(delta, "content")
+        if content:
+            self.answer_parts.append(content)
+            return "answer", content
+        return None
+
+    def iter(self, stream):
+        # 同步流：逐个产出 (通道, 文本)
+        for chunk in stream:
+            item = self.feed(chunk)
+            if item is not None:
+                yield item
+
+    @property
+    def reasoning(self):
+        return "".join(self.reasoning_parts)
+
+    @property
+    def answer(self):
+        return "".join(self.answer_parts)
+
+
+# 异步流读取器：后台任务从 AsyncOpenAI 的流中读取 chunk，放进有界队列；
+# 消费者处理得慢时队列写满，读取任务暂停，不再从连接上读数据，由 TCP 流控把压力传回服务端。
+# 用 async with 使用：消费者提前退出（break、异常或被取消）时取消读取任务并关闭 HTTP 流
+class AsyncStreamReader:
+    _END = object()
+
+    def __init__(self, stream, accumulator: StreamAccumulator = None, maxsize: int = 64):
+        self.stream = stream
+        self.accumulator = accumulator or StreamAccumulator()
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._task = None
+        self._finished = False
+
+    async def _pump(self):
+        # 正常结束放入结束标记，出错时放入异常；被取消时直接退出，不再等待队列空位
+        try:
+            async for chunk in self.stream:
+                item = self.accumulator.feed(chunk)
+                if item is not None:
+                    await self._queue.put(item)
+            end = self._END
+        except Exception as e:
+            end = e
+        await self._queue.put(end)
+
+    def __aiter__(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._pump())
+        return self
+
+    async def __anext__(self):
+        if self._finished:
+            raise StopAsyncIteration
+        item = await self._queue.get()
+        if item is self._END:
+            self._finished = True
+            raise StopAsyncIteration
+        if isinstance(item, Exception):
+            self._finished = True
+            raise item
+        return item
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        # 取消读取任务并等待它退出，然后关闭底层连接；可以重复调用
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        close = getattr(self.stream, "close", None)
+        if close is not None:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
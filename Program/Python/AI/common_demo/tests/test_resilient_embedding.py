@@ -0,0 +1,101 @@
+import asyncio
+import sys
+
+from pathlib import Path
+
+import httpx
+import openai
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from resilient_embedding import CircuitBreaker, CircuitOpenError, acall_with_retry, call_with_retry
+
+
+def api_error(status_code):
+    request = httpx.Request("POST", "http://test/v1/embeddings")
+    response = httpx.Response(status_code, request=request)
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+def raise_error(error):
+    def fn():
+        raise error
+    return fn
+
+
+def open_breaker():
+    # 打开后立即可以试探
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_retryable_errors_open_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    with pytest.raises(openai.APIStatusError):
+        call_with_retry(raise_error(api_error(500)), breaker, max_retries=1, base_delay=0)
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(lambda: "ok", breaker)
+
+
+def test_non_retryable_error_during_probe_closes_breaker():
+    breaker = open_breaker()
+
+    # 400 说明服务已经应答，试探结束，熔断器不能卡在半开状态
+    with pytest.raises(openai.APIStatusError):
+        call_with_retry(raise_error(api_error(400)), breaker, max_retries=3, base_delay=0)
+
+    assert breaker.state == "closed"
+    assert call_with_retry(lambda: "ok", breaker) == "ok"
+
+
+def test_retryable_error_during_probe_reopens_breaker():
+    breaker = open_breaker()
+
+    with pytest.raises(openai.APIStatusError):
+        call_with_retry(raise_error(api_error(503)), breaker, max_retries=0, base_delay=0)
+
+    assert breaker.state == "open"
+    assert call_with_retry(lambda: "ok", breaker) == "ok"
+
+
+def test_interrupted_probe_releases_slot():
+    breaker = open_breaker()
+
+    with pytest.raises(KeyboardInterrupt):
+        call_with_retry(raise_error(KeyboardInterrupt()), breaker)
+
+    assert breaker.state == "open"
+    assert call_with_retry(lambda: "ok", breaker) == "ok"
+
+
+def test_async_probe_settled_on_error_and_cancel():
+    async def scenario():
+        breaker = open_breaker()
+
+        async def bad_request():
+            raise api_error(400)
+
+        with pytest.raises(openai.APIStatusError):
+            await acall_with_retry(bad_request, breaker, base_delay=0)
+        assert breaker.state == "closed"
+
+        breaker = open_breaker()
+        task = asyncio.create_task(acall_with_retry(lambda: asyncio.sleep(10), breaker))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert breaker.state == "open"
+
+        async def ok():
+            return "ok"
+
+        assert await acall_with_retry(ok, breaker) == "ok"
+
+    asyncio.run(scenario())
@@ -0,0 +1,130 @@
+import asyncio
+import inspect
+import json
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+
+# 工具注册表：替代按名字 if/elif 分发，同时生成传给模型的 tools 列表
+class ToolRegistry:
+    def __init__(self):
+        self._tools = {}
+
+    def register(self, name=None, description="", parameters=None, timeout=10.0):
+        # 装饰器用法：@registry.register(description=..., parameters=..., timeout=...)
+        def decorator(fn):
+            self._tools[name or fn.__name__] = {
+                "fn": fn,
+                "is_async": inspect.iscoroutinefunction(fn),
+                "timeout": timeout,
+                "schema": {
+                    "type": "function",
+                    "function": {
+                        "name": name or fn.__name__,
+                        "description": description,
+                        "parameters": parameters or {},
+                    },
+                },
+            }
+            return fn
+        return decorator
+
+    def get(self, name):
+        return self._tools.get(name)
+
+    @property
+    def tools(self):
+        return [tool["schema"] for tool in self._tools.values()]
+
+
+# 并行执行一条 assistant 消息里的全部 tool_calls：同步工具放进线程池，异步工具直接在事件循环里运行，
+# 每个工具有自己的超时；所有结果按 tool_calls 的顺序一次性返回，下一轮请求可以一起带上
+class ToolEngine:
+    def __init__(self, registry: ToolRegistry, max_workers: int = 8):
+        self.registry = registry
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        # 同步调用 run() 时使用的事件循环，整个引擎生命周期内只有这一个：
+        # 异步工具里用到的连接池（如共享的异步客户端）绑定在循环上，每轮新建循环会丢掉已有连接
+        self._loop = None
+        # 最近一轮每个工具调用的耗时和状态
+        self.last_timings = []
+        self.last_elapsed_ms = 0.0
+
+    async def _run_one(self, tool_call):
+        name = tool_call.function.name
+        tool = self.registry.get(name)
+        start = time.perf_counter()
+        status = "ok"
+        if tool is None:
+            content, status = f"未知工具: {name}", "error"
+        else:
+            try:
+                arguments = json.loads(tool_call.function.arguments or "{}")
+                if tool["is_async"]:
+                    result = await asyncio.wait_for(tool["fn"](**arguments), tool["timeout"])
+                else:
+                    # 同步工具超时后线程无法被强制结束，只是不再等待它的结果
+                    loop = asyncio.get_running_loop()
+                    future = loop.run_in_executor(self._pool, partial(tool["fn"], **arguments))
+                    result = await asyncio.wait_for(future, tool["timeout"])
+                content = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False)
+            except asyncio.TimeoutError:
+                content, status = f"工具 {name} 执行超时（{tool['timeout']}s）", "timeout"
+            except Exception as e:
+                content, status = f"工具 {name} 执行失败: {e}", "error"
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        timing = {"id": tool_call.id, "name": name, "status": status, "ms": elapsed_ms}
+        return {"role": "tool", "tool_call_id": tool_call.id, "content": content}, timing
+
+    async def arun(self, tool_calls):
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self._run_one(call) for call in tool_calls))
+        self.last_timings = [timing for _, timing in results]
+        self.last_elapsed_ms = (time.perf_counter() - start) * 1000
+        return [message for message, _ in results]
+
+    def run(self, tool_calls):
+        # 同步入口；已经在事件循环里（Jupyter、异步调用方）时应直接 await arun()
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("ToolEngine.run() 不能在运行中的事件循环里调用，请改用 await engine.arun(tool_calls)")
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self.arun(tool_calls))
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        if self._loop is not None:
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+            self._loop = None
+
+
+def chat_with_tools(client, messages, engine: ToolEngine, model="qwen-plus", max_rounds=5, verbose=True):
+    # 多轮调用模型，直到模型不再请求工具；parallel_tool_calls 允许模型一次返回多个工具调用
+    for i in range(1, max_rounds + 1):
+        completion = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            tools=engine.registry.tools,
+            parallel_tool_calls=True
+        )
+        assistant_output = completion.choices[0].message
+        if assistant_output.content is None:
+            assistant_output.content = ""
+        messages.append(assistant_output)
+        if not assistant_output.tool_calls:
+            return assistant_output.content
+
+        tool_messages = engine.run(assistant_output.tool_calls)
+        messages.extend(tool_messages)
+        if verbose:
+            print(f"第{i}轮调用 {len(tool_messages)} 个工具，总耗时 {engine.last_elapsed_ms:.0f} ms")
+            for timing, message in zip(engine.last_timings, tool_messages):
+                print(f"  {timing['name']} [{timing['status']}, {timing['ms']:.0f} ms]: {message['content']}")
+    return assistant_output.content
@@ -0,0 +1,166 @@
+import base64
+import copy
+import hashlib
+import io
+import mimetypes
+import os
+import threading
+
+from collections import OrderedDict
+
+# Pillow 为可选依赖：没有安装时图片不缩放，只做 base64 编码和缓存
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Qwen-VL 把图片切成 28x28 的块，默认最多 1280 个块，超过这个分辨率的像素会被模型缩掉，上传了也没用
+PATCH_SIZE = 28
+MAX_PIXELS = int(os.getenv("VISION_MAX_PIXELS", 1280 * PATCH_SIZE * PATCH_SIZE))
+JPEG_QUALITY = 85
+CACHE_SIZE = 64
+
+
+def _guess_mime(data, source=""):
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return mimetypes.guess_type(source)[0] or "application/octet-stream"
+
+
+def target_size(width, height, max_pixels=MAX_PIXELS):
+    # 等比缩放到不超过 max_pixels，边长对齐到 28 的倍数（与模型的切块方式一致）
+    if width * height <= max_pixels:
+        return width, height
+    scale = (max_pixels / (width * height)) ** 0.5
+    new_width = max(PATCH_SIZE, int(width * scale) // PATCH_SIZE * PATCH_SIZE)
+    new_height = max(PATCH_SIZE, int(height * scale) // PATCH_SIZE * PATCH_SIZE)
+    return new_width, new_height
+
+
+# 本地图片缩放后编码为 data URI 并缓存；http(s) URL 和 data URI 原样发送：
+# 远程图片由服务端自己下载，内联成 base64 反而让每轮请求都大出几百 KB
+class ImageEncoder:
+    def __init__(self, max_pixels=MAX_PIXELS, quality=JPEG_QUALITY, cache_size=CACHE_SIZE):
+        self.max_pixels = max_pixels
+        self.quality = quality
+        self.cache_size = cache_size
+        # 内容哈希 -> (data URI, 原始 base64 字节数)
+        self._encoded = OrderedDict()
+        # 来源（路径+修改时间+大小）-> 内容哈希，命中时不用再读文件
+        self._sources = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _source_key(self, source):
+        stat = os.stat(source)
+        return (os.path.abspath(source), stat.st_mtime_ns, stat.st_size)
+
+    def _read(self, source):
+        with open(source, "rb") as f:
+            return f.read()
+
+    def _downsize(self, data):
+        # 返回 (图片字节, mime)，缩放后反而更大时保留原图；带 EXIF 旋转的图片总是转正后重新编码
+        mime = _guess_mime(data)
+        if not PIL_AVAILABLE:
+            return data, mime
+        try:
+            image = Image.open(io.BytesIO(data))
+            # 先按 EXIF 方向转正再计算目标尺寸，否则竖拍照片会按横向的宽高缩放
+            rotated = image.getexif().get(0x0112, 1) != 1
+            image = ImageOps.exif_transpose(image)
+            size = target_size(image.width, image.height, self.max_pixels)
+            if size == (image.width, image.height):
+                if not rotated:
+                    return data, mime
+            else:
+                image = image.resize(size, Image.LANCZOS)
+            output = io.BytesIO()
+            if image.mode in ("RGBA", "LA", "P"):
+                image.save(output, format="PNG", optimize=True)
+                resized, resized_mime = output.getvalue(), "image/png"
+            else:
+                image.convert("RGB").save(output, format="JPEG", quality=self.quality, optimize=True)
+                resized, resized_mime = output.getvalue(), "image/jpeg"
+        except OSError:
+            # Pillow 无法解码（SVG、未知格式、文件截断；UnidentifiedImageError 是 OSError 的子类），原样发送
+            return data, mime
+        if not rotated and len(resized) >= len(data):
+            return data, mime
+        return resized, resized_mime
+
+    def encode(self, source):
+        # 返回 (发送的地址, 不做处理时发送的字节数)，同一内容只缩放和编码一次。
+        # URL 和 data URI 原样返回，按地址本身的长度计入统计，不算作节省
+        if source.startswith(("data:", "http://", "https://")):
+            return source, len(source)
+
+        key = self._source_key(source)
+        with self._lock:
+            digest = self._sources.get(key)
+            if digest in self._encoded:
+                self._sources.move_to_end(key)
+                self._encoded.move_to_end(digest)
+                self.hits += 1
+                return self._encoded[digest]
+
+        data = self._read(source)
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            cached = self._encoded.get(digest)
+        if cached is None:
+            image, mime = self._downsize(data)
+            uri = f"data:{mime};base64,{base64.b64encode(image).decode('ascii')}"
+            cached = (uri, (len(data) + 2) // 3 * 4)
+
+        with self._lock:
+            if digest in self._encoded:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._encoded[digest] = cached
+            self._encoded.move_to_end(digest)
+            self._sources[key] = digest
+            self._sources.move_to_end(key)
+            while len(self._encoded) > self.cache_size:
+                self._encoded.popitem(last=False)
+            while len(self._sources) > self.cache_size * 4:
+                self._sources.popitem(last=False)
+        return cached
+
+    def image_part(self, source):
+        uri, _ = self.encode(source)
+        return {"type": "image_url", "image_url": {"url": uri}}
+
+    def prepare_messages(self, messages):
+        # 把消息里的本地图片路径换成缓存的 data URI，URL 原样保留，原消息不变
+        # 历史消息里保留原地址，每轮请求前调用一次，重复发送的本地图片直接命中缓存
+        prepared = copy.deepcopy(messages)
+        stats = {"images": 0, "original_bytes": 0, "payload_bytes": 0, "saved_bytes": 0}
+        for message in prepared:
+            content = message.get("content")
+            if not isinstance(content, list):
+                continue
+            for part in content:
+                if not isinstance(part, dict) or part.get("type") != "image_url":
+                    continue
+                uri, original_bytes = self.encode(part["image_url"]["url"])
+                part["image_url"]["url"] = uri
+                stats["images"] += 1
+                stats["original_bytes"] += original_bytes
+                stats["payload_bytes"] += len(uri)
+        stats["saved_bytes"] = stats["original_bytes"] - stats["payload_bytes"]
+        return prepared, stats
+
+    def print_stats(self, stats):
+        print(f"图片载荷: {stats['images']} 张, 原图 {stats['original_bytes'] / 1024:.1f}KB, "
+              f"实际发送 {stats['payload_bytes'] / 1024:.1f}KB, 节省 {stats['saved_bytes'] / 1024:.1f}KB, "
+              f"缓存命中 {self.hits} 次 / 未命中 {self.misses} 次")